@@ -1,11 +1,23 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql://postgres:postgres@db:5432/arxiv_recsys"
+    # Defaults to DATABASE_URL with its async driver (asyncpg / aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Where the TF-IDF text index is saved between restarts; empty keeps it in memory only
+    TEXT_INDEX_PATH: Optional[str] = "text_index.npz"
+    # How often similar-paper requests check for papers other processes ingested
+    TEXT_INDEX_REFRESH_SECONDS: float = 60
+    # IVF index written by scripts/build_ann_index.py; unset, similar papers use exact search
+    ANN_INDEX_PATH: Optional[str] = None
+    ANN_NPROBE: int = 16
+    # Versioned factor models written by scripts/train_als.py
+    MODEL_DIR: str = "als_models"
     
     class Config:
         env_file = ".env"
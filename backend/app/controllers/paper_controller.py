@@ -1,16 +1,97 @@
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app import models, schemas
-from typing import List, Optional
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.server import summaries
+from app.services.day_summaries import paper_days
+from app.services import rating_aggregates  # noqa: F401  keeps paper aggregates in step with rating writes
+from app.services import user_profiles  # noqa: F401  keeps user category profiles in step with rating writes
+from app.services import categories  # noqa: F401  keeps paper_categories in step with paper writes
+from app.services import authors  # noqa: F401  keeps paper_authors in step with paper writes
+from typing import Iterator, List, Optional, Tuple
+
+# Catalog order for keyset pagination: newest day first, best score first,
+# then papers without a published_date by score
+CATALOG_ORDER = (
+    models.Paper.published_date.desc(),
+    models.Paper.score.desc(),
+    models.Paper.id.desc(),
+)
 
 def get_paper(db: Session, paper_id: int) -> Optional[models.Paper]:
     return db.query(models.Paper).filter(models.Paper.id == paper_id).first()
 
+async def get_paper_async(db: AsyncSession, paper_id: int) -> Optional[models.Paper]:
+    return await db.get(models.Paper, paper_id)
+
 def get_paper_by_arxiv_id(db: Session, arxiv_id: str) -> Optional[models.Paper]:
     return db.query(models.Paper).filter(models.Paper.arxiv_id == arxiv_id).first()
 
 def get_papers(db: Session, skip: int = 0, limit: int = 100) -> List[models.Paper]:
     return db.query(models.Paper).offset(skip).limit(limit).all()
 
+def _catalog_queries(cursor: Optional[str] = None) -> List[Select]:
+    """
+    Dated then undated papers after cursor, as two range scans of the
+    keyset index; a NULLS LAST order or an OR on the key couldn't use it
+    """
+    dated = select(models.Paper).where(models.Paper.published_date.isnot(None)).order_by(*CATALOG_ORDER)
+    undated = select(models.Paper).where(models.Paper.published_date.is_(None)).order_by(*CATALOG_ORDER[1:])
+    if not cursor:
+        return [dated, undated]
+    published_date, score, paper_id = decode_cursor(cursor)
+    if published_date is None:
+        return [undated.where(tuple_(models.Paper.score, models.Paper.id) < tuple_(score, paper_id))]
+    dated = dated.where(
+        tuple_(models.Paper.published_date, models.Paper.score, models.Paper.id)
+        < tuple_(published_date, score, paper_id)
+    )
+    return [dated, undated]
+
+def get_papers_page(
+    db: Session, cursor: Optional[str] = None, limit: int = 100
+) -> Tuple[List[models.Paper], Optional[str]]:
+    """
+    Returns one page of papers after cursor and the cursor for the next page.
+    Each page is a range scan on (published_date, score, id), so deep pages
+    cost the same as the first one.
+    """
+    papers: List[models.Paper] = []
+    for stmt in _catalog_queries(cursor):
+        papers += db.execute(stmt.limit(limit + 1 - len(papers))).scalars().all()
+        if len(papers) > limit:
+            break
+    return _split_page(papers, limit)
+
+async def get_papers_page_async(
+    db: AsyncSession, cursor: Optional[str] = None, limit: int = 100
+) -> Tuple[List[models.Paper], Optional[str]]:
+    papers: List[models.Paper] = []
+    for stmt in _catalog_queries(cursor):
+        result = await db.execute(stmt.limit(limit + 1 - len(papers)))
+        papers += result.scalars().all()
+        if len(papers) > limit:
+            break
+    return _split_page(papers, limit)
+
+def _split_page(papers: List[models.Paper], limit: int) -> Tuple[List[models.Paper], Optional[str]]:
+    if len(papers) <= limit:
+        return papers, None
+    last = papers[limit - 1]
+    return papers[:limit], encode_cursor(last.published_date, last.score, last.id)
+
+def iter_papers(db: Session, cursor: Optional[str] = None, batch_size: int = 1000) -> Iterator[models.Paper]:
+    """
+    Yields every paper in catalog order through a server-side cursor,
+    buffering at most batch_size rows at a time
+    """
+    for stmt in _catalog_queries(cursor):
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        for paper in result.scalars():
+            yield paper
+
 def create_paper(db: Session, paper: schemas.PaperCreate) -> models.Paper:
     db_paper = models.Paper(
         arxiv_id=paper.arxiv_id,
@@ -21,20 +102,35 @@ def create_paper(db: Session, paper: schemas.PaperCreate) -> models.Paper:
         published_date=paper.published_date
     )
     db.add(db_paper)
+    db.flush()
+    # The server lists a day once it has a summary row (/api/papers/dates)
+    summaries.refresh_day_summaries(db, paper_days([db_paper.published_date]))
     db.commit()
     db.refresh(db_paper)
     return db_paper
 
-def rate_paper(db: Session, paper_id: int, rating: schemas.RatingCreate) -> models.Rating:
-    db_rating = models.Rating(
-        paper_id=paper_id,
-        rating=rating.rating
-    )
-    db.add(db_rating)
+def rate_paper(db: Session, paper_id: int, user_id: int, rating: schemas.RatingCreate) -> models.Rating:
+    # One rating per user and paper (uq_ratings_user_paper); rating again replaces it.
+    # Rows go through the ORM so the rating listeners move the aggregates.
+    db_rating = _user_rating(db, user_id, paper_id)
+    if db_rating is None:
+        try:
+            with db.begin_nested():
+                db_rating = models.Rating(user_id=user_id, paper_id=paper_id, rating=rating.rating)
+                db.add(db_rating)
+        except IntegrityError:
+            # A concurrent first rating won the insert; replace it instead
+            db_rating = _user_rating(db, user_id, paper_id)
+    db_rating.rating = rating.rating
     db.commit()
     db.refresh(db_rating)
     return db_rating
 
+def _user_rating(db: Session, user_id: int, paper_id: int) -> Optional[models.Rating]:
+    return db.query(models.Rating).filter(
+        models.Rating.user_id == user_id, models.Rating.paper_id == paper_id
+    ).first()
+
 def update_paper_score(db: Session, paper_id: int, new_score: float) -> models.Paper:
     paper = get_paper(db, paper_id)
     if paper:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -22,9 +22,64 @@ class Paper(Base):
     authors = Column(String)
     categories = Column(String)
     published_date = Column(DateTime)
-    score = Column(Float, default=0.0)
+    score = Column(Float, nullable=False, default=0.0, server_default="0")
+    # Running aggregates of this paper's ratings (see services/rating_aggregates.py)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     ratings = relationship("Rating", back_populates="paper")
 
+    __table_args__ = (
+        Index("ix_papers_published_date_score_id", "published_date", "score", "id"),
+    )
+
+class Category(Base):
+    __tablename__ = "categories"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+class PaperCategory(Base):
+    __tablename__ = "paper_categories"
+
+    # Paper.categories split into rows, kept in step on every paper write (see services/categories.py)
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_paper_categories_category_id_paper_id", "category_id", "paper_id"),
+    )
+
+class Author(Base):
+    __tablename__ = "authors"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    normalized_name = Column(String, unique=True, nullable=False)
+
+    __table_args__ = (
+        Index("ix_authors_normalized_name_pattern", "normalized_name", postgresql_ops={"normalized_name": "text_pattern_ops"}),
+    )
+
+class PaperAuthor(Base):
+    __tablename__ = "paper_authors"
+
+    # Paper.authors split into rows, kept in step on every paper write (see services/authors.py)
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    author_id = Column(Integer, ForeignKey("authors.id"), primary_key=True)
+    position = Column(Integer, nullable=False)
+    published_date = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_paper_authors_author_id_published_date_paper_id", "author_id", "published_date", "paper_id"),
+    )
+
+class AuthorFollow(Base):
+    __tablename__ = "author_follows"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    author_id = Column(Integer, ForeignKey("authors.id"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Rating(Base):
     __tablename__ = "ratings"
 
@@ -35,4 +90,38 @@ class Rating(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="ratings")
-    paper = relationship("Paper", back_populates="ratings") 
\ No newline at end of file
+    paper = relationship("Paper", back_populates="ratings")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "paper_id", name="uq_ratings_user_paper"),
+    )
+
+class UserCategoryStat(Base):
+    __tablename__ = "user_category_stats"
+
+    # A user's running rating sum/count per category (see services/user_profiles.py)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+
+class UserRecommendation(Base):
+    __tablename__ = "user_recommendations"
+
+    # A user's precomputed top-N, rewritten by scripts/precompute_recommendations.py
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    paper_id = Column(Integer, ForeignKey("papers.id"), nullable=False)
+    model_version = Column(String, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class PaperDaySummary(Base):
+    __tablename__ = "paper_day_summaries"
+
+    # Maintained by the API server's summaries module, which the backend also
+    # calls when it creates papers or rewrites scores
+    published_date = Column(Date, primary_key=True)
+    paper_count = Column(Integer, nullable=False, default=0)
+    max_score = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
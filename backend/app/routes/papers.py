@@ -1,32 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from typing import List, Optional
+from app.database import SessionLocal, get_async_db, get_db
 from app import models, schemas
-from app.controllers import paper_controller
+from app.controllers import paper_controller, user_controller
+from app.services import item_similarity, recommendation_engine, text_index
+from app.utils.pagination import decode_cursor
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.Paper])
+@router.get("/", response_model=List[schemas.Paper], deprecated=True)
 def get_papers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     papers = paper_controller.get_papers(db, skip=skip, limit=limit)
     return papers
 
+@router.get("/page", response_model=schemas.PaperPage)
+async def get_papers_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        papers, next_cursor = await paper_controller.get_papers_page_async(db, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"papers": papers, "next_cursor": next_cursor}
+
+@router.get("/stream")
+def stream_papers(cursor: Optional[str] = None):
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def generate():
+        # Owns its session: request-scoped dependencies close before the body is sent
+        db = SessionLocal()
+        try:
+            for paper in paper_controller.iter_papers(db, cursor=cursor):
+                yield schemas.Paper.model_validate(paper).model_dump_json() + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.get("/{paper_id}", response_model=schemas.Paper)
-def get_paper(paper_id: int, db: Session = Depends(get_db)):
-    paper = paper_controller.get_paper(db, paper_id=paper_id)
+async def get_paper(paper_id: int, db: AsyncSession = Depends(get_async_db)):
+    paper = await paper_controller.get_paper_async(db, paper_id=paper_id)
     if paper is None:
         raise HTTPException(status_code=404, detail="Paper not found")
     return paper
 
+@router.get("/{paper_id}/similar", response_model=List[schemas.Paper])
+def get_similar_papers(
+    paper_id: int,
+    background_tasks: BackgroundTasks,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    papers = recommendation_engine.get_similar_papers(db, paper_id=paper_id, limit=limit)
+    if papers is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    # Papers other processes ingested are indexed after the response
+    background_tasks.add_task(text_index.refresh_when_stale)
+    return papers
+
+@router.get("/{paper_id}/also-liked", response_model=List[schemas.Paper])
+def get_also_liked_papers(
+    paper_id: int,
+    limit: int = Query(10, ge=1, le=item_similarity.N_NEIGHBOURS),
+    db: Session = Depends(get_db)
+):
+    papers = recommendation_engine.get_also_liked_papers(db, paper_id=paper_id, limit=limit)
+    if papers is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return papers
+
 @router.post("/", response_model=schemas.Paper)
-def create_paper(paper: schemas.PaperCreate, db: Session = Depends(get_db)):
-    return paper_controller.create_paper(db=db, paper=paper)
+def create_paper(paper: schemas.PaperCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    db_paper = paper_controller.create_paper(db=db, paper=paper)
+    background_tasks.add_task(text_index.refresh_in_background)
+    return db_paper
 
 @router.post("/{paper_id}/rate", response_model=schemas.Rating)
 def rate_paper(
     paper_id: int,
     rating: schemas.RatingCreate,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(user_controller.get_current_user),
     db: Session = Depends(get_db)
 ):
-    return paper_controller.rate_paper(db=db, paper_id=paper_id, rating=rating) 
\ No newline at end of file
+    if paper_controller.get_paper(db, paper_id) is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    db_rating = paper_controller.rate_paper(db=db, paper_id=paper_id, user_id=current_user.id, rating=rating)
+    # Item neighbour lists are refreshed after the response, off the request path
+    background_tasks.add_task(item_similarity.refresh_in_background)
+    return db_rating 
\ No newline at end of file
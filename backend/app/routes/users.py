@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
 from app.controllers import user_controller
+from app.services import batch_recommendations, recommendation_engine
 from typing import List
 
 router = APIRouter()
@@ -39,4 +40,16 @@ def read_user_ratings(
     current_user: models.User = Depends(user_controller.get_current_user),
     db: Session = Depends(get_db)
 ):
-    return user_controller.get_user_ratings(db, user_id=current_user.id) 
\ No newline at end of file
+    return user_controller.get_user_ratings(db, user_id=current_user.id)
+
+@router.get("/me/recommendations", response_model=List[schemas.Paper])
+def read_user_recommendations(
+    limit: int = Query(10, ge=1, le=batch_recommendations.TOP_N),
+    current_user: models.User = Depends(user_controller.get_current_user),
+    db: Session = Depends(get_db)
+):
+    papers = batch_recommendations.get_precomputed_recommendations(db, user_id=current_user.id, limit=limit)
+    if not papers:
+        # Users who signed up since the last batch run
+        papers = recommendation_engine.get_personalized_recommendations(db, user_id=current_user.id, limit=limit)
+    return papers
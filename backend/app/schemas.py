@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -29,15 +29,22 @@ class PaperCreate(PaperBase):
 class Paper(PaperBase):
     id: int
     score: float
+    # Catalog pages and the stream also return papers stored without a date
+    published_date: Optional[datetime]
     
     class Config:
         from_attributes = True
 
+class PaperPage(BaseModel):
+    papers: List[Paper]
+    next_cursor: Optional[str] = None
+
 class RatingBase(BaseModel):
     rating: int
 
 class RatingCreate(RatingBase):
-    paper_id: int
+    # The paper comes from the path and the user from the token
+    rating: int = Field(ge=1, le=5)
 
 class Rating(RatingBase):
     id: int
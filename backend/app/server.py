@@ -0,0 +1,18 @@
+"""
+The API server's modules (../server), for SQL both apps run against the
+shared database
+
+The server owns the schema and its migrations, so tables both apps write
+are written by its code here too rather than by a copy. Its modules import
+each other by bare name, so its directory goes on the import path, as in
+scripts/.
+"""
+import os
+import sys
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "server")
+if SERVER_DIR not in sys.path:
+    sys.path.append(SERVER_DIR)
+
+import ratings  # noqa: E402
+import summaries  # noqa: E402
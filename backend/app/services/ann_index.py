@@ -0,0 +1,362 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from app.config import settings
+from app.services.paper_index import top_k
+from app.services.text_index import TextIndex
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+def text_projection(terms: List[str], dim: int = 256, nonzeros: int = 4) -> sparse.csr_matrix:
+    """
+    Sparse random projection from terms to dim dense dimensions
+
+    Each term lands on a few dimensions with signs, picked by a hash of the
+    term itself, so a term projects the same way whatever column it has in
+    whichever text index it came from.
+    """
+    digests = b"".join(hashlib.blake2b(term.encode(), digest_size=2 * nonzeros).digest() for term in terms)
+    draws = np.frombuffer(digests, dtype="<u2").astype(np.int32)
+    columns, signs = draws % dim, (draws // dim) % 2
+    return sparse.csr_matrix(
+        ((signs * 2 - 1).astype(np.float32), columns, np.arange(0, len(terms) * nonzeros + 1, nonzeros)),
+        shape=(len(terms), dim),
+    )
+
+class TextVectorizer:
+    """
+    Text index rows to unit-length dense vectors: sublinear-tf TF-IDF
+    weights, randomly projected, so inner products approximate TF-IDF cosine
+
+    The idf is frozen per term when the vectorizer is fitted, so vectors
+    computed later for new papers stay comparable with the ones already in
+    an index, even though the text index's own idf moves with every paper
+    added and its columns are renumbered by a rebuild. Terms first seen
+    since are weighted as unseen ones.
+    """
+
+    def __init__(self, terms: List[str], idf: np.ndarray, unseen_idf: float, dim: int = 256, nonzeros: int = 4):
+        self.idf = dict(zip(terms, np.asarray(idf, dtype=np.float32).tolist()))
+        self.unseen_idf = float(unseen_idf)
+        self.dim = dim
+        self.nonzeros = nonzeros
+
+    @classmethod
+    def fit(cls, index: TextIndex, dim: int = 256) -> "TextVectorizer":
+        # Same smoothed idf as TextIndex.weights
+        idf = np.log((1 + len(index)) / (1 + index.doc_freq.astype(np.float64))) + 1
+        return cls(index.terms, idf, np.log(1 + len(index)) + 1, dim)
+
+    def transform(self, index: TextIndex, positions: Optional[np.ndarray] = None, batch_size: int = 16384) -> np.ndarray:
+        """
+        Vectors for the text index rows at positions (all rows by default)
+        """
+        counts = index.counts if positions is None else index.counts[positions]
+        # Only the terms these rows use are looked up and hashed
+        used, columns = np.unique(counts.indices, return_inverse=True)
+        terms = [index.terms[column] for column in used]
+        idf = np.array([self.idf.get(term, self.unseen_idf) for term in terms], dtype=np.float32)
+        projection = text_projection(terms, self.dim, self.nonzeros)
+        counts = sparse.csr_matrix(
+            ((1 + np.log(counts.data)) * idf[columns], columns.astype(np.int32), counts.indptr),
+            shape=(counts.shape[0], len(terms)),
+        )
+        vectors = np.empty((counts.shape[0], self.dim), dtype=np.float32)
+        for start in range(0, counts.shape[0], batch_size):
+            vectors[start:start + batch_size] = _normalize((counts[start:start + batch_size] @ projection).toarray())
+        return vectors
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            terms=np.array(list(self.idf), dtype=str) if self.idf else np.empty(0, dtype="<U1"),
+            idf=np.array(list(self.idf.values()), dtype=np.float32),
+            params=np.array([self.unseen_idf, self.dim, self.nonzeros], dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TextVectorizer":
+        with np.load(path, allow_pickle=False) as saved:
+            unseen_idf, dim, nonzeros = saved["params"]
+            return cls(saved["terms"].tolist(), saved["idf"], unseen_idf, int(dim), int(nonzeros))
+
+def paper_vectors(index: TextIndex, positions: Optional[np.ndarray] = None, dim: int = 256, batch_size: int = 16384) -> np.ndarray:
+    """
+    Vectors for the text index rows at positions (all rows by default),
+    with the index's current idf
+    """
+    return TextVectorizer.fit(index, dim).transform(index, positions, batch_size)
+
+def kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 10, sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on a sample of unit vectors; returns unit centroids
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = assign(vectors, centroids)
+        members = sparse.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (assignments, np.arange(len(vectors)))),
+            shape=(n_clusters, len(vectors)),
+        )
+        sums = np.asarray(members @ vectors)
+        # Clusters that lost every member keep their previous centroid
+        empty = np.bincount(assignments, minlength=n_clusters) == 0
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+    return centroids
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """
+    Nearest centroid (largest inner product) for each vector, in batches
+    """
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+        assignments[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+    return assignments
+
+class Segment:
+    """
+    One batch of inserted vectors, sorted by inverted list: rows
+    offsets[c]:offsets[c + 1] are the members of list c
+    """
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, offsets: np.ndarray, path: Optional[str] = None):
+        self.ids = ids
+        self.vectors = vectors
+        self.offsets = offsets
+        self.path = path
+
+    @classmethod
+    def build(cls, ids: np.ndarray, vectors: np.ndarray, centroids: np.ndarray) -> "Segment":
+        assignments = assign(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=offsets[1:])
+        return cls(
+            np.asarray(ids, dtype=np.int64)[order],
+            np.asarray(vectors, dtype=np.float32)[order],
+            offsets,
+        )
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in ("ids", "vectors", "offsets"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def open(cls, path: str) -> "Segment":
+        return cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("ids", "vectors", "offsets")), path=path)
+
+    def probe(self, lists: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ids and vectors of the members of the given lists
+        """
+        ranges = [(self.offsets[c], self.offsets[c + 1]) for c in lists]
+        ranges = [(start, end) for start, end in ranges if end > start]
+        if not ranges:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.vectors.shape[1]), dtype=np.float32)
+        return (
+            np.concatenate([self.ids[start:end] for start, end in ranges]),
+            np.concatenate([self.vectors[start:end] for start, end in ranges]),
+        )
+
+MANIFEST = "manifest.json"
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over unit vectors
+
+    k-means centroids split the vectors into inverted lists; a query scans
+    only the nprobe lists whose centroids are closest, so nprobe trades
+    recall for latency. Each add writes a new segment (one per ingested
+    day, say) instead of rewriting the old ones, and compact() merges them.
+    With a path, segments live on disk and are memory-mapped, so opening
+    the index reads almost nothing and the OS pages in the lists probed.
+
+    On disk, the manifest lists the segments that make up the index, and
+    replacing it is the only step that changes what open() sees: a segment
+    written but not yet listed, or unlisted but not yet removed, is ignored.
+    One process writes an index at a time.
+    """
+
+    def __init__(self, centroids: np.ndarray, segments: Optional[List[Segment]] = None, path: Optional[str] = None,
+                 vectorizer: Optional[TextVectorizer] = None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.segments = segments or []
+        self.path = path
+        self.vectorizer = vectorizer
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_lists: int, path: Optional[str] = None,
+              vectorizer: Optional[TextVectorizer] = None, **kmeans_args) -> "IVFIndex":
+        """
+        Empty index with centroids fitted to vectors (typically the ones
+        about to be added); saved under path if given, with the vectorizer
+        that produced them, if any
+        """
+        index = cls(kmeans(vectors, n_lists, **kmeans_args), path=path, vectorizer=vectorizer)
+        if path:
+            os.makedirs(path, exist_ok=True)
+            np.save(os.path.join(path, "centroids.npy"), index.centroids)
+            if vectorizer is not None:
+                vectorizer.save(os.path.join(path, "vectorizer.npz"))
+            index._write_manifest()
+        return index
+
+    @classmethod
+    def open(cls, path: str) -> "IVFIndex":
+        with open(os.path.join(path, MANIFEST)) as f:
+            segments = json.load(f)["segments"]
+        vectorizer_path = os.path.join(path, "vectorizer.npz")
+        return cls(
+            np.load(os.path.join(path, "centroids.npy")),
+            [Segment.open(os.path.join(path, name)) for name in segments],
+            path=path,
+            vectorizer=TextVectorizer.load(vectorizer_path) if os.path.exists(vectorizer_path) else None,
+        )
+
+    def __len__(self) -> int:
+        return sum(len(segment.ids) for segment in self.segments)
+
+    @property
+    def last_id(self) -> int:
+        return max((int(segment.ids.max()) for segment in self.segments if len(segment.ids)), default=0)
+
+    def _segment_names(self) -> List[str]:
+        return [os.path.basename(segment.path) for segment in self.segments]
+
+    def _write_manifest(self) -> None:
+        tmp_path = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"segments": self._segment_names()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def _write_segment(self, segment: Segment) -> Segment:
+        numbers = [int(name[len("segment-"):].split(".")[0]) for name in os.listdir(self.path) if name.startswith("segment-")]
+        path = os.path.join(self.path, f"segment-{max(numbers, default=-1) + 1:06d}")
+        segment.save(path)
+        return Segment.open(path)
+
+    def _remove_unlisted_segments(self) -> None:
+        listed = set(self._segment_names())
+        for name in os.listdir(self.path):
+            if name.startswith("segment-") and name not in listed:
+                shutil.rmtree(os.path.join(self.path, name))
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Insert vectors as a new segment, assigned to the existing lists
+        """
+        if len(ids) == 0:
+            return
+        segment = Segment.build(ids, vectors, self.centroids)
+        if self.path:
+            segment = self._write_segment(segment)
+        self.segments.append(segment)
+        if self.path:
+            self._write_manifest()
+
+    def compact(self) -> None:
+        """
+        Merge all segments into one, so a probe touches each list once;
+        the merge is done in memory
+        """
+        if len(self.segments) <= 1:
+            return
+        merged = Segment.build(
+            np.concatenate([segment.ids for segment in self.segments]),
+            np.concatenate([segment.vectors for segment in self.segments]),
+            self.centroids,
+        )
+        if self.path:
+            merged = self._write_segment(merged)
+        self.segments = [merged]
+        if self.path:
+            self._write_manifest()
+            # Also clears segments left behind by a crash before this point
+            self._remove_unlisted_segments()
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, inner products) of the approximate k nearest vectors to a
+        unit query, best first
+        """
+        query = np.asarray(query, dtype=np.float32)
+        lists = top_k(self.centroids @ query, nprobe)
+        probed = [segment.probe(lists) for segment in self.segments]
+        ids = np.concatenate([segment_ids for segment_ids, _ in probed]) if probed else np.empty(0, dtype=np.int64)
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        scores = np.concatenate([vectors @ query for _, vectors in probed])
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+    def similar(self, text_index: TextIndex, paper_id: int, k: int = 10, nprobe: int = 8,
+                candidates: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """
+        Like TextIndex.similar, searching only the candidates * k nearest
+        vectors; None if the index has no vectorizer or the paper isn't in
+        the text index, so callers fall back to exact search
+        """
+        position = text_index.position(paper_id)
+        if self.vectorizer is None or position is None:
+            return None
+        query = self.vectorizer.transform(text_index, np.array([position]))[0]
+        ids, _ = self.search(query, candidates * k + 1, nprobe)
+        # Candidates are re-scored with the exact TF-IDF cosine, which also
+        # drops papers sharing no terms and ones deleted from the text index
+        positions = np.searchsorted(text_index.paper_ids, ids)
+        found = positions < len(text_index)
+        found[found] = text_index.paper_ids[positions[found]] == ids[found]
+        positions = positions[found & (ids != paper_id)]
+        weights = text_index.weights()
+        scores = weights[positions] @ weights[position].toarray().ravel()
+        best = top_k(scores, k)
+        best = best[scores[best] > 0]
+        return [(int(text_index.paper_ids[positions[i]]), float(scores[i])) for i in best]
+
+_index_lock = threading.Lock()
+_cached_index: Optional[IVFIndex] = None
+_cached_version: Optional[Tuple[int, int]] = None
+
+def get_ann_index() -> Optional[IVFIndex]:
+    """
+    The index under ANN_INDEX_PATH, or None if there isn't one; a manifest
+    written since (segments added, compacted or rebuilt by
+    scripts/build_ann_index.py) is picked up on the next call
+    """
+    global _cached_index, _cached_version
+    path = settings.ANN_INDEX_PATH
+    if not path:
+        return None
+    try:
+        stat = os.stat(os.path.join(path, MANIFEST))
+    except OSError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    with _index_lock:
+        if _cached_index is None or _cached_index.path != path or _cached_version != version:
+            try:
+                _cached_index, _cached_version = IVFIndex.open(path), version
+            except (OSError, ValueError, KeyError):
+                # Replaced while we read it; keep what we have
+                pass
+        return _cached_index if _cached_index is not None and _cached_index.path == path else None
@@ -0,0 +1,66 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import models
+
+PUNCTUATION = re.compile(r"[^\w\s-]")
+
+def normalize_author_name(name: str) -> str:
+    """
+    Key under which spellings of one name are merged: accents, case,
+    punctuation and spacing are ignored (same as the server's authors.py)
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(PUNCTUATION.sub(" ", stripped.casefold()).split())
+
+def split_authors(authors: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    (normalized name, name) for each distinct author of a Paper.authors
+    string, in order
+    """
+    names: Dict[str, str] = {}
+    for name in (authors or "").split(","):
+        name = " ".join(name.split())
+        key = normalize_author_name(name)
+        if key and key not in names:
+            names[key] = name
+    return list(names.items())
+
+def _sync(connection, paper_id: int, authors: Optional[str], published_date) -> None:
+    names = split_authors(authors)
+    connection.execute(delete(models.PaperAuthor).where(models.PaperAuthor.paper_id == paper_id))
+    if not names:
+        return
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    connection.execute(
+        insert(models.Author).values([{"name": name, "normalized_name": key} for key, name in names])
+        .on_conflict_do_nothing(index_elements=[models.Author.normalized_name])
+    )
+    ids = dict(connection.execute(
+        select(models.Author.normalized_name, models.Author.id)
+        .where(models.Author.normalized_name.in_([key for key, _ in names]))
+    ).all())
+    connection.execute(insert(models.PaperAuthor).values([
+        {"paper_id": paper_id, "author_id": ids[key], "position": position, "published_date": published_date}
+        for position, (key, _) in enumerate(names)
+    ]))
+
+# Paper writes through the ORM keep paper_authors in step with
+# Paper.authors in the same transaction, like services/categories.py
+@event.listens_for(models.Paper, "after_insert")
+def _paper_inserted(mapper, connection, target):
+    _sync(connection, target.id, target.authors, target.published_date)
+
+@event.listens_for(models.Paper, "after_update")
+def _paper_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.authors.history.has_changes() or state.attrs.published_date.history.has_changes():
+        _sync(connection, target.id, target.authors, target.published_date)
+
+@event.listens_for(models.Paper, "before_delete")
+def _paper_deleted(mapper, connection, target):
+    connection.execute(delete(models.PaperAuthor).where(models.PaperAuthor.paper_id == target.id))
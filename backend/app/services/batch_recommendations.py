@@ -0,0 +1,156 @@
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal, engine
+from app.services import recommendation_engine
+from app.services.factor_model import get_factor_model
+from app.services.paper_index import get_paper_index
+
+TOP_N = 50
+BATCH_SIZE = 500
+
+def get_precomputed_recommendations(db: Session, user_id: int, limit: int = 10) -> List[models.Paper]:
+    """
+    The user's stored top-N in rank order: one range read of the
+    (user_id, rank) primary key joined to papers
+    """
+    return db.execute(
+        select(models.Paper)
+        .join(models.UserRecommendation, models.UserRecommendation.paper_id == models.Paper.id)
+        .where(models.UserRecommendation.user_id == user_id)
+        .order_by(models.UserRecommendation.rank)
+        .limit(limit)
+    ).scalars().all()
+
+def current_model_version() -> str:
+    """
+    Version stamp for the recommendations a run would produce now
+    """
+    model = get_factor_model()
+    return f"als-{model.version}" if model is not None else "categories"
+
+def compute_batch(db: Session, user_ids: List[int], model_version: str, top_n: int) -> int:
+    """
+    Recompute and replace the stored recommendations of user_ids in one
+    transaction; returns how many rows were written
+    """
+    now = datetime.utcnow()
+    # One index for the whole batch instead of a freshness check per user
+    index = get_paper_index(db)
+    rows = [
+        {"user_id": user_id, "rank": rank, "paper_id": paper_id, "model_version": model_version, "computed_at": now}
+        for user_id in user_ids
+        for rank, paper_id in enumerate(
+            recommendation_engine.get_personalized_paper_ids(db, user_id, limit=top_n, index=index)
+        )
+    ]
+    try:
+        db.execute(delete(models.UserRecommendation).where(models.UserRecommendation.user_id.in_(user_ids)))
+        if rows:
+            db.execute(insert(models.UserRecommendation), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+def _init_worker() -> None:
+    # Connections inherited from the parent must not be shared with it
+    engine.dispose(close=False)
+
+def _compute_batch_in_worker(user_ids: List[int], model_version: str, top_n: int) -> int:
+    db = SessionLocal()
+    try:
+        return compute_batch(db, user_ids, model_version, top_n)
+    finally:
+        db.close()
+
+def _user_batches(db: Session, start_after_id: int, batch_size: int):
+    last_id = start_after_id
+    while True:
+        user_ids = db.execute(
+            select(models.User.id).where(models.User.id > last_id).order_by(models.User.id).limit(batch_size)
+        ).scalars().all()
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+def read_checkpoint(path: str, model_version: str) -> int:
+    """
+    The user id the previous run of this model version got up to, or 0
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return checkpoint.get("last_user_id", 0) if checkpoint.get("model_version") == model_version else 0
+
+def write_checkpoint(path: str, model_version: str, last_user_id: int) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump({"model_version": model_version, "last_user_id": last_user_id}, f)
+    os.replace(path + ".tmp", path)
+
+def precompute_recommendations(
+    db: Session,
+    model_version: str,
+    top_n: int = TOP_N,
+    batch_size: int = BATCH_SIZE,
+    workers: int = 1,
+    start_after_id: int = 0,
+    on_progress: Optional[Callable[[int, int, int], None]] = None,
+) -> Tuple[int, int]:
+    """
+    Store every user's top-N under model_version, in user id order
+
+    Users are read in batches of batch_size and shared out over a process
+    pool (workers=0 computes them in this process with db), each batch
+    replaced in its own transaction. on_progress(users done, rows written,
+    last_user_id) is called as batches complete, with last_user_id the
+    highest id below which every batch has finished, so a run interrupted
+    at any point can restart from it with start_after_id. Returns
+    (users, rows).
+    """
+    batches = _user_batches(db, start_after_id, batch_size)
+    users = rows = 0
+    if workers == 0:
+        for user_ids in batches:
+            rows += compute_batch(db, user_ids, model_version, top_n)
+            users += len(user_ids)
+            if on_progress:
+                on_progress(users, rows, user_ids[-1])
+        return users, rows
+
+    last_user_id = start_after_id
+    # (last user id, batch size, future) in submission order, with up to
+    # two batches per worker queued so workers never wait on the parent
+    pending: List[Tuple[int, int, Future]] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                user_ids = next(batches, None)
+                if user_ids is None:
+                    exhausted = True
+                else:
+                    pending.append((user_ids[-1], len(user_ids), pool.submit(
+                        _compute_batch_in_worker, user_ids, model_version, top_n
+                    )))
+            if not pending:
+                break
+            # Collected oldest first, so last_user_id only advances past
+            # batches that have all been committed
+            last_user_id, size, future = pending.pop(0)
+            rows += future.result()
+            users += size
+            if on_progress:
+                on_progress(users, rows, last_user_id)
+    return users, rows
@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import models
+
+def split_categories(categories: Optional[str]) -> List[str]:
+    """
+    Distinct category names of a Paper.categories string, in order
+    """
+    return list(dict.fromkeys((categories or "").split()))
+
+def category_ids(db: Session) -> Dict[str, int]:
+    """
+    The whole category dictionary, name to id
+    """
+    return dict(db.execute(select(models.Category.name, models.Category.id)).all())
+
+def paper_category_ids(connection, paper_id: int) -> List[int]:
+    """
+    Ids of the categories a paper lists, from paper_categories
+    """
+    return connection.execute(
+        select(models.PaperCategory.category_id).where(models.PaperCategory.paper_id == paper_id)
+    ).scalars().all()
+
+def _sync(connection, paper_id: int, categories: Optional[str]) -> None:
+    names = split_categories(categories)
+    connection.execute(delete(models.PaperCategory).where(models.PaperCategory.paper_id == paper_id))
+    if not names:
+        return
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    connection.execute(
+        insert(models.Category).values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[models.Category.name])
+    )
+    ids = connection.execute(select(models.Category.id).where(models.Category.name.in_(names))).scalars().all()
+    connection.execute(insert(models.PaperCategory).values([
+        {"paper_id": paper_id, "category_id": category_id} for category_id in ids
+    ]))
+
+# Paper writes through the ORM keep paper_categories in step with
+# Paper.categories in the same transaction
+@event.listens_for(models.Paper, "after_insert")
+def _paper_inserted(mapper, connection, target):
+    _sync(connection, target.id, target.categories)
+
+@event.listens_for(models.Paper, "after_update")
+def _paper_updated(mapper, connection, target):
+    if inspect(target).attrs.categories.history.has_changes():
+        _sync(connection, target.id, target.categories)
+
+@event.listens_for(models.Paper, "before_delete")
+def _paper_deleted(mapper, connection, target):
+    connection.execute(delete(models.PaperCategory).where(models.PaperCategory.paper_id == target.id))
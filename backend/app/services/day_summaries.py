@@ -0,0 +1,9 @@
+from datetime import datetime
+from typing import Iterable
+
+def paper_days(values: Iterable) -> set:
+    """
+    The days of published_date values, which the backend reads as datetimes;
+    for the server's summaries.touch_day_summaries and refresh_day_summaries
+    """
+    return {value.date() if isinstance(value, datetime) else value for value in values if value is not None}
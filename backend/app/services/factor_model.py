@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+
+LATEST = "LATEST"
+
+class FactorModel:
+    """
+    User and paper factors from implicit-feedback ALS; a user's predicted
+    affinity for a paper is the dot product of their factors
+
+    Loaded with mmap_mode="r", so every worker process maps the same
+    page-cached files instead of holding its own copy.
+    """
+
+    def __init__(self, version: str, user_ids: np.ndarray, user_factors: np.ndarray, paper_ids: np.ndarray, paper_factors: np.ndarray):
+        self.version = version
+        self.user_ids = user_ids
+        self.user_factors = user_factors
+        self.paper_ids = paper_ids
+        self.paper_factors = paper_factors
+
+    @classmethod
+    def load(cls, path: str) -> "FactorModel":
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ("user_ids", "user_factors", "paper_ids", "paper_factors")
+        }
+        return cls(os.path.basename(path), **arrays)
+
+    def user_vector(self, user_id: int) -> Optional[np.ndarray]:
+        """
+        The user's factors, or None for users the model hasn't seen
+        """
+        position = int(np.searchsorted(self.user_ids, user_id))
+        if position == len(self.user_ids) or self.user_ids[position] != user_id:
+            return None
+        return np.asarray(self.user_factors[position])
+
+    def scores(self, user_vector: np.ndarray) -> np.ndarray:
+        """
+        Affinity of the user for every paper in paper_ids order
+        """
+        return np.asarray(self.paper_factors @ user_vector)
+
+def read_ratings(db: Session, chunk_size: int = 100000) -> Iterable[np.ndarray]:
+    """
+    (user_id, paper_id, rating) int32 arrays of up to chunk_size rows each,
+    streamed through a server-side cursor
+    """
+    result = db.execute(
+        select(models.Rating.user_id, models.Rating.paper_id, models.Rating.rating)
+        .where(models.Rating.user_id.isnot(None))
+        .execution_options(yield_per=chunk_size)
+    )
+    for rows in result.partitions():
+        yield np.array(rows, dtype=np.int32).reshape(-1, 3)
+
+def ratings_matrix(chunks: Iterable[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+    """
+    Sorted user ids, sorted paper ids and the user x paper rating matrix
+    """
+    triples = [chunk for chunk in chunks if len(chunk)]
+    triples = np.concatenate(triples) if triples else np.empty((0, 3), dtype=np.int32)
+    user_ids, user_index = np.unique(triples[:, 0], return_inverse=True)
+    paper_ids, paper_index = np.unique(triples[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (triples[:, 2].astype(np.float32), (user_index, paper_index)),
+        shape=(len(user_ids), len(paper_ids)),
+    )
+    return user_ids, paper_ids, matrix
+
+# Set in each pool worker by _init_worker: paths of the work files, which
+# the worker maps rather than receiving copies of the matrices per task
+_work = {}
+
+def _init_worker(work_dir: str) -> None:
+    _work["dir"] = work_dir
+
+def _mapped(name: str) -> np.ndarray:
+    return np.load(os.path.join(_work["dir"], f"{name}.npy"), mmap_mode="r")
+
+def _solve_block(side: str, start: int, end: int, alpha: float, regularization: float) -> np.ndarray:
+    """
+    Solve rows start:end of one side against the fixed factors of the other
+
+    For a row with rated columns Y_u and confidences c_u = 1 + alpha * r:
+    (Y'Y + Y_u' (C_u - I) Y_u + lambda I) x = Y_u' c_u
+    """
+    indptr, indices, data = _mapped(f"{side}_indptr"), _mapped(f"{side}_indices"), _mapped(f"{side}_data")
+    fixed = _mapped(f"{side}_fixed")
+    gram = _mapped(f"{side}_gram")
+    factors = fixed.shape[1]
+    ridge = regularization * np.eye(factors, dtype=np.float64)
+    solved = np.zeros((end - start, factors), dtype=np.float32)
+    for row in range(start, end):
+        columns = indices[indptr[row]:indptr[row + 1]]
+        if len(columns) == 0:
+            continue
+        confidence = 1 + alpha * data[indptr[row]:indptr[row + 1]].astype(np.float64)
+        rated = fixed[columns].astype(np.float64)
+        a = gram + (rated.T * (confidence - 1)) @ rated + ridge
+        b = rated.T @ confidence
+        solved[row - start] = np.linalg.solve(a, b)
+    return solved
+
+def _save_work(work_dir: str, name: str, array: np.ndarray) -> None:
+    # Replaced rather than overwritten: a worker still mapping the old
+    # file keeps reading the old inode
+    np.save(os.path.join(work_dir, f"{name}.tmp.npy"), array)
+    os.replace(os.path.join(work_dir, f"{name}.tmp.npy"), os.path.join(work_dir, f"{name}.npy"))
+
+def train_als(
+    matrix: sparse.csr_matrix,
+    factors: int = 64,
+    iterations: int = 10,
+    regularization: float = 0.1,
+    alpha: float = 10.0,
+    workers: int = 1,
+    block_size: int = 2048,
+    seed: int = 0,
+    on_iteration: Optional[Callable[[int], None]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Implicit-feedback ALS (Hu, Koren & Volinsky) on a user x paper rating
+    matrix; returns (user_factors, paper_factors) as float32
+
+    Each half-iteration solves every row of one side independently, in
+    blocks spread over a process pool. The ratings and fixed factors are
+    written to a scratch directory that the workers memory-map.
+    """
+    rng = np.random.default_rng(seed)
+    learned = {
+        "user": (rng.standard_normal((matrix.shape[0], factors)) * 0.01).astype(np.float32),
+        "paper": (rng.standard_normal((matrix.shape[1], factors)) * 0.01).astype(np.float32),
+    }
+    other_side = {"user": "paper", "paper": "user"}
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(work_dir,)) as pool:
+        for side, rows in (("user", matrix.tocsr()), ("paper", matrix.T.tocsr())):
+            for name in ("indptr", "indices", "data"):
+                _save_work(work_dir, f"{side}_{name}", getattr(rows, name))
+        for iteration in range(iterations):
+            for side in ("user", "paper"):
+                fixed = learned[other_side[side]]
+                _save_work(work_dir, f"{side}_fixed", fixed)
+                _save_work(work_dir, f"{side}_gram", fixed.T.astype(np.float64) @ fixed.astype(np.float64))
+                n_rows = len(learned[side])
+                futures = [
+                    pool.submit(_solve_block, side, start, min(start + block_size, n_rows), alpha, regularization)
+                    for start in range(0, n_rows, block_size)
+                ]
+                if futures:
+                    learned[side] = np.concatenate([future.result() for future in futures])
+            if on_iteration:
+                on_iteration(iteration)
+    return learned["user"], learned["paper"]
+
+def save_model(model_dir: str, user_ids: np.ndarray, user_factors: np.ndarray, paper_ids: np.ndarray, paper_factors: np.ndarray, params: dict, keep: int = 3) -> str:
+    """
+    Write a new model version and point LATEST at it; returns the version.
+    Versions are written under a temporary name and LATEST is replaced
+    atomically, so readers never see a partial model. Only the newest keep
+    versions are kept.
+    """
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(model_dir, version)
+    os.makedirs(path + ".tmp")
+    for name, array in (
+        ("user_ids", user_ids.astype(np.int64)),
+        ("user_factors", user_factors.astype(np.float32)),
+        ("paper_ids", paper_ids.astype(np.int64)),
+        ("paper_factors", paper_factors.astype(np.float32)),
+    ):
+        np.save(os.path.join(path + ".tmp", f"{name}.npy"), array)
+    with open(os.path.join(path + ".tmp", "params.json"), "w") as f:
+        json.dump(params, f)
+    os.replace(path + ".tmp", path)
+
+    with open(os.path.join(model_dir, LATEST + ".tmp"), "w") as f:
+        f.write(version)
+    os.replace(os.path.join(model_dir, LATEST + ".tmp"), os.path.join(model_dir, LATEST))
+
+    versions = sorted(name for name in os.listdir(model_dir) if name[:1].isdigit() and not name.endswith(".tmp"))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(model_dir, old))
+    return version
+
+_model_lock = threading.Lock()
+_cached_model: Optional[FactorModel] = None
+
+def get_factor_model() -> Optional[FactorModel]:
+    """
+    The latest trained model under MODEL_DIR, or None if there isn't one;
+    a newly published version is picked up on the next call
+    """
+    global _cached_model
+    model_dir = settings.MODEL_DIR
+    try:
+        with open(os.path.join(model_dir, LATEST)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    with _model_lock:
+        if _cached_model is None or _cached_model.version != version:
+            try:
+                _cached_model = FactorModel.load(os.path.join(model_dir, version))
+            except OSError:
+                # Pruned between reading LATEST and loading; keep what we have
+                pass
+        return _cached_model
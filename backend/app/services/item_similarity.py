@@ -0,0 +1,294 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, aliased, object_session
+
+from app import models
+from app.database import SessionLocal
+
+N_NEIGHBOURS = 20
+
+class ItemNeighbours:
+    """
+    Top-N most similar papers for every rated paper, by cosine similarity
+    of their rating columns in the user x paper matrix
+
+    Row i of neighbours/similarities holds the list for the paper mapped to
+    i in rows, best first, padded with -1 / 0. Reads are a dict lookup and
+    a slice. Refreshing a paper recomputes its own list exactly and patches
+    it into the lists of the papers it is co-rated with.
+    """
+
+    def __init__(self, n_neighbours: int = N_NEIGHBOURS):
+        self.n_neighbours = n_neighbours
+        self.rows: Dict[int, int] = {}
+        self.neighbours = np.full((0, n_neighbours), -1, dtype=np.int32)
+        self.similarities = np.zeros((0, n_neighbours), dtype=np.float32)
+        self.last_rating_id = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, ratings: Iterable[Tuple[int, int, int, int]], n_neighbours: int = N_NEIGHBOURS) -> "ItemNeighbours":
+        """
+        Build from (rating_id, user_id, paper_id, rating) rows
+        """
+        model = cls(n_neighbours)
+        users: Dict[int, int] = {}
+        papers: Dict[int, int] = {}
+        user_index, paper_index, values = [], [], []
+        for rating_id, user_id, paper_id, rating in ratings:
+            user_index.append(users.setdefault(user_id, len(users)))
+            paper_index.append(papers.setdefault(paper_id, len(papers)))
+            values.append(rating or 0)
+            model.last_rating_id = max(model.last_rating_id, rating_id)
+        if not papers:
+            return model
+
+        matrix = sparse.csr_matrix(
+            (np.array(values, dtype=np.float32), (np.array(user_index), np.array(paper_index))),
+            shape=(len(users), len(papers)),
+        )
+        dots = (matrix.T @ matrix).tocsr()
+        norms = np.sqrt(dots.diagonal())
+        norms[norms == 0] = 1
+        inverse = sparse.diags((1 / norms).astype(np.float32))
+        cosine = (inverse @ dots @ inverse).tocsr()
+        cosine.setdiag(0)
+        cosine.eliminate_zeros()
+
+        paper_ids = np.empty(len(papers), dtype=np.int32)
+        for paper_id, column in papers.items():
+            paper_ids[column] = paper_id
+        model._grow(len(papers))
+        for column in range(len(papers)):
+            start, end = cosine.indptr[column], cosine.indptr[column + 1]
+            model._set_row(int(paper_ids[column]), paper_ids[cosine.indices[start:end]], cosine.data[start:end])
+        return model
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.neighbours)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity)
+        neighbours = np.full((capacity, self.n_neighbours), -1, dtype=np.int32)
+        similarities = np.zeros((capacity, self.n_neighbours), dtype=np.float32)
+        neighbours[:len(self.neighbours)] = self.neighbours
+        similarities[:len(self.similarities)] = self.similarities
+        self.neighbours, self.similarities = neighbours, similarities
+
+    def _row(self, paper_id: int) -> int:
+        row = self.rows.get(paper_id)
+        if row is None:
+            row = len(self.rows)
+            self._grow(row + 1)
+            self.rows[paper_id] = row
+        return row
+
+    def _set_row(self, paper_id: int, candidates: np.ndarray, scores: np.ndarray) -> None:
+        keep = scores > 0
+        candidates, scores = candidates[keep], scores[keep]
+        # Best first; ties by paper id so rebuilds are deterministic
+        order = np.lexsort((candidates, -scores))[:self.n_neighbours]
+        row = self._row(paper_id)
+        self.neighbours[row] = -1
+        self.similarities[row] = 0
+        self.neighbours[row, :len(order)] = candidates[order]
+        self.similarities[row, :len(order)] = scores[order]
+
+    def _patch(self, paper_id: int, neighbour_id: int, similarity: float) -> None:
+        """
+        Set one entry of a paper's list without recomputing the rest
+        """
+        row = self._row(paper_id)
+        candidates = self.neighbours[row]
+        scores = self.similarities[row]
+        present = candidates == neighbour_id
+        if not present.any():
+            present = candidates == -1
+            if not present.any():
+                if similarity <= scores[-1]:
+                    return
+                present = np.arange(len(candidates)) == len(candidates) - 1
+        position = int(np.argmax(present))
+        candidates, scores = candidates.copy(), scores.copy()
+        candidates[position], scores[position] = neighbour_id, similarity
+        filled = candidates != -1
+        self._set_row(paper_id, candidates[filled], scores[filled])
+
+    def refresh(self, paper_id: int, dots: List[Tuple[int, float, float]]) -> None:
+        """
+        Recompute paper_id's list from (other_paper_id, dot product, other's
+        sum of squared ratings) rows, including the paper itself
+        """
+        own = next((squares for other, _, squares in dots if other == paper_id), 0)
+        with self._lock:
+            candidates, scores = [], []
+            for other, dot, squares in dots:
+                if other == paper_id:
+                    continue
+                similarity = float(dot) / float(np.sqrt(own * squares)) if own and squares else 0.0
+                candidates.append(other)
+                scores.append(similarity)
+                # Only this pair's similarity changed in the other list. An
+                # entry that dropped may now be outranked by a paper outside
+                # the list; the next rebuild corrects that.
+                self._patch(other, paper_id, similarity)
+            self._set_row(paper_id, np.array(candidates, dtype=np.int32), np.array(scores, dtype=np.float32))
+
+    def neighbours_of(self, paper_id: int, limit: int) -> List[int]:
+        with self._lock:
+            row = self.rows.get(paper_id)
+            if row is None:
+                return []
+            neighbours = self.neighbours[row, :limit]
+            return [int(neighbour) for neighbour in neighbours if neighbour != -1]
+
+def co_rating_dots(db: Session, paper_id: int) -> List[Tuple[int, float, float]]:
+    """
+    (other_paper_id, dot product with paper_id, other's sum of squared
+    ratings) over every paper sharing a rater with paper_id
+    """
+    rated, co_rated, other = aliased(models.Rating), aliased(models.Rating), aliased(models.Rating)
+    dots = (
+        select(co_rated.paper_id.label("paper_id"), func.sum(rated.rating * co_rated.rating).label("dot"))
+        .join(co_rated, co_rated.user_id == rated.user_id)
+        .where(rated.paper_id == paper_id)
+        .group_by(co_rated.paper_id)
+        .subquery()
+    )
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(dots.c.paper_id, dots.c.dot, func.sum(other.rating * other.rating))
+            .join(other, other.paper_id == dots.c.paper_id)
+            .where(other.user_id.isnot(None))
+            .group_by(dots.c.paper_id, dots.c.dot)
+        )
+    ]
+
+# Held while the model is built; once it exists reads no longer take it
+_model_lock = threading.Lock()
+# One update at a time, so a slow pass cannot overwrite a later one's lists
+_update_lock = threading.Lock()
+_cached_model: Optional[ItemNeighbours] = None
+# Papers whose ratings this process's committed transactions changed
+_dirty_lock = threading.Lock()
+_dirty_papers: Set[int] = set()
+
+def _take_dirty_papers() -> Set[int]:
+    global _dirty_papers
+    with _dirty_lock:
+        dirty, _dirty_papers = _dirty_papers, set()
+    return dirty
+
+def update_item_neighbours(db: Session, model: ItemNeighbours) -> int:
+    """
+    Refresh the lists of papers whose ratings changed since the last
+    update; returns how many papers were refreshed
+
+    Inserts, in-place changes and deletes committed in this process are
+    collected by the rating listeners below. Other processes' ratings are
+    picked up by id past model.last_rating_id, so their in-place changes
+    wait for the next rebuild.
+    """
+    paper_ids = _take_dirty_papers()
+    new_ratings = db.query(models.Rating.id, models.Rating.paper_id).filter(
+        models.Rating.id > model.last_rating_id
+    ).all()
+    paper_ids.update(paper_id for _, paper_id in new_ratings)
+    # The queries run unlocked; refresh takes the model's lock per paper, so
+    # reads only wait for the arithmetic
+    for paper_id in sorted(paper_ids):
+        model.refresh(paper_id, co_rating_dots(db, paper_id))
+    if new_ratings:
+        model.last_rating_id = max(rating_id for rating_id, _ in new_ratings)
+    return len(paper_ids)
+
+def build_item_neighbours(db: Session, n_neighbours: int = N_NEIGHBOURS) -> ItemNeighbours:
+    return ItemNeighbours.build(
+        db.query(models.Rating.id, models.Rating.user_id, models.Rating.paper_id, models.Rating.rating)
+          .filter(models.Rating.user_id.isnot(None))
+          .yield_per(10000),
+        n_neighbours,
+    )
+
+def get_item_neighbours(db: Session) -> ItemNeighbours:
+    """
+    The shared model, built on first use
+
+    Reads never refresh it; record_ratings does, after rating responses.
+    """
+    global _cached_model
+    model = _cached_model
+    if model is not None:
+        return model
+    with _model_lock:
+        if _cached_model is None:
+            # Changes committed from here on are left for the next update
+            _take_dirty_papers()
+            _cached_model = build_item_neighbours(db)
+        return _cached_model
+
+def record_ratings(db: Session) -> int:
+    """
+    Folds committed ratings into the model, if one has been built in this
+    process; returns how many papers were refreshed
+    """
+    model = _cached_model
+    if model is None:
+        return 0
+    with _update_lock:
+        return update_item_neighbours(db, model)
+
+_refresh_lock = threading.Lock()
+_refresh_pending = False
+
+def refresh_in_background() -> None:
+    """
+    Run after a rating response has been sent (a FastAPI background task),
+    with its own session
+
+    Requests that arrive while a refresh runs only leave a flag for it, so
+    a burst of ratings costs one extra pass rather than one each.
+    """
+    global _refresh_pending
+    _refresh_pending = True
+    # Retried after release: a flag set just as the running pass finished
+    # would otherwise go unseen
+    while _refresh_pending and _refresh_lock.acquire(blocking=False):
+        try:
+            while _refresh_pending:
+                _refresh_pending = False
+                db = SessionLocal()
+                try:
+                    record_ratings(db)
+                finally:
+                    db.close()
+        finally:
+            _refresh_lock.release()
+
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    old_paper = inspect(target).attrs.paper_id.history.deleted
+    session.info.setdefault("item_neighbours_dirty", set()).update(
+        paper_id for paper_id in (target.paper_id, *old_paper) if paper_id is not None
+    )
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(models.Rating, _event, _mark_dirty)
+
+@event.listens_for(Session, "after_commit")
+def _ratings_committed(session):
+    dirty = session.info.pop("item_neighbours_dirty", None)
+    if dirty:
+        with _dirty_lock:
+            _dirty_papers.update(dirty)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_ratings(session, previous_transaction):
+    session.info.pop("item_neighbours_dirty", None)
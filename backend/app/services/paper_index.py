@@ -0,0 +1,232 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app import models
+from app.services.categories import category_ids
+
+# Papers and ratings written by other processes reach this one's index within this long
+PAPER_INDEX_TTL = 60.0
+
+class PaperCategoryIndex:
+    """
+    Papers as a sparse paper x category matrix plus a score vector
+
+    Row i is the paper paper_ids[i] and columns are category ids from the
+    categories table, with a row's entries in category id order.
+    """
+
+    def __init__(self, paper_ids: np.ndarray, scores: np.ndarray, categories: Dict[str, int], matrix: sparse.csr_matrix):
+        self.paper_ids = paper_ids
+        self.scores = scores
+        self.categories = categories
+        self.matrix = matrix
+        self._row_lengths = np.diff(matrix.indptr)
+        # Rating writes up to this sequence number are reflected in scores
+        self.scores_seq = 0
+
+    @classmethod
+    def build(
+        cls,
+        rows: Iterable[Tuple[int, Optional[float]]],
+        pairs: Iterable[Tuple[int, int]],
+        categories: Dict[str, int],
+    ) -> "PaperCategoryIndex":
+        """
+        Build from (paper_id, score) rows in id order, (paper_id,
+        category_id) pairs and the category dictionary
+        """
+        paper_ids, scores = [], []
+        for paper_id, score in rows:
+            paper_ids.append(paper_id)
+            scores.append(score or 0.0)
+        paper_ids = np.array(paper_ids, dtype=np.int64)
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        # Pairs of papers added since the rows were read are left out
+        positions = np.searchsorted(paper_ids, pairs[:, 0])
+        known = positions < len(paper_ids)
+        known[known] = paper_ids[positions[known]] == pairs[known, 0]
+        matrix = sparse.csr_matrix(
+            (np.ones(int(known.sum()), dtype=np.float32), (positions[known], pairs[known, 1])),
+            shape=(len(paper_ids), max(categories.values(), default=-1) + 1),
+        )
+        matrix.sort_indices()
+        return cls(paper_ids, np.array(scores, dtype=np.float64), categories, matrix)
+
+    def patch_scores(self, rows: Iterable[Tuple[int, Optional[float]]]) -> None:
+        """
+        Overwrite the scores of (paper_id, score) rows in place; ids the index
+        doesn't have are left out
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        ids = np.array([paper_id for paper_id, _ in rows], dtype=np.int64)
+        scores = np.array([score or 0.0 for _, score in rows], dtype=np.float64)
+        positions = np.searchsorted(self.paper_ids, ids)
+        known = positions < len(self.paper_ids)
+        known[known] = self.paper_ids[positions[known]] == ids[known]
+        self.scores[positions[known]] = scores[known]
+
+    def category_vector(self, category_ids: np.ndarray, weights: np.ndarray, default: float = 0.0) -> np.ndarray:
+        """
+        Dense per-category vector with weights[i] at column category_ids[i]
+
+        Ids added to the dictionary after the index was built have no
+        column and are left out.
+        """
+        vector = np.full(self.matrix.shape[1], default, dtype=np.float64)
+        known = category_ids < len(vector)
+        vector[category_ids[known]] = weights[known]
+        return vector
+
+    def boosted_scores(self, factors: np.ndarray) -> np.ndarray:
+        """
+        Each paper's score multiplied by the factor of every category it lists
+
+        Multiplies position by position across all rows at once, taking
+        each row's categories in category id order.
+        """
+        scores = self.scores.copy()
+        indptr, indices = self.matrix.indptr, self.matrix.indices
+        for position in range(int(self._row_lengths.max(initial=0))):
+            rows = np.flatnonzero(self._row_lengths > position)
+            scores[rows] *= factors[indices[indptr[rows] + position]]
+        return scores
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k largest values, largest first
+
+    Ties keep their original order, matching a stable descending sort,
+    but only the candidates at or above the k-th value are sorted.
+    """
+    if k <= 0 or len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(values):
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        candidates = np.flatnonzero(values >= kth)
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order[:k]]
+
+_index_lock = threading.Lock()
+_cached_index: Optional[PaperCategoryIndex] = None
+_cached_version = -1
+_built_at = 0.0
+# Bumped when a transaction that adds, removes or re-categorizes papers commits
+_version = 0
+# Bumped when a transaction that changes scores commits; _rescored maps each
+# rescored paper to the sequence number of its latest change since the build
+_score_seq = 0
+_rescored: Dict[int, int] = {}
+
+def invalidate_paper_index() -> None:
+    """
+    Rebuild the index on next use; for writes that bypass the ORM listeners
+    """
+    global _version
+    with _index_lock:
+        _version += 1
+
+def record_rescored_papers(paper_ids: Iterable[int]) -> None:
+    """
+    Patch these papers' scores into the index on next use instead of
+    rebuilding it
+    """
+    global _score_seq
+    with _index_lock:
+        _score_seq += 1
+        for paper_id in paper_ids:
+            _rescored[paper_id] = _score_seq
+
+def get_paper_index(db: Session) -> PaperCategoryIndex:
+    """
+    The shared index, rebuilt after this process commits paper writes, and
+    at least every PAPER_INDEX_TTL seconds for everyone else's
+
+    Checking costs no query. Committed rating writes only move scores, so
+    the papers they rescored are re-read by id and patched in place; a
+    rebuild reads paper ids and scores plus the paper_categories pairs,
+    with no string parsing.
+    """
+    global _cached_index, _cached_version, _built_at
+    now = time.monotonic()
+    with _index_lock:
+        version, seq, index = _version, _score_seq, _cached_index
+        fresh = index is not None and _cached_version == version and now - _built_at < PAPER_INDEX_TTL
+        if fresh:
+            if index.scores_seq == seq:
+                return index
+            rescored = [paper_id for paper_id, changed in _rescored.items() if changed > index.scores_seq]
+    if fresh:
+        rows = db.query(models.Paper.id, models.Paper.score).filter(models.Paper.id.in_(rescored)).all()
+        with _index_lock:
+            # Readers copy scores before using them, so patching in place is safe
+            index.patch_scores(rows)
+            index.scores_seq = max(index.scores_seq, seq)
+        return index
+    # Dictionary first, so every category id in the pairs has a column
+    categories = category_ids(db)
+    index = PaperCategoryIndex.build(
+        db.query(models.Paper.id, models.Paper.score).order_by(models.Paper.id).yield_per(10000),
+        db.query(models.PaperCategory.paper_id, models.PaperCategory.category_id).yield_per(10000),
+        categories,
+    )
+    # Scores were read after seq, so they include every change up to it
+    index.scores_seq = seq
+    with _index_lock:
+        # A commit during the build bumped _version, so the next call rebuilds
+        _cached_index, _cached_version, _built_at = index, version, now
+        for paper_id in [paper_id for paper_id, changed in _rescored.items() if changed <= seq]:
+            del _rescored[paper_id]
+    return index
+
+def _mark_stale(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["paper_index_stale"] = True
+
+def _mark_rescored(session, *paper_ids) -> None:
+    if session is not None:
+        session.info.setdefault("paper_index_rescored", set()).update(
+            paper_id for paper_id in paper_ids if paper_id is not None
+        )
+
+# Adding or removing a paper changes the rows and the category columns
+for _event in ("after_insert", "after_delete"):
+    event.listen(models.Paper, _event, _mark_stale)
+
+@event.listens_for(models.Paper, "after_update")
+def _paper_updated(mapper, connection, target):
+    if inspect(target).attrs.categories.history.has_changes():
+        _mark_stale(mapper, connection, target)
+    else:
+        _mark_rescored(object_session(target), target.id)
+
+# Rating writes move their papers' scores (see rating_aggregates)
+@event.listens_for(models.Rating, "after_insert")
+@event.listens_for(models.Rating, "after_update")
+@event.listens_for(models.Rating, "after_delete")
+def _rating_written(mapper, connection, target):
+    old_paper = inspect(target).attrs.paper_id.history.deleted
+    _mark_rescored(object_session(target), target.paper_id, *old_paper)
+
+@event.listens_for(Session, "after_commit")
+def _papers_committed(session):
+    if session.info.pop("paper_index_stale", False):
+        invalidate_paper_index()
+    rescored = session.info.pop("paper_index_rescored", None)
+    if rescored:
+        record_rescored_papers(rescored)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changes(session, previous_transaction):
+    session.info.pop("paper_index_stale", None)
+    session.info.pop("paper_index_rescored", None)
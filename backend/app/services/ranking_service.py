@@ -1,52 +1,144 @@
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import List
+from typing import Callable, List, Optional
+import sqlite3
+import numpy as np
 from app import models
-from app.services.recommendation_engine import calculate_paper_scores
+from app.services.day_summaries import paper_days
+from app.services.paper_index import invalidate_paper_index, top_k
+from app.server import ratings, summaries
+from app.services.rating_aggregates import paper_score
 
-def rank_daily_papers(db: Session, days_back: int = 1) -> List[models.Paper]:
+def rank_daily_papers(db: Session, days_back: int = 1, limit: Optional[int] = None) -> List[models.Paper]:
     """
     Ranks papers from the last N days using a combination of:
     - Paper score (from user ratings)
     - Recency
     - Number of ratings
+
+    Only the candidate papers' columns are read (a range scan on
+    published_date), scored as arrays, and only the top `limit` papers
+    (all candidates when None) are loaded, so the cost depends on the
+    window rather than the size of the catalog.
     """
-    cutoff_date = datetime.utcnow() - timedelta(days=days_back)
-    
+    now = datetime.utcnow()
+    cutoff_date = now - timedelta(days=days_back)
+
     # Get papers from the specified time period
-    papers = db.query(models.Paper).filter(
+    candidates = db.query(
+        models.Paper.id,
+        models.Paper.published_date,
+        models.Paper.rating_sum,
+        models.Paper.rating_count
+    ).filter(
         models.Paper.published_date >= cutoff_date
     ).all()
-    
-    # Calculate current scores
-    paper_scores = calculate_paper_scores(db)
-    
-    # Calculate ranking scores
-    ranked_papers = []
-    for paper in papers:
-        base_score = paper_scores.get(paper.id, 0)
-        
-        # Calculate time decay factor (newer papers get a boost)
-        hours_old = (datetime.utcnow() - paper.published_date).total_seconds() / 3600
-        time_decay = 1.0 / (1 + hours_old/24)  # Decay over 24 hours
-        
-        # Calculate final ranking score
-        ranking_score = base_score * time_decay
-        
-        ranked_papers.append((paper, ranking_score))
-    
-    # Sort papers by ranking score
-    ranked_papers.sort(key=lambda x: x[1], reverse=True)
-    
-    return [paper for paper, _ in ranked_papers]
-
-def update_paper_scores(db: Session):
+    if not candidates:
+        return []
+    # Ties rank in id order; sorted here rather than in SQL so the query
+    # stays a range scan on published_date
+    candidates.sort(key=lambda row: row[0])
+
+    paper_ids, published, rating_sums, rating_counts = zip(*candidates)
+    rating_sums = np.array(rating_sums, dtype=np.float64)
+    rating_counts = np.array(rating_counts, dtype=np.float64)
+
+    # Current scores from the rating aggregates; unrated papers score 0
+    rated = rating_counts > 0
+    base_scores = np.zeros(len(candidates))
+    base_scores[rated] = (rating_sums[rated] / rating_counts[rated]) * (1 - 1 / (rating_counts[rated] + 1))
+
+    # Calculate time decay factor (newer papers get a boost), decaying over 24 hours
+    hours_old = (np.datetime64(now) - np.array(published, dtype="datetime64[us]")) / np.timedelta64(1, "h")
+    time_decay = 1.0 / (1 + hours_old / 24)
+
+    ranking_scores = base_scores * time_decay
+    top = top_k(ranking_scores, len(candidates) if limit is None else limit)
+    ranked_ids = [paper_ids[i] for i in top]
+
+    papers = db.query(models.Paper).filter(models.Paper.id.in_(ranked_ids)).all()
+    papers_by_id = {paper.id: paper for paper in papers}
+    return [papers_by_id[paper_id] for paper_id in ranked_ids]
+
+# Papers (by id range) recomputed per statement and transaction
+SCORE_CHUNK_SIZE = 50000
+
+def update_paper_scores(
+    db: Session,
+    chunk_size: int = SCORE_CHUNK_SIZE,
+    start_after_id: int = 0,
+    on_chunk: Optional[Callable[[int], None]] = None
+) -> int:
     """
     Updates the score field for all papers based on current ratings
+
+    Recomputes rating_sum, rating_count and score from the raw ratings one
+    paper id range at a time: a single UPDATE ... FROM (aggregate) per
+    range where the database supports it, chunked bulk_update_mappings
+    otherwise. The rated papers' days get a new summary version and
+    max_score in the same transaction, so the server's cached lists and
+    ETags for those days change. Each range is committed on its own, so long
+    runs hold no long transaction; on_chunk receives the last paper id covered, and
+    passing it back as start_after_id resumes an interrupted run. Returns
+    the number of papers updated.
     """
-    scores = calculate_paper_scores(db)
-    for paper_id, score in scores.items():
-        paper = db.query(models.Paper).filter(models.Paper.id == paper_id).first()
-        if paper:
-            paper.score = score
-    db.commit() 
\ No newline at end of file
+    max_id = db.query(func.max(models.Paper.id)).scalar() or 0
+    set_based = _supports_update_from(db)
+    updated = 0
+    lower = start_after_id
+    while lower < max_id:
+        upper = lower + chunk_size
+        aggregates = select(
+            models.Rating.paper_id.label("paper_id"),
+            func.sum(models.Rating.rating).label("rating_sum"),
+            func.count(models.Rating.id).label("rating_count"),
+        ).where(
+            models.Rating.paper_id > lower,
+            models.Rating.paper_id <= upper
+        ).group_by(models.Rating.paper_id)
+
+        if set_based:
+            agg = aggregates.subquery()
+            papers = models.Paper.__table__
+            result = db.execute(
+                update(papers)
+                .where(papers.c.id == agg.c.paper_id)
+                .values(
+                    rating_sum=agg.c.rating_sum,
+                    rating_count=agg.c.rating_count,
+                    score=ratings.score_expression(agg.c.rating_sum, agg.c.rating_count, papers.c.score),
+                )
+            )
+            updated += result.rowcount
+        else:
+            rows = db.execute(aggregates).all()
+            db.bulk_update_mappings(models.Paper, [
+                {
+                    "id": paper_id,
+                    "rating_sum": rating_sum,
+                    "rating_count": rating_count,
+                    "score": paper_score(rating_sum, rating_count),
+                }
+                for paper_id, rating_sum, rating_count in rows
+            ])
+            updated += len(rows)
+
+        rated_ids = select(aggregates.subquery().c.paper_id)
+        summaries.touch_day_summaries(db, paper_days(db.execute(
+            select(models.Paper.published_date).where(models.Paper.id.in_(rated_ids)).distinct()
+        ).scalars()))
+        db.commit()
+        # Core and bulk updates skip the listeners that keep the index current
+        invalidate_paper_index()
+        if on_chunk:
+            on_chunk(upper)
+        lower = upper
+    return updated
+
+def _supports_update_from(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        return True
+    # UPDATE ... FROM arrived in SQLite 3.33
+    return dialect.name == "sqlite" and sqlite3.sqlite_version_info >= (3, 33)
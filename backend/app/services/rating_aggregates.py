@@ -0,0 +1,72 @@
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from typing import Dict, List
+from app import models
+from app.server import ratings, summaries
+from app.services import user_profiles  # noqa: F401  evicts the rated_users marked below on commit
+from app.services.day_summaries import paper_days
+
+def paper_score(rating_sum: float, rating_count: int) -> float:
+    """
+    Score from a paper's rating aggregates: average rating weighted by
+    number of ratings, avg * (1 - 1/(n + 1))
+    """
+    return (rating_sum / rating_count) * (1 - 1/(rating_count + 1))
+
+def _apply(connection, paper_id, sum_delta: int, count_delta: int) -> None:
+    if paper_id is None or (sum_delta == 0 and count_delta == 0):
+        return
+    connection.execute(ratings.aggregate_update(), {
+        "paper_id": paper_id, "sum_delta": sum_delta, "count_delta": count_delta
+    })
+    # The score moved, so the server's list and ETag for the paper's day must too
+    summaries.touch_day_summaries(connection, paper_days(connection.execute(
+        select(models.Paper.published_date).where(models.Paper.id == paper_id)
+    ).scalars()))
+
+# Rating writes through the ORM move the paper's aggregates in the same
+# transaction, with the server's aggregate UPDATE. Core/bulk writes bypass
+# these; reconcile_rating_aggregates catches any drift.
+@event.listens_for(models.Rating, "after_insert")
+def _rating_inserted(mapper, connection, target):
+    _apply(connection, target.paper_id, target.rating or 0, 1)
+
+# active_history loads the previous value when an expired rating is
+# modified, so after_update always knows what to subtract
+@event.listens_for(models.Rating.rating, "set", active_history=True)
+@event.listens_for(models.Rating.paper_id, "set", active_history=True)
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+@event.listens_for(models.Rating, "after_update")
+def _rating_updated(mapper, connection, target):
+    state = inspect(target)
+    old_rating = state.attrs.rating.history.deleted
+    old_paper = state.attrs.paper_id.history.deleted
+    previous_rating = old_rating[0] if old_rating else target.rating
+    previous_paper = old_paper[0] if old_paper else target.paper_id
+    if previous_paper != target.paper_id:
+        _apply(connection, previous_paper, -(previous_rating or 0), -1)
+        _apply(connection, target.paper_id, target.rating or 0, 1)
+    else:
+        _apply(connection, target.paper_id, (target.rating or 0) - (previous_rating or 0), 0)
+
+@event.listens_for(models.Rating, "after_delete")
+def _rating_deleted(mapper, connection, target):
+    _apply(connection, target.paper_id, -(target.rating or 0), -1)
+
+def reconcile_rating_aggregates(db: Session, repair: bool = True) -> Dict[str, List[Dict]]:
+    """
+    The server's ratings.reconcile_rating_aggregates, with the days read
+    through this app's models and the repaired users' cached profiles
+    dropped once the caller commits
+    """
+    mismatches = ratings.rating_aggregate_mismatches(db)
+    if repair:
+        ratings.repair_rating_aggregates(db, mismatches)
+        paper_ids = [row["paper_id"] for row in mismatches["papers"]]
+        summaries.touch_day_summaries(db, paper_days(db.execute(
+            select(models.Paper.published_date).where(models.Paper.id.in_(paper_ids)).distinct()
+        ).scalars()))
+        db.info.setdefault("rated_users", set()).update(row["user_id"] for row in mismatches["category_stats"])
+    return mismatches
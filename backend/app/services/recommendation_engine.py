@@ -1,53 +1,48 @@
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app import models
-from collections import defaultdict
+from app.config import settings
+from app.services.ann_index import get_ann_index
+from app.services.factor_model import FactorModel, get_factor_model
+from app.services.item_similarity import get_item_neighbours
+from app.services.paper_index import PaperCategoryIndex, get_paper_index, top_k
+from app.services.text_index import get_text_index
+from app.services.rating_aggregates import paper_score
+from app.services.user_profiles import get_user_profile
 
 def calculate_paper_scores(db: Session) -> Dict[int, float]:
     """
     Calculates scores for papers based on user ratings
-    Currently using a simple average rating system
+    Currently using a simple average rating system, computed from each
+    paper's running rating_sum/rating_count instead of a GROUP BY over ratings
     """
-    ratings = db.query(
-        models.Rating.paper_id,
-        func.avg(models.Rating.rating).label('avg_rating'),
-        func.count(models.Rating.id).label('rating_count')
-    ).group_by(models.Rating.paper_id).all()
-    
-    scores = {}
-    for paper_id, avg_rating, rating_count in ratings:
-        # Simple scoring formula: average rating weighted by number of ratings
-        score = avg_rating * (1 - 1/(rating_count + 1))
-        scores[paper_id] = score
-    
-    return scores
+    aggregates = db.query(
+        models.Paper.id,
+        models.Paper.rating_sum,
+        models.Paper.rating_count
+    ).filter(models.Paper.rating_count > 0).all()
+
+    return {
+        paper_id: paper_score(rating_sum, rating_count)
+        for paper_id, rating_sum, rating_count in aggregates
+    }
 
 def get_user_preferences(db: Session, user_id: int) -> Dict[str, float]:
     """
     Analyzes user's ratings to determine their preferences for different categories
+    Read from the user's running per-category profile rather than a scan
+    of their rating history
     """
-    user_ratings = db.query(
-        models.Rating.rating,
-        models.Paper.categories
-    ).join(
-        models.Paper,
-        models.Rating.paper_id == models.Paper.id
-    ).filter(
-        models.Rating.user_id == user_id
-    ).all()
-    
-    category_scores = defaultdict(list)
-    for rating, categories in user_ratings:
-        for category in categories.split():
-            category_scores[category].append(rating)
-    
-    preferences = {}
-    for category, ratings in category_scores.items():
-        avg_rating = sum(ratings) / len(ratings)
-        preferences[category] = avg_rating
-    
-    return preferences
+    return get_user_profile(db, user_id).preferences()
+
+def load_papers(db: Session, paper_ids: List[int]) -> List[models.Paper]:
+    """
+    Papers by id, in the order given
+    """
+    papers = db.query(models.Paper).filter(models.Paper.id.in_(paper_ids)).all()
+    papers_by_id = {paper.id: paper for paper in papers}
+    return [papers_by_id[paper_id] for paper_id in paper_ids if paper_id in papers_by_id]
 
 def get_personalized_recommendations(
     db: Session,
@@ -56,27 +51,90 @@ def get_personalized_recommendations(
 ) -> List[models.Paper]:
     """
     Gets personalized paper recommendations for a user
-    Currently using a simple category-based approach
     """
-    preferences = get_user_preferences(db, user_id)
-    if not preferences:
+    return load_papers(db, get_personalized_paper_ids(db, user_id, limit))
+
+def get_personalized_paper_ids(
+    db: Session,
+    user_id: int,
+    limit: int = 10,
+    index: Optional[PaperCategoryIndex] = None
+) -> List[int]:
+    """
+    Ids of a user's recommended papers, best first
+    Uses the latest matrix-factorization model for users it was trained
+    on, and otherwise a simple category-based approach, scored over the
+    shared paper x category index (callers scoring many users can pass
+    the index in)
+    """
+    model = get_factor_model()
+    user_vector = model.user_vector(user_id) if model is not None else None
+    if user_vector is not None:
+        return _factor_paper_ids(db, model, user_id, user_vector, limit)
+
+    category_ids, averages = get_user_profile(db, user_id).rated()
+    if len(category_ids) == 0:
         # If no preferences yet, return highest rated papers
-        return db.query(models.Paper).order_by(
+        return [paper_id for paper_id, in db.query(models.Paper.id).order_by(
             models.Paper.score.desc()
-        ).limit(limit).all()
-    
-    # Get papers and calculate a personalized score based on user preferences
-    papers = db.query(models.Paper).all()
-    paper_scores = []
+        ).limit(limit)]
     
-    for paper in papers:
-        score = paper.score
-        # Boost score based on matching categories
-        for category in paper.categories.split():
-            if category in preferences:
-                score *= (1 + preferences[category] / 5)  # Normalize by max rating
-        paper_scores.append((paper, score))
-    
-    # Sort papers by personalized score and return top results
-    paper_scores.sort(key=lambda x: x[1], reverse=True)
-    return [paper for paper, _ in paper_scores[:limit]] 
\ No newline at end of file
+    # Each matching category multiplies the paper's score by
+    # (1 + preference / 5), normalized by the max rating
+    if index is None:
+        index = get_paper_index(db)
+    factors = index.category_vector(category_ids, 1 + averages / 5, default=1.0)
+    paper_scores = index.boosted_scores(factors)
+    return [int(paper_id) for paper_id in index.paper_ids[top_k(paper_scores, limit)]]
+
+def _factor_paper_ids(
+    db: Session,
+    model: FactorModel,
+    user_id: int,
+    user_vector: np.ndarray,
+    limit: int
+) -> List[int]:
+    """
+    Papers with the highest factor affinity that the user hasn't rated
+    """
+    scores = model.scores(user_vector)
+    rated = [paper_id for paper_id, in db.query(models.Rating.paper_id).filter(models.Rating.user_id == user_id)]
+    scores[np.isin(model.paper_ids, rated)] = -np.inf
+    best = top_k(scores, limit)
+    return [int(paper_id) for paper_id in model.paper_ids[best[np.isfinite(scores[best])]]]
+
+def get_similar_papers(
+    db: Session,
+    paper_id: int,
+    limit: int = 10
+) -> Optional[List[models.Paper]]:
+    """
+    Gets the papers whose title and abstract are closest to a paper's,
+    by TF-IDF cosine similarity; None if the paper doesn't exist
+
+    Searched approximately through the IVF index when one is configured,
+    otherwise (or if it can't answer for this paper) exactly.
+    """
+    if db.query(models.Paper.id).filter(models.Paper.id == paper_id).first() is None:
+        return None
+
+    text_index = get_text_index(db)
+    ann_index = get_ann_index()
+    similar = ann_index.similar(text_index, paper_id, limit, settings.ANN_NPROBE) if ann_index is not None else None
+    if similar is None:
+        similar = text_index.similar(paper_id, limit)
+    return load_papers(db, [similar_id for similar_id, _ in similar])
+
+def get_also_liked_papers(
+    db: Session,
+    paper_id: int,
+    limit: int = 10
+) -> Optional[List[models.Paper]]:
+    """
+    Gets the papers most liked by people who liked a paper, from the
+    precomputed item-item neighbour lists; None if the paper doesn't exist
+    """
+    if db.query(models.Paper.id).filter(models.Paper.id == paper_id).first() is None:
+        return None
+
+    return load_papers(db, get_item_neighbours(db).neighbours_of(paper_id, limit))
@@ -0,0 +1,355 @@
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session, object_session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.services.paper_index import top_k
+from app.utils.helpers import clean_text
+
+TOKEN = re.compile(r"[a-z][a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Lowercased word tokens of a cleaned title or abstract
+    """
+    return TOKEN.findall(clean_text(text or "").lower())
+
+class TextIndex:
+    """
+    TF-IDF over paper titles and abstracts, for content similarity
+
+    Keeps raw term counts as a paper x term CSR matrix (int32 term ids) plus
+    per-term document frequencies, so papers can be appended without
+    re-reading the old ones; the normalized TF-IDF matrix is derived from
+    them on the first query after a change. Rows are in paper id order.
+    """
+
+    def __init__(self, paper_ids: np.ndarray, vocabulary: Dict[str, int], counts: sparse.csr_matrix, doc_freq: np.ndarray):
+        self.paper_ids = paper_ids
+        self.vocabulary = vocabulary
+        self.counts = counts
+        self.doc_freq = doc_freq
+        self._weights: Optional[sparse.csr_matrix] = None
+        self._terms: Optional[List[str]] = None
+
+    @classmethod
+    def empty(cls) -> "TextIndex":
+        return cls(
+            np.empty(0, dtype=np.int64), {},
+            sparse.csr_matrix((0, 0), dtype=np.float32), np.empty(0, dtype=np.int32),
+        )
+
+    def copy(self) -> "TextIndex":
+        """
+        A copy that can be extended while readers keep using this one;
+        add and remove replace arrays rather than writing into them
+        """
+        return type(self)(self.paper_ids, dict(self.vocabulary), self.counts, self.doc_freq)
+
+    def __len__(self) -> int:
+        return len(self.paper_ids)
+
+    @property
+    def terms(self) -> List[str]:
+        """
+        The vocabulary by column; columns are numbered in the order terms
+        were first seen, so they differ between indexes built separately
+        """
+        if self._terms is None:
+            terms = [""] * len(self.vocabulary)
+            for term, column in self.vocabulary.items():
+                terms[column] = term
+            self._terms = terms
+        return self._terms
+
+    @property
+    def last_paper_id(self) -> int:
+        return int(self.paper_ids[-1]) if len(self.paper_ids) else 0
+
+    def add(self, rows: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> int:
+        """
+        Index (paper_id, title, abstract) rows whose ids aren't indexed yet;
+        returns how many were added
+        """
+        # Typed arrays: a list of Python ints costs ~9x the memory
+        paper_ids, indices, indptr = array("q"), array("i"), array("q", [0])
+        vocabulary = self.vocabulary
+        last_paper_id = self.last_paper_id
+        in_order = True
+        for paper_id, title, abstract in rows:
+            if paper_id <= last_paper_id:
+                if self.position(paper_id) is not None:
+                    continue
+                # Re-indexed after an edit: rows are sorted back into id order below
+                in_order = False
+            last_paper_id = max(last_paper_id, paper_id)
+            paper_ids.append(paper_id)
+            tokens = tokenize(f"{title or ''} {abstract or ''}")
+            for token in set(tokens).difference(vocabulary):
+                vocabulary[token] = len(vocabulary)
+                if self._terms is not None:
+                    self._terms.append(token)
+            indices.extend(map(vocabulary.__getitem__, tokens))
+            indptr.append(len(indices))
+        if not paper_ids:
+            return 0
+
+        n_terms = len(self.vocabulary)
+        # Duplicate (row, term) entries are summed into counts on conversion
+        added = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.frombuffer(indices, dtype=np.int32), np.frombuffer(indptr, dtype=np.int64)),
+            shape=(len(paper_ids), n_terms),
+        )
+        added.sum_duplicates()
+        old = self.counts
+        old = sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], n_terms))
+        counts = sparse.vstack([old, added], format="csr", dtype=np.float32)
+        doc_freq = np.zeros(n_terms, dtype=np.int32)
+        doc_freq[:len(self.doc_freq)] = self.doc_freq
+        doc_freq += np.bincount(added.indices, minlength=n_terms).astype(np.int32)
+        self.doc_freq = doc_freq
+        self.paper_ids = np.concatenate([self.paper_ids, np.frombuffer(paper_ids, dtype=np.int64)])
+        if not in_order:
+            order = np.argsort(self.paper_ids, kind="stable")
+            self.paper_ids, counts = self.paper_ids[order], counts[order]
+        counts.indices = counts.indices.astype(np.int32, copy=False)
+        self.counts = counts
+        self._weights = None
+        return len(paper_ids)
+
+    def remove(self, paper_ids: Iterable[int]) -> int:
+        """
+        Drop papers from the index; returns how many were in it
+
+        Their terms stay in the vocabulary, with lower document frequencies.
+        """
+        dropped = np.isin(self.paper_ids, np.fromiter(paper_ids, dtype=np.int64))
+        if not dropped.any():
+            return 0
+        # Each row holds a term at most once, so its indices count documents
+        self.doc_freq = self.doc_freq - np.bincount(
+            self.counts[dropped].indices, minlength=len(self.doc_freq)
+        ).astype(np.int32)
+        counts = self.counts[~dropped]
+        counts.indices = counts.indices.astype(np.int32, copy=False)
+        self.counts = counts
+        self.paper_ids = self.paper_ids[~dropped]
+        self._weights = None
+        return int(dropped.sum())
+
+    def position(self, paper_id: int) -> Optional[int]:
+        """
+        paper_id's row, or None if it isn't indexed
+        """
+        position = int(np.searchsorted(self.paper_ids, paper_id))
+        if position == len(self) or self.paper_ids[position] != paper_id:
+            return None
+        return position
+
+    def weights(self) -> sparse.csr_matrix:
+        """
+        Sublinear-tf, smoothed-idf rows scaled to unit length, so a dot
+        product between two rows is their cosine similarity
+        """
+        if self._weights is None:
+            idf = np.log((1 + len(self)) / (1 + self.doc_freq.astype(np.float64))) + 1
+            weights = self.counts.copy()
+            weights.data = ((1 + np.log(weights.data)) * idf[weights.indices]).astype(np.float32)
+            norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            weights.data /= np.repeat(norms, np.diff(weights.indptr)).astype(np.float32)
+            self._weights = weights
+        return self._weights
+
+    def similar(self, paper_id: int, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        The k papers most similar to paper_id as (paper_id, cosine), best
+        first; empty if the paper isn't indexed
+        """
+        position = self.position(paper_id)
+        if position is None:
+            return []
+        weights = self.weights()
+        similarities = weights @ weights[position].toarray().ravel()
+        similarities[position] = 0
+        best = top_k(similarities, k)
+        best = best[similarities[best] > 0]
+        return [(int(self.paper_ids[i]), float(similarities[i])) for i in best]
+
+    def save(self, path: str) -> None:
+        """
+        Write to path atomically, as an uncompressed .npz without pickles
+        """
+        terms = np.array(self.terms, dtype=object)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                paper_ids=self.paper_ids,
+                terms=terms.astype(str) if len(terms) else np.empty(0, dtype="<U1"),
+                data=self.counts.data,
+                indices=self.counts.indices,
+                indptr=self.counts.indptr,
+                doc_freq=self.doc_freq,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TextIndex":
+        with np.load(path, allow_pickle=False) as saved:
+            terms = saved["terms"]
+            counts = sparse.csr_matrix(
+                (saved["data"], saved["indices"], saved["indptr"]),
+                shape=(len(saved["paper_ids"]), len(terms)),
+            )
+            return cls(saved["paper_ids"], {str(term): column for column, term in enumerate(terms)}, counts, saved["doc_freq"])
+
+_index_lock = threading.Lock()
+_cached_index: Optional[TextIndex] = None
+# When the index was last brought up to date, by time.monotonic()
+_updated_at = 0.0
+# Papers whose text this process's committed transactions changed, or that
+# they deleted
+_changed_lock = threading.Lock()
+_changed_papers: Set[int] = set()
+
+def _take_changed_papers() -> Set[int]:
+    global _changed_papers
+    with _changed_lock:
+        changed, _changed_papers = _changed_papers, set()
+    return changed
+
+def _load_saved_index() -> TextIndex:
+    path = settings.TEXT_INDEX_PATH
+    if path and os.path.exists(path):
+        try:
+            return TextIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            # Unreadable or from an older layout: rebuild from the database
+            pass
+    return TextIndex.empty()
+
+def update_text_index(db: Session, index: TextIndex) -> TextIndex:
+    """
+    index brought up to date with the papers table: an updated copy, so
+    requests holding index never see it half-updated, or index itself if
+    nothing changed
+
+    New papers are the ids above the last indexed one. Edits and deletes
+    committed in this process are collected by the paper listeners below
+    and re-indexed; other processes' edits and deletes are only picked up
+    by a rebuild (delete TEXT_INDEX_PATH and restart).
+    """
+    global _updated_at
+    _updated_at = time.monotonic()
+    changed = _take_changed_papers()
+    max_paper_id = db.query(func.max(models.Paper.id)).scalar() or 0
+    if max_paper_id < index.last_paper_id:
+        # The table was reset under us (ids went backwards)
+        index, changed = TextIndex.empty(), set()
+    if not changed and max_paper_id == index.last_paper_id:
+        return index
+
+    index = index.copy()
+    last_paper_id = index.last_paper_id
+    index.remove(changed)
+    index.add(
+        db.query(models.Paper.id, models.Paper.title, models.Paper.abstract)
+          .filter(or_(models.Paper.id > last_paper_id, models.Paper.id.in_(sorted(changed))))
+          .order_by(models.Paper.id)
+          .yield_per(10000)
+    )
+    if settings.TEXT_INDEX_PATH:
+        index.save(settings.TEXT_INDEX_PATH)
+    return index
+
+def get_text_index(db: Session) -> TextIndex:
+    """
+    The shared text index, loaded from TEXT_INDEX_PATH and caught up on
+    first use
+
+    Reads never update it; refresh_in_background does, after paper writes,
+    and refresh_when_stale from similar-paper requests picks up papers other
+    processes ingest. Each update rewrites the saved file, so a restart
+    loads it instead of re-reading every abstract.
+    """
+    global _cached_index
+    index = _cached_index
+    if index is not None:
+        return index
+    with _index_lock:
+        if _cached_index is None:
+            _cached_index = update_text_index(db, _load_saved_index())
+        return _cached_index
+
+_refresh_lock = threading.Lock()
+_refresh_pending = False
+
+def refresh_in_background() -> None:
+    """
+    Run after a response has been sent (a FastAPI background task), with
+    its own session; does nothing until the index has been loaded
+
+    Requests that arrive while a refresh runs only leave a flag for it, so
+    a burst of writes costs one extra pass rather than one each.
+    """
+    global _cached_index, _refresh_pending
+    _refresh_pending = True
+    # Retried after release: a flag set just as the running pass finished
+    # would otherwise go unseen
+    while _refresh_pending and _refresh_lock.acquire(blocking=False):
+        try:
+            while _refresh_pending:
+                _refresh_pending = False
+                if _cached_index is None:
+                    continue
+                db = SessionLocal()
+                try:
+                    _cached_index = update_text_index(db, _cached_index)
+                finally:
+                    db.close()
+        finally:
+            _refresh_lock.release()
+
+def refresh_when_stale() -> None:
+    """
+    refresh_in_background, if the index was last updated more than
+    TEXT_INDEX_REFRESH_SECONDS ago
+    """
+    if time.monotonic() - _updated_at >= settings.TEXT_INDEX_REFRESH_SECONDS:
+        refresh_in_background()
+
+def _mark_changed(session: Optional[Session], paper_id: int) -> None:
+    if session is not None:
+        session.info.setdefault("text_index_changed", set()).add(paper_id)
+
+@event.listens_for(models.Paper, "after_update")
+def _paper_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.title.history.has_changes() or attrs.abstract.history.has_changes():
+        _mark_changed(object_session(target), target.id)
+
+@event.listens_for(models.Paper, "after_delete")
+def _paper_deleted(mapper, connection, target):
+    _mark_changed(object_session(target), target.id)
+
+@event.listens_for(Session, "after_commit")
+def _papers_committed(session):
+    changed = session.info.pop("text_index_changed", None)
+    if changed:
+        with _changed_lock:
+            _changed_papers.update(changed)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_papers(session, previous_transaction):
+    session.info.pop("text_index_changed", None)
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from app import models
+from app.server import ratings
+from app.services.categories import paper_category_ids
+
+PROFILE_CACHE_SIZE = 10000
+# Ratings written by other processes reach this one's cache within this long
+PROFILE_CACHE_TTL = 60.0
+
+class UserProfile:
+    """
+    A user's running rating sum and count per category, as parallel arrays
+    indexed by category id from the categories table
+    """
+
+    def __init__(self, category_ids: np.ndarray, names: List[str], sums: np.ndarray, counts: np.ndarray):
+        self.category_ids = category_ids
+        self.names = names
+        self.sums = sums
+        self.counts = counts
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[int, str, int, int]]) -> "UserProfile":
+        """
+        Build from (category_id, name, rating_sum, rating_count) rows
+        """
+        return cls(
+            np.array([category_id for category_id, _, _, _ in rows], dtype=np.int32),
+            [name for _, name, _, _ in rows],
+            np.array([rating_sum for _, _, rating_sum, _ in rows], dtype=np.int64),
+            np.array([rating_count for _, _, _, rating_count in rows], dtype=np.int32),
+        )
+
+    def rated(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (category ids, average ratings) of the categories the user has rated
+        """
+        rated = self.counts > 0
+        return self.category_ids[rated], self.sums[rated] / self.counts[rated]
+
+    def preferences(self) -> Dict[str, float]:
+        """
+        Average rating per category the user has rated, by name
+        """
+        return {
+            name: rating_sum / rating_count
+            for name, rating_sum, rating_count in zip(self.names, self.sums.tolist(), self.counts.tolist())
+            if rating_count > 0
+        }
+
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[int, Tuple[float, UserProfile]]" = OrderedDict()
+
+def get_user_profile(db: Session, user_id: int) -> UserProfile:
+    """
+    The user's profile from the in-process LRU, or one primary-key range
+    read of user_category_stats on a miss
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached is not None and now - cached[0] < PROFILE_CACHE_TTL:
+            _cache.move_to_end(user_id)
+            return cached[1]
+    rows = db.execute(
+        select(
+            models.UserCategoryStat.category_id,
+            models.Category.name,
+            models.UserCategoryStat.rating_sum,
+            models.UserCategoryStat.rating_count,
+        )
+        .join(models.Category, models.Category.id == models.UserCategoryStat.category_id)
+        .where(models.UserCategoryStat.user_id == user_id)
+    ).all()
+    profile = UserProfile.from_rows(rows)
+    with _cache_lock:
+        _cache[user_id] = (now, profile)
+        _cache.move_to_end(user_id)
+        while len(_cache) > PROFILE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return profile
+
+def evict_profiles(user_ids) -> None:
+    with _cache_lock:
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+
+def _apply(connection, target, user_id, paper_id, sum_delta: int, count_delta: int) -> None:
+    if user_id is None or paper_id is None or (sum_delta == 0 and count_delta == 0):
+        return
+    category_ids = paper_category_ids(connection, paper_id)
+    if not category_ids:
+        return
+    connection.execute(ratings.profile_upsert_rows(connection, {
+        (user_id, category_id): (sum_delta, count_delta) for category_id in category_ids
+    }))
+    # Cached profiles are dropped once the transaction commits
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("rated_users", set()).add(user_id)
+
+# Rating writes through the ORM move the rater's profile in the same
+# transaction, like the paper aggregates in rating_aggregates
+@event.listens_for(models.Rating, "after_insert")
+def _rating_inserted(mapper, connection, target):
+    _apply(connection, target, target.user_id, target.paper_id, target.rating or 0, 1)
+
+# active_history loads the previous value when an expired rating is
+# modified, so after_update always knows what to subtract
+@event.listens_for(models.Rating.rating, "set", active_history=True)
+@event.listens_for(models.Rating.paper_id, "set", active_history=True)
+@event.listens_for(models.Rating.user_id, "set", active_history=True)
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+@event.listens_for(models.Rating, "after_update")
+def _rating_updated(mapper, connection, target):
+    state = inspect(target)
+    old_rating = state.attrs.rating.history.deleted
+    old_paper = state.attrs.paper_id.history.deleted
+    old_user = state.attrs.user_id.history.deleted
+    previous_rating = old_rating[0] if old_rating else target.rating
+    previous_paper = old_paper[0] if old_paper else target.paper_id
+    previous_user = old_user[0] if old_user else target.user_id
+    if (previous_user, previous_paper) != (target.user_id, target.paper_id):
+        _apply(connection, target, previous_user, previous_paper, -(previous_rating or 0), -1)
+        _apply(connection, target, target.user_id, target.paper_id, target.rating or 0, 1)
+    else:
+        _apply(connection, target, target.user_id, target.paper_id, (target.rating or 0) - (previous_rating or 0), 0)
+
+@event.listens_for(models.Rating, "after_delete")
+def _rating_deleted(mapper, connection, target):
+    _apply(connection, target, target.user_id, target.paper_id, -(target.rating or 0), -1)
+
+@event.listens_for(Session, "after_commit")
+def _evict_rated_users(session):
+    evict_profiles(session.info.pop("rated_users", ()))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rated_users(session, previous_transaction):
+    session.info.pop("rated_users", None)
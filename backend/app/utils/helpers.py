@@ -2,14 +2,19 @@ from datetime import datetime
 from typing import List, Dict
 import re
 
+# Compiled once: clean_text runs over every title and abstract when the
+# text index is built
+LATEX_COMMAND = re.compile(r'\\[a-zA-Z]+\{([^}]*)\}')
+WHITESPACE = re.compile(r'\s+')
+
 def clean_text(text: str) -> str:
     """
     Cleans text by removing extra whitespace and special characters
     """
     # Remove LaTeX commands
-    text = re.sub(r'\\[a-zA-Z]+\{([^}]*)\}', r'\1', text)
+    text = LATEX_COMMAND.sub(r'\1', text)
     # Remove multiple spaces
-    text = re.sub(r'\s+', ' ', text)
+    text = WHITESPACE.sub(' ', text)
     return text.strip()
 
 def parse_authors(authors_str: str) -> List[str]:
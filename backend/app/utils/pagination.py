@@ -0,0 +1,23 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+def encode_cursor(published_date: Optional[datetime], score: float, paper_id: int) -> str:
+    """
+    Encodes a paper's (published_date, score, id) sort key as an opaque cursor
+    """
+    key = [published_date.isoformat() if published_date is not None else None, score, paper_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], float, int]:
+    """
+    Decodes a cursor produced by encode_cursor, raising ValueError if it is malformed
+    """
+    try:
+        published_date, score, paper_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if published_date is not None:
+            published_date = datetime.fromisoformat(published_date)
+        return published_date, float(score), int(paper_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
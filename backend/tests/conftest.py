@@ -1,22 +1,38 @@
+import os
+import tempfile
+
+# Point the app's own engines at the test database before app modules load;
+# it lives in a temporary directory rather than the working tree
+TEST_DB = os.path.join(tempfile.mkdtemp(prefix="backend-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import itertools
+from datetime import datetime
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
-from typing import Generator, Dict
+from typing import Callable, Dict, Generator, List
 
-from app.database import Base, get_db
-from app.main import app
-from app import models
+from app.database import Base, get_async_db, get_db
+from main import app
+from app import models, schemas
 from app.controllers import user_controller
 
 # Test database URL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DB}")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 @pytest.fixture(scope="function")
 def db() -> Generator:
     # Create the test database and tables
@@ -30,6 +46,32 @@ def db() -> Generator:
         # Clean up after the test
         Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(scope="function")
+def add_papers(db: TestingSessionLocal) -> Callable[[List[Dict]], List[models.Paper]]:
+    """
+    Inserts and commits a paper per row of column values, through the ORM
+    so the listeners index them; columns a row leaves out get defaults
+    """
+    numbers = itertools.count()
+
+    def add(rows: List[Dict]) -> List[models.Paper]:
+        papers = []
+        for row in rows:
+            number = next(numbers)
+            papers.append(models.Paper(**{
+                "arxiv_id": f"2401.{number:05d}",
+                "title": f"Paper {number}",
+                "abstract": "Abstract",
+                "authors": "Author",
+                "categories": "cs.AI",
+                "published_date": datetime.utcnow(),
+                **row,
+            }))
+        db.add_all(papers)
+        db.commit()
+        return papers
+    return add
+
 @pytest.fixture(scope="function")
 def client(db: TestingSessionLocal) -> Generator:
     def override_get_db():
@@ -38,7 +80,12 @@ def client(db: TestingSessionLocal) -> Generator:
         finally:
             db.close()
 
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as async_db:
+            yield async_db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -49,7 +96,7 @@ def test_user(db: TestingSessionLocal) -> Dict:
         "email": "test@example.com",
         "password": "testpassword123"
     }
-    db_user = user_controller.create_user(db, models.UserCreate(**user_data))
+    db_user = user_controller.create_user(db, schemas.UserCreate(**user_data))
     return {"user": db_user, "password": user_data["password"]}
 
 @pytest.fixture(scope="function")
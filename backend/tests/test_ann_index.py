@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import ann_index, recommendation_engine, text_index
+
+def test_ivf_index(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = np.arange(1000, 1500)
+
+    path = str(tmp_path / "ivf")
+    index = ann_index.IVFIndex.train(vectors, n_lists=8, path=path)
+    # Inserted in two batches, like two days of papers
+    index.add(ids[:300], vectors[:300])
+    index.add(ids[300:], vectors[300:])
+
+    reopened = ann_index.IVFIndex.open(path)
+    assert len(reopened) == 500 and len(reopened.segments) == 2
+    assert isinstance(reopened.segments[0].vectors, np.memmap)
+
+    query = vectors[42]
+    exact = ids[np.argsort(-(vectors @ query), kind="stable")[:5]]
+    # Probing every list is exact search
+    found, scores = reopened.search(query, k=5, nprobe=8)
+    assert found.tolist() == exact.tolist()
+    assert scores[0] == pytest.approx(1.0)
+    # Probing one list still finds the query's own vector first
+    assert reopened.search(query, k=5, nprobe=1)[0][0] == 1042
+
+    reopened.compact()
+    assert len(reopened.segments) == 1
+    assert ann_index.IVFIndex.open(path).search(query, k=5, nprobe=8)[0].tolist() == exact.tolist()
+
+
+def test_ivf_index_survives_a_crash_during_compact(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = np.arange(200)
+    path = str(tmp_path / "ivf")
+    index = ann_index.IVFIndex.train(vectors, n_lists=4, path=path)
+    index.add(ids[:100], vectors[:100])
+    index.add(ids[100:], vectors[100:])
+
+    # Merged segment written, manifest not yet replaced: the old segments stand
+    def crash(self):
+        raise OSError("crashed")
+    monkeypatch.setattr(ann_index.IVFIndex, "_write_manifest", crash)
+    with pytest.raises(OSError):
+        ann_index.IVFIndex.open(path).compact()
+    monkeypatch.undo()
+    reopened = ann_index.IVFIndex.open(path)
+    assert len(reopened.segments) == 2
+    assert sorted(np.concatenate([segment.ids for segment in reopened.segments]).tolist()) == ids.tolist()
+
+    # Manifest replaced, old segments not yet removed: only the merged one counts
+    monkeypatch.setattr(ann_index.IVFIndex, "_remove_unlisted_segments", crash)
+    with pytest.raises(OSError):
+        reopened.compact()
+    monkeypatch.undo()
+    reopened = ann_index.IVFIndex.open(path)
+    assert len(reopened.segments) == 1
+    assert sorted(reopened.segments[0].ids.tolist()) == ids.tolist()
+
+    # The next compaction or rebuild clears what was left behind
+    reopened.add(np.array([500]), vectors[:1])
+    reopened.compact()
+    assert sorted(name for name in os.listdir(path) if name.startswith("segment-")) == [os.path.basename(reopened.segments[0].path)]
+
+
+def test_text_vectorizer_freezes_idf(tmp_path):
+    rows = [(1, "Graph networks", "Message passing"), (2, "Graph kernels", "Kernel methods"), (3, "Protein folding", "Structure")]
+    index = text_index.TextIndex.empty()
+    index.add(rows)
+    vectorizer = ann_index.TextVectorizer.fit(index, dim=32)
+    before = vectorizer.transform(index)
+    assert np.allclose(before, ann_index.paper_vectors(index, dim=32))
+
+    # New papers shift the text index's idf and add terms; the fitted
+    # vectorizer still maps the old papers to the same vectors
+    new_rows = [(4, "Graph transformers", "Attention"), (5, "Graph pooling", "Readout")]
+    index.add(new_rows)
+    assert np.allclose(vectorizer.transform(index, np.arange(3)), before)
+    # So does a text index built separately, with its terms numbered differently
+    rebuilt = text_index.TextIndex.empty()
+    rebuilt.add(reversed(rows + new_rows))
+    assert rebuilt.terms != index.terms
+    assert np.allclose(vectorizer.transform(rebuilt), vectorizer.transform(index))
+    assert not np.allclose(ann_index.paper_vectors(index, np.arange(3), dim=32), before)
+
+    vectorizer.save(str(tmp_path / "vectorizer.npz"))
+    loaded = ann_index.TextVectorizer.load(str(tmp_path / "vectorizer.npz"))
+    assert np.allclose(loaded.transform(index), vectorizer.transform(index))
+
+
+def test_similar_papers_through_ann_index(db, add_papers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_INDEX_PATH", None)
+    monkeypatch.setattr(text_index, "_cached_index", None)
+    monkeypatch.setattr(settings, "ANN_INDEX_PATH", str(tmp_path / "ivf"))
+    papers = add_papers([
+        {"title": "Graph neural networks", "abstract": "Message passing on graph neural networks"},
+        {"title": "Deeper graph networks", "abstract": "Oversmoothing in deep graph neural networks"},
+        {"title": "Graph kernels", "abstract": "Kernels on graph structure"},
+        {"title": "Protein folding", "abstract": "Predicting protein structure from sequence"},
+    ])
+    exact = [p.id for p in recommendation_engine.get_similar_papers(db, papers[0].id, limit=5)]
+
+    index = text_index.get_text_index(db)
+    vectorizer = ann_index.TextVectorizer.fit(index)
+    ivf = ann_index.IVFIndex.train(vectorizer.transform(index), n_lists=2, path=settings.ANN_INDEX_PATH, vectorizer=vectorizer)
+    ivf.add(index.paper_ids, vectorizer.transform(index))
+    searched = []
+    real_search = ann_index.IVFIndex.search
+    monkeypatch.setattr(ann_index.IVFIndex, "search", lambda self, *args: searched.append(1) or real_search(self, *args))
+
+    # The candidates are re-scored exactly, so a small catalog ranks as exact search does
+    similar = recommendation_engine.get_similar_papers(db, papers[0].id, limit=5)
+    assert searched and [p.id for p in similar] == exact
+    # Unknown papers are still turned away before either search
+    assert recommendation_engine.get_similar_papers(db, papers[-1].id + 100) is None
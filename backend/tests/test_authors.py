@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from app import models
+from app.services import authors
+
+def test_paper_authors_follow_paper_writes(db, add_papers):
+    assert authors.normalize_author_name("  José   GARCÍA-López ") == "jose garcia-lopez"
+    papers = add_papers([
+        {"authors": paper_authors, "published_date": datetime(2024, 1, 1 + i)}
+        for i, paper_authors in enumerate(["José García, Ann Lee", "Jose  Garcia,ann lee, José García", ""])
+    ])
+
+    # Spellings that normalize alike are one author, named as first seen
+    rows = db.query(models.Author).order_by(models.Author.id).all()
+    assert [(row.name, row.normalized_name) for row in rows] == [("José García", "jose garcia"), ("Ann Lee", "ann lee")]
+    garcia = rows[0].id
+    def links():
+        return sorted((row.paper_id, row.author_id, row.position) for row in db.query(models.PaperAuthor))
+    assert links() == sorted([
+        (papers[0].id, garcia, 0), (papers[0].id, rows[1].id, 1),
+        (papers[1].id, garcia, 0), (papers[1].id, rows[1].id, 1),
+    ])
+
+    papers[0].authors = "Ann Lee"
+    db.delete(papers[1])
+    db.commit()
+    assert links() == [(papers[0].id, rows[1].id, 0)]
@@ -0,0 +1,40 @@
+from app import models
+from app.services import batch_recommendations, recommendation_engine
+
+def test_precompute_recommendations(db, add_papers, tmp_path):
+    papers = add_papers([{"categories": "cs.AI" if i % 2 == 0 else "math.ST", "score": float(i)} for i in range(6)])
+    users = [models.User(email=f"batch{i}@example.com", hashed_password="x") for i in range(5)]
+    db.add_all(users)
+    db.commit()
+    db.add_all([
+        models.Rating(user_id=users[0].id, paper_id=papers[0].id, rating=5),
+        models.Rating(user_id=users[3].id, paper_id=papers[1].id, rating=5),
+    ])
+    db.commit()
+
+    progress = []
+    version = batch_recommendations.current_model_version()
+    assert version == "categories"
+    users_done, rows = batch_recommendations.precompute_recommendations(
+        db, version, top_n=3, batch_size=2, workers=0,
+        on_progress=lambda *args: progress.append(args),
+    )
+    assert (users_done, rows) == (5, 15)
+    assert [last_user_id for _, _, last_user_id in progress] == [users[1].id, users[3].id, users[4].id]
+
+    for user in users:
+        stored = batch_recommendations.get_precomputed_recommendations(db, user.id, limit=3)
+        assert [p.id for p in stored] == [
+            p.id for p in recommendation_engine.get_personalized_recommendations(db, user.id, limit=3)
+        ]
+    assert {row.model_version for row in db.query(models.UserRecommendation)} == {version}
+
+    # Resuming after the second batch rewrites only the users after it
+    checkpoint = str(tmp_path / "checkpoint")
+    batch_recommendations.write_checkpoint(checkpoint, version, progress[1][2])
+    assert batch_recommendations.read_checkpoint(checkpoint, "als-other") == 0
+    start_after_id = batch_recommendations.read_checkpoint(checkpoint, version)
+    assert batch_recommendations.precompute_recommendations(
+        db, version, top_n=3, batch_size=2, workers=0, start_after_id=start_after_id
+    ) == (1, 3)
+    assert db.query(models.UserRecommendation).count() == 15
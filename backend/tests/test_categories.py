@@ -0,0 +1,30 @@
+import numpy as np
+
+from app import models
+from app.services import categories, recommendation_engine
+
+def test_paper_categories_follow_paper_writes(db, add_papers):
+    papers = add_papers([
+        {"categories": paper_categories, "score": 1.0} for paper_categories in ["cs.LG cs.AI cs.LG", "cs.AI", ""]
+    ])
+
+    ids = categories.category_ids(db)
+    assert sorted(ids) == ["cs.AI", "cs.LG"]
+    def pairs():
+        return sorted((row.paper_id, row.category_id) for row in db.query(models.PaperCategory))
+    # Repeats are stored once; a paper without categories has no rows
+    assert pairs() == sorted([
+        (papers[0].id, ids["cs.LG"]), (papers[0].id, ids["cs.AI"]), (papers[1].id, ids["cs.AI"])
+    ])
+
+    papers[1].categories = "math.ST"
+    db.delete(papers[0])
+    db.commit()
+    ids = categories.category_ids(db)
+    assert pairs() == [(papers[1].id, ids["math.ST"])]
+
+    # The index is built from the pairs, one column per category id
+    index = recommendation_engine.get_paper_index(db)
+    assert index.matrix.shape == (2, max(ids.values()) + 1)
+    factors = index.category_vector(np.array([ids["math.ST"]]), np.array([2.0]), default=1.0)
+    assert index.boosted_scores(factors).tolist() == [2.0, 1.0]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from app import models
+from app.config import settings
+from app.services import factor_model, recommendation_engine
+
+def test_factor_model_recommendations(db, add_papers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(factor_model, "_cached_model", None)
+    papers = add_papers([{"categories": "cs.AI" if i % 2 == 0 else "math.ST"} for i in range(6)])
+    users = [models.User(email=f"user{i}@example.com", hashed_password="x") for i in range(5)]
+    db.add_all(users)
+    db.commit()
+    # Users 0-3 split into two tastes; user 0 hasn't seen paper 4 yet
+    liked = {0: [0, 2], 1: [0, 2, 4], 2: [0, 4], 3: [1, 3, 5]}
+    for user, paper_indexes in liked.items():
+        db.add_all([models.Rating(user_id=users[user].id, paper_id=papers[i].id, rating=5) for i in paper_indexes])
+    db.commit()
+
+    # No model published yet: category preferences
+    assert factor_model.get_factor_model() is None
+
+    user_ids, paper_ids, matrix = factor_model.ratings_matrix(factor_model.read_ratings(db, chunk_size=4))
+    assert matrix.nnz == 10
+    user_factors, paper_factors = factor_model.train_als(matrix, factors=4, iterations=5, workers=2)
+    version = factor_model.save_model(str(tmp_path), user_ids, user_factors, paper_ids, paper_factors, {"factors": 4})
+
+    model = factor_model.get_factor_model()
+    assert model.version == version
+    assert isinstance(model.paper_factors, np.memmap)
+    recommendations = recommendation_engine.get_personalized_recommendations(db, users[0].id, limit=1)
+    assert [p.id for p in recommendations] == [papers[4].id]
+
+    # User 4 has no ratings and isn't in the model: falls back to top scores
+    fallback = recommendation_engine.get_personalized_recommendations(db, users[4].id, limit=2)
+    assert len(fallback) == 2
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from app import models
+from app.services import item_similarity, recommendation_engine
+
+def test_also_liked_papers(db, add_papers, monkeypatch):
+    monkeypatch.setattr(item_similarity, "_cached_model", None)
+    papers = add_papers([{}] * 4)
+    users = [models.User(email=f"user{i}@example.com", hashed_password="x") for i in range(3)]
+    db.add_all(users)
+    db.commit()
+    # Users 0 and 1 both like papers 0 and 1; user 2 likes papers 0 and 2
+    for user, paper, rating in [(0, 0, 5), (0, 1, 5), (1, 0, 4), (1, 1, 4), (2, 0, 1), (2, 2, 5)]:
+        db.add(models.Rating(user_id=users[user].id, paper_id=papers[paper].id, rating=rating))
+    db.commit()
+
+    also_liked = recommendation_engine.get_also_liked_papers(db, papers[0].id)
+    assert [p.id for p in also_liked] == [papers[1].id, papers[2].id]
+    assert recommendation_engine.get_also_liked_papers(db, papers[3].id) == []
+    assert recommendation_engine.get_also_liked_papers(db, papers[-1].id + 100) is None
+
+    # New ratings refresh only the papers they touch, matching a rebuild
+    db.add_all([
+        models.Rating(user_id=users[2].id, paper_id=papers[3].id, rating=5),
+        models.Rating(user_id=users[1].id, paper_id=papers[2].id, rating=5),
+    ])
+    db.commit()
+    model = item_similarity.get_item_neighbours(db)
+    # Reads leave the model alone; catching up happens after rating responses
+    assert papers[3].id not in model.rows
+    assert item_similarity.record_ratings(db) == 2
+    rebuilt = item_similarity.build_item_neighbours(db)
+    assert model.last_rating_id == rebuilt.last_rating_id
+    for paper in papers:
+        assert model.neighbours_of(paper.id, 10) == rebuilt.neighbours_of(paper.id, 10)
+        assert model.similarities[model.rows[paper.id]] == pytest.approx(rebuilt.similarities[rebuilt.rows[paper.id]])
+    assert model.neighbours.dtype == np.int32 and model.similarities.dtype == np.float32
+
+    # Changing a rating in place keeps its id but still refreshes its paper
+    rating = db.query(models.Rating).filter_by(user_id=users[2].id, paper_id=papers[0].id).one()
+    rating.rating = 5
+    db.commit()
+    assert item_similarity.record_ratings(db) == 1
+    rebuilt = item_similarity.build_item_neighbours(db)
+    for paper in papers:
+        assert model.neighbours_of(paper.id, 10) == rebuilt.neighbours_of(paper.id, 10)
+        assert model.similarities[model.rows[paper.id]] == pytest.approx(rebuilt.similarities[rebuilt.rows[paper.id]])
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import models
+from app.services import paper_index, recommendation_engine
+from conftest import engine
+
+def test_paper_index_rebuilds_only_after_writes(db, add_papers):
+    add_papers([{"score": 1.0}])
+    index = paper_index.get_paper_index(db)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        # An unchanged index costs no query at all
+        assert paper_index.get_paper_index(db) is index
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+    # Committed paper and rating writes are picked up by the next call
+    paper, = add_papers([{"score": 0.0}])
+    index = paper_index.get_paper_index(db)
+    assert index.paper_ids.tolist()[-1] == paper.id
+    db.add(models.Rating(paper_id=paper.id, rating=4))
+    db.commit()
+    index = paper_index.get_paper_index(db)
+    assert index.scores.tolist() == [1.0, 2.0]
+
+    # A rolled-back write leaves the index as it was
+    db.add(models.Paper(arxiv_id="2401.90003", title="Paper", categories="cs.AI", score=5.0))
+    db.flush()
+    db.rollback()
+    assert paper_index.get_paper_index(db) is index
+
+def test_paper_index_patches_rating_scores_in_place(db, add_papers, monkeypatch):
+    papers = add_papers([{"published_date": datetime(2024, 1, 1)}] * 3)
+    index = recommendation_engine.get_paper_index(db)
+    builds = []
+    real_build = paper_index.PaperCategoryIndex.build
+    monkeypatch.setattr(paper_index.PaperCategoryIndex, "build", lambda *args: builds.append(1) or real_build(*args))
+
+    # Ratings only move scores: the same index is patched, not rebuilt
+    db.add(models.Rating(paper_id=papers[1].id, rating=4))
+    db.commit()
+    assert recommendation_engine.get_paper_index(db) is index
+    assert index.scores.tolist() == [0.0, 2.0, 0.0]
+    rating = db.query(models.Rating).one()
+    rating.rating = 2
+    db.commit()
+    assert recommendation_engine.get_paper_index(db) is index
+    assert index.scores.tolist() == [0.0, 1.0, 0.0]
+    assert builds == []
+
+    # A new paper adds a row, so the index is rebuilt
+    add_papers([{"categories": "cs.LG", "published_date": datetime(2024, 1, 1)}])
+    rebuilt = recommendation_engine.get_paper_index(db)
+    assert rebuilt is not index and len(rebuilt.paper_ids) == 4
+    assert builds == [1]
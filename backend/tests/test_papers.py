@@ -1,6 +1,13 @@
+import json
+import threading
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime
+
+from app import models, schemas
+from app.config import settings
+from app.controllers import paper_controller
+from app.services import item_similarity, text_index
 
 def test_create_paper(client: TestClient, test_user_token):
     paper_data = {
@@ -24,6 +31,27 @@ def test_create_paper(client: TestClient, test_user_token):
     assert "id" in data
     assert "score" in data
 
+def test_create_paper_adds_day_summary(client: TestClient, test_user_token, db: Session):
+    for i, hour in enumerate([9, 17]):
+        response = client.post(
+            "/api/papers/",
+            json={
+                "arxiv_id": f"2401.5432{i}",
+                "title": f"Summarized Paper {i}",
+                "abstract": "This is a test paper abstract",
+                "authors": "Test Author",
+                "categories": "cs.AI",
+                "published_date": datetime(2024, 1, 15, hour).isoformat()
+            },
+            headers=test_user_token
+        )
+        assert response.status_code == 200
+
+    # The server lists the day from this row, bumped once per paper
+    summary = db.get(models.PaperDaySummary, date(2024, 1, 15))
+    db.refresh(summary)
+    assert (summary.paper_count, summary.version) == (2, 2)
+
 def test_get_papers(client: TestClient, test_user_token):
     response = client.get(
         "/api/papers/",
@@ -108,10 +136,168 @@ def test_rate_paper(client: TestClient, test_user_token, db: Session):
     assert data["paper_id"] == paper_id
     assert data["rating"] == rating_data["rating"]
 
+def test_rate_paper_replaces_a_concurrent_first_rating(client: TestClient, test_user_token, db: Session, monkeypatch):
+    _create_papers(client, test_user_token, 1)
+    paper = db.query(models.Paper).one()
+    user_id = db.query(models.User.id).scalar()
+    paper_controller.rate_paper(db, paper.id, user_id, schemas.RatingCreate(rating=2))
+
+    # The other request's insert lands between this one's lookup and insert
+    real_lookup = paper_controller._user_rating
+    lookups = []
+    monkeypatch.setattr(
+        paper_controller, "_user_rating",
+        lambda *args: real_lookup(*args) if lookups.append(1) or len(lookups) > 1 else None,
+    )
+    rating = paper_controller.rate_paper(db, paper.id, user_id, schemas.RatingCreate(rating=5))
+
+    assert rating.rating == 5
+    assert db.query(models.Rating).count() == 1
+    db.refresh(paper)
+    assert (paper.rating_sum, paper.rating_count) == (5, 1)
+
 def test_rate_paper_invalid_score(client: TestClient, test_user_token):
     response = client.post(
         "/api/papers/1/rate",
         json={"rating": 6},  # Invalid rating > 5
         headers=test_user_token
     )
-    assert response.status_code == 422  # Validation error 
\ No newline at end of file
+    assert response.status_code == 422  # Validation error
+
+def test_rate_paper_refreshes_neighbours_after_response(client: TestClient, test_user_token, db: Session, monkeypatch):
+    _create_papers(client, test_user_token, 2)
+    paper_ids = [paper.id for paper in db.query(models.Paper).order_by(models.Paper.id)]
+    monkeypatch.setattr(item_similarity, "_cached_model", None)
+    model = item_similarity.get_item_neighbours(db)
+
+    # The controller only writes the rating; the model is left alone
+    user_id = db.query(models.User.id).scalar()
+    paper_controller.rate_paper(db, paper_ids[0], user_id, schemas.RatingCreate(rating=4))
+    assert model.last_rating_id == 0
+
+    response = client.post(f"/api/papers/{paper_ids[1]}/rate", json={"rating": 5}, headers=test_user_token)
+    assert response.status_code == 200
+    # The route's background task has folded both ratings in
+    assert model.last_rating_id == response.json()["id"]
+    assert model.neighbours_of(paper_ids[0], 10) == [paper_ids[1]]
+
+def test_neighbour_reads_do_not_wait_for_a_refresh(client: TestClient, test_user_token, db: Session, monkeypatch):
+    _create_papers(client, test_user_token, 2)
+    paper_ids = [paper.id for paper in db.query(models.Paper).order_by(models.Paper.id)]
+    monkeypatch.setattr(item_similarity, "_cached_model", None)
+    model = item_similarity.get_item_neighbours(db)
+    user_id = db.query(models.User.id).scalar()
+    for paper_id in paper_ids:
+        paper_controller.rate_paper(db, paper_id, user_id, schemas.RatingCreate(rating=4))
+
+    # The refresh is held inside its first co-rating query
+    entered, release = threading.Event(), threading.Event()
+    real_dots = item_similarity.co_rating_dots
+    def held_dots(session, paper_id):
+        entered.set()
+        release.wait(5)
+        return real_dots(session, paper_id)
+    monkeypatch.setattr(item_similarity, "co_rating_dots", held_dots)
+    refresh = threading.Thread(target=item_similarity.refresh_in_background)
+    refresh.start()
+    try:
+        assert entered.wait(5)
+        reader = threading.Thread(target=lambda: item_similarity.get_item_neighbours(db).neighbours_of(paper_ids[0], 10))
+        reader.start()
+        reader.join(1)
+        assert not reader.is_alive()
+    finally:
+        release.set()
+        refresh.join(5)
+    assert model.neighbours_of(paper_ids[0], 10) == [paper_ids[1]]
+
+def test_created_papers_are_indexed_after_the_response(client: TestClient, test_user_token, db: Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_INDEX_PATH", str(tmp_path / "text_index.npz"))
+    monkeypatch.setattr(text_index, "_cached_index", None)
+    _create_papers(client, test_user_token, 1)
+    paper_id = db.query(models.Paper.id).scalar()
+    index = text_index.get_text_index(db)
+
+    client.post("/api/papers/", json={
+        "arxiv_id": "2402.10000", "title": "Paged Paper 1", "abstract": "This is a test paper abstract",
+        "authors": "Test Author", "categories": "cs.AI", "published_date": datetime(2024, 2, 2).isoformat(),
+    }, headers=test_user_token)
+    # The route's background task has indexed the new paper into a new copy
+    assert len(index) == 1
+    response = client.get(f"/api/papers/{paper_id}/similar", headers=test_user_token)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+def _create_papers(client: TestClient, headers, count: int):
+    for i in range(count):
+        client.post(
+            "/api/papers/",
+            json={
+                "arxiv_id": f"2402.{i:05d}",
+                "title": f"Paged Paper {i}",
+                "abstract": "This is a test paper abstract",
+                "authors": "Test Author",
+                "categories": "cs.AI",
+                "published_date": datetime(2024, 2, 1 + i % 3).isoformat()
+            },
+            headers=headers
+        )
+
+def test_get_papers_page_walks_catalog(client: TestClient, test_user_token):
+    _create_papers(client, test_user_token, 7)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/papers/page", params=params, headers=test_user_token)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["papers"]) <= 3
+        seen.extend(paper["id"] for paper in data["papers"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 7
+    assert len(set(seen)) == 7
+
+def test_get_papers_page_includes_undated_papers_last(client: TestClient, test_user_token, db: Session):
+    _create_papers(client, test_user_token, 2)
+    db.add_all([
+        models.Paper(arxiv_id=f"2402.1000{i}", title=f"Undated Paper {i}", abstract="Abstract",
+                     authors="Test Author", categories="cs.AI", score=float(i))
+        for i in range(3)
+    ])
+    db.commit()
+
+    titles, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/papers/page", params=params, headers=test_user_token).json()
+        titles += [paper["title"] for paper in data["papers"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert titles == ["Paged Paper 1", "Paged Paper 0", "Undated Paper 2", "Undated Paper 1", "Undated Paper 0"]
+
+    response = client.get("/api/papers/stream", headers=test_user_token)
+    assert [json.loads(line)["title"] for line in response.text.splitlines()] == titles
+
+def test_get_papers_page_invalid_cursor(client: TestClient, test_user_token):
+    response = client.get(
+        "/api/papers/page?cursor=not-a-cursor",
+        headers=test_user_token
+    )
+    assert response.status_code == 400
+
+def test_stream_papers(client: TestClient, test_user_token):
+    _create_papers(client, test_user_token, 4)
+
+    response = client.get("/api/papers/stream", headers=test_user_token)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [line for line in response.text.splitlines() if line]
+    assert len(lines) == 4
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.services import ranking_service, rating_aggregates
+
+def test_update_paper_scores_in_chunks(db, add_papers):
+    papers = add_papers([{}] * 5)
+    # Core inserts bypass the aggregate listeners, like a bulk import would
+    db.execute(models.Rating.__table__.insert(), [
+        {"paper_id": paper.id, "rating": rating}
+        for paper, rating in [(papers[0], 5), (papers[0], 3), (papers[2], 4), (papers[4], 1)]
+    ])
+    db.commit()
+
+    checkpoints = []
+    updated = ranking_service.update_paper_scores(db, chunk_size=2, on_chunk=checkpoints.append)
+
+    assert updated == 3
+    assert checkpoints == [2, 4, 6]
+    expected = {papers[0].id: 4 * (1 - 1/3), papers[2].id: 4 * (1 - 1/2), papers[4].id: 1 * (1 - 1/2)}
+    for paper in papers:
+        db.refresh(paper)
+        assert paper.score == pytest.approx(expected.get(paper.id, 0.0))
+    assert rating_aggregates.reconcile_rating_aggregates(db, repair=False) == {"papers": [], "category_stats": []}
+
+    # Resuming after the last checkpoint has nothing left to do
+    assert ranking_service.update_paper_scores(db, chunk_size=2, start_after_id=6) == 0
+
+def test_update_paper_scores_bumps_day_summaries(db, add_papers):
+    day = datetime(2024, 1, 15, 9, 30)
+    papers = add_papers([{"published_date": published} for published in [day, day.replace(hour=17), day + timedelta(days=1)]])
+    db.add_all([
+        models.PaperDaySummary(published_date=day.date(), paper_count=2, max_score=0.0, version=3),
+        models.PaperDaySummary(published_date=day.date() + timedelta(days=1), paper_count=1, max_score=0.0, version=7),
+    ])
+    db.commit()
+    # Only the first day's papers are rated, bypassing the listeners
+    db.execute(models.Rating.__table__.insert(), [{"paper_id": papers[1].id, "rating": 4}])
+    db.commit()
+
+    ranking_service.update_paper_scores(db)
+
+    summaries = {summary.published_date: summary for summary in db.query(models.PaperDaySummary)}
+    # The rated day's version moves, so the server's ETag and cached list for it change
+    assert (summaries[day.date()].version, summaries[day.date()].max_score) == (4, pytest.approx(2.0))
+    assert summaries[day.date() + timedelta(days=1)].version == 7
+
+def test_rank_daily_papers(db, add_papers):
+    now = datetime.utcnow()
+    # (hours old, ratings)
+    specs = [(2, [5, 5]), (1, [3]), (30, [5, 5, 5]), (3, []), (6, [4, 4])]
+    papers = add_papers([{"published_date": now - timedelta(hours=hours)} for hours, _ in specs])
+    for paper, (_, ratings) in zip(papers, specs):
+        db.add_all([models.Rating(paper_id=paper.id, rating=rating) for rating in ratings])
+    db.commit()
+
+    ranked = ranking_service.rank_daily_papers(db, days_back=1)
+    # Paper 2 is outside the window; paper 3 has no ratings and ranks last
+    assert [p.id for p in ranked] == [papers[0].id, papers[4].id, papers[1].id, papers[3].id]
+
+    top = ranking_service.rank_daily_papers(db, days_back=1, limit=2)
+    assert [p.id for p in top] == [papers[0].id, papers[4].id]
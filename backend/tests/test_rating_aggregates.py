@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from app import models
+from app.services import rating_aggregates, recommendation_engine, user_profiles
+
+def test_rating_aggregates_track_writes(db, add_papers):
+    paper, = add_papers([{}])
+
+    first = models.Rating(paper_id=paper.id, rating=5)
+    second = models.Rating(paper_id=paper.id, rating=2)
+    db.add_all([first, second])
+    db.commit()
+    second.rating = 4
+    db.commit()
+
+    db.refresh(paper)
+    assert (paper.rating_sum, paper.rating_count) == (9, 2)
+    assert paper.score == recommendation_engine.calculate_paper_scores(db)[paper.id]
+    assert paper.score == 4.5 * (1 - 1/3)
+
+    db.delete(first)
+    db.commit()
+    db.refresh(paper)
+    assert (paper.rating_sum, paper.rating_count) == (4, 1)
+
+def test_rating_writes_bump_day_summary(db, add_papers):
+    day = datetime(2024, 1, 15, 9, 30)
+    paper, = add_papers([{"published_date": day}])
+    db.add(models.PaperDaySummary(published_date=day.date(), paper_count=1, max_score=0.0, version=1))
+    db.commit()
+
+    rating = models.Rating(paper_id=paper.id, rating=4)
+    db.add(rating)
+    db.commit()
+    rating.rating = 2
+    db.commit()
+
+    summary = db.get(models.PaperDaySummary, day.date())
+    db.refresh(summary)
+    assert (summary.version, summary.max_score) == (3, pytest.approx(1.0))
+
+def test_reconcile_rating_aggregates(db, add_papers):
+    paper, = add_papers([{"categories": "cs.AI cs.CL"}])
+    user = models.User(email="drift@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.add(models.Rating(user_id=user.id, paper_id=paper.id, rating=3))
+    db.commit()
+    ai, cl = (db.query(models.Category.id).filter(models.Category.name == name).scalar() for name in ("cs.AI", "cs.CL"))
+
+    # Simulate drift from writes that bypassed the ORM
+    db.execute(models.Paper.__table__.update().values(rating_sum=10, rating_count=4))
+    stats = models.UserCategoryStat.__table__
+    db.execute(stats.update().where(stats.c.category_id == ai).values(rating_sum=1))
+    db.execute(stats.delete().where(stats.c.category_id == cl))
+    db.commit()
+    user_profiles.get_user_profile(db, user.id)
+
+    mismatches = rating_aggregates.reconcile_rating_aggregates(db)
+    db.commit()
+    assert [m["paper_id"] for m in mismatches["papers"]] == [paper.id]
+    assert sorted((m["category_id"], m["rating_sum"], m["expected_sum"]) for m in mismatches["category_stats"]) == [
+        (ai, 1, 3), (cl, 0, 3),
+    ]
+    assert rating_aggregates.reconcile_rating_aggregates(db, repair=False) == {"papers": [], "category_stats": []}
+    db.refresh(paper)
+    assert (paper.rating_sum, paper.rating_count) == (3, 1)
+    assert paper.score == 1.5
+    # The cached profile was dropped with the repair
+    assert user_profiles.get_user_profile(db, user.id).preferences() == {"cs.AI": 3.0, "cs.CL": 3.0}
@@ -129,4 +129,36 @@ def test_get_personalized_recommendations(db):
     assert len(recommendations) <= 3
     # Check if recommendations favor the preferred category
     ai_papers = [p for p in recommendations if "cs.AI" in p.categories]
-    assert len(ai_papers) > 0 
\ No newline at end of file
+    assert len(ai_papers) > 0
+
+def test_personalized_recommendations_ranking(db, add_papers):
+    user = models.User(email="test@example.com", hashed_password="dummy_hash")
+    db.add(user)
+    db.commit()
+
+    # (categories, score): ties and multi-category papers included
+    specs = [
+        ("cs.AI", 2.0),
+        ("cs.LG", 3.0),
+        ("cs.AI cs.LG", 1.0),
+        ("cs.CV", 4.0),
+        ("cs.AI", 2.0),
+        ("cs.CL", 0.0),
+    ]
+    papers = add_papers([{"categories": categories, "score": score} for categories, score in specs])
+    db.add(models.Rating(user_id=user.id, paper_id=papers[0].id, rating=5))
+    db.add(models.Rating(user_id=user.id, paper_id=papers[1].id, rating=1))
+    db.commit()
+    # Pin the scores the ratings just moved
+    for paper, (_, score) in zip(papers, specs):
+        paper.score = score
+    db.commit()
+
+    # cs.AI boosts by 2.0 and cs.LG by 1.2, so papers 0, 3 and 4 tie at 4.0
+    # and keep id order, ahead of paper 1 (3.6) and paper 2 (2.4)
+    recommendations = recommendation_engine.get_personalized_recommendations(
+        db, user.id, limit=4
+    )
+    assert [p.id for p in recommendations] == [
+        papers[0].id, papers[3].id, papers[4].id, papers[1].id
+    ]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import recommendation_engine, text_index
+
+def test_similar_papers(db, add_papers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_INDEX_PATH", str(tmp_path / "text_index.npz"))
+    monkeypatch.setattr(text_index, "_cached_index", None)
+    papers = add_papers([
+        {"title": "Graph neural networks", "abstract": r"Message passing on \emph{graph} neural networks"},
+        {"title": "Deeper graph networks", "abstract": "Oversmoothing in deep graph neural networks"},
+        {"title": "Protein folding", "abstract": "Predicting protein structure from sequence"},
+    ])
+
+    similar = recommendation_engine.get_similar_papers(db, papers[0].id, limit=5)
+    # The protein paper shares no terms and is left out; the paper itself too
+    assert [p.id for p in similar] == [papers[1].id]
+    assert recommendation_engine.get_similar_papers(db, papers[-1].id + 100) is None
+
+    # A newly ingested paper is left to the background refresh, which
+    # indexes it incrementally and saves the index
+    index = text_index.get_text_index(db)
+    paper, = add_papers([{"title": "Protein graph networks", "abstract": "Graph neural networks for protein structure"}])
+    assert text_index.get_text_index(db) is index
+    text_index.refresh_in_background()
+    similar = recommendation_engine.get_similar_papers(db, papers[2].id, limit=5)
+    assert [p.id for p in similar] == [paper.id]
+
+    # A restart loads the saved index rather than starting empty
+    saved = text_index.TextIndex.load(settings.TEXT_INDEX_PATH)
+    assert saved.paper_ids.tolist() == [p.id for p in papers] + [paper.id]
+    assert saved.counts.indices.dtype == np.int32
+    assert saved.similar(papers[2].id, 5) == text_index.get_text_index(db).similar(papers[2].id, 5)
+
+    # Edits and deletes are re-indexed by the next refresh
+    papers[1].title, papers[1].abstract = "Protein design", "Designing protein sequences"
+    db.delete(paper)
+    db.commit()
+    text_index.refresh_in_background()
+    index = text_index.get_text_index(db)
+    assert index.paper_ids.tolist() == [p.id for p in papers]
+    assert [p.id for p in recommendation_engine.get_similar_papers(db, papers[2].id, limit=5)] == [papers[1].id]
+    assert recommendation_engine.get_similar_papers(db, papers[0].id, limit=5) == []
+    # Same weights as an index built from the current papers
+    rebuilt = text_index.TextIndex.empty()
+    rebuilt.add((p.id, p.title, p.abstract) for p in papers)
+    assert {term: index.doc_freq[column] for term, column in index.vocabulary.items() if index.doc_freq[column]} == \
+        {term: rebuilt.doc_freq[column] for term, column in rebuilt.vocabulary.items()}
+    similar, expected = index.similar(papers[2].id, 5), rebuilt.similar(papers[2].id, 5)
+    assert [p for p, _ in similar] == [p for p, _ in expected]
+    assert [s for _, s in similar] == pytest.approx([s for _, s in expected])
@@ -0,0 +1,34 @@
+import numpy as np
+
+from app import models
+from app.services import recommendation_engine, user_profiles
+
+def test_user_profile_tracks_ratings(db, add_papers):
+    user = models.User(email="profile@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    papers = add_papers([{"categories": categories} for categories in ["cs.AI cs.LG", "cs.LG", "math.ST"]])
+    user_profiles.evict_profiles([user.id])
+    assert recommendation_engine.get_user_preferences(db, user.id) == {}
+
+    ratings = [models.Rating(user_id=user.id, paper_id=paper.id, rating=rating) for paper, rating in zip(papers, [5, 2, 4])]
+    db.add_all(ratings)
+    db.commit()
+    # The commit dropped the cached empty profile
+    assert recommendation_engine.get_user_preferences(db, user.id) == {"cs.AI": 5.0, "cs.LG": 3.5, "math.ST": 4.0}
+
+    ratings[1].rating = 4
+    db.delete(ratings[2])
+    db.commit()
+    profile = user_profiles.get_user_profile(db, user.id)
+    assert profile.preferences() == {"cs.AI": 5.0, "cs.LG": 4.5}
+    assert profile.category_ids.dtype == np.int32
+    # Served from the LRU until the next rating write commits
+    assert user_profiles.get_user_profile(db, user.id) is profile
+    # Keyed by the categories dictionary's ids
+    rows = db.query(models.Category.name, models.UserCategoryStat.rating_sum, models.UserCategoryStat.rating_count)\
+             .join(models.UserCategoryStat, models.UserCategoryStat.category_id == models.Category.id)\
+             .filter(models.UserCategoryStat.user_id == user.id).all()
+    assert sorted(tuple(row) for row in rows) == [
+        ("cs.AI", 5, 1), ("cs.LG", 9, 2), ("math.ST", 0, 0)
+    ]
@@ -97,4 +97,12 @@ def test_parse_categories():
     # Test with extra whitespace
     categories = "cs.AI   cs.LG     math.ST"
     parsed = helpers.parse_categories(categories)
-    assert parsed == ["cs.AI", "cs.LG", "math.ST"] 
\ No newline at end of file
+    assert parsed == ["cs.AI", "cs.LG", "math.ST"]
+
+def test_to_async_url():
+    from app.database import to_async_url
+
+    assert to_async_url("postgresql://u:p@db:5432/arxiv") == "postgresql+asyncpg://u:p@db:5432/arxiv"
+    assert to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    # Already-async or unknown schemes pass through unchanged
+    assert to_async_url("postgresql+asyncpg://db/arxiv") == "postgresql+asyncpg://db/arxiv"
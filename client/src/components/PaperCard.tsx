@@ -17,14 +17,19 @@ import {
 } from '@mui/icons-material';
 import RatingStars from './RatingStars';
 import { useAppDispatch, useAppSelector } from '../store/hooks';
-import { ratePaper, selectUserRatings, fetchUserRatings } from '../store/papersSlice';
+import {
+  ratePaper,
+  selectUserRatings,
+  fetchUserRatings,
+  fetchAbstracts,
+  selectAbstracts,
+} from '../store/papersSlice';
 
 interface PaperCardProps {
   paper: {
     id: number;
     arxiv_id: string;
     title: string;
-    abstract: string;
     authors: string;
     categories: string;
     published_date: string;
@@ -36,12 +41,18 @@ export const PaperCard: React.FC<PaperCardProps> = ({ paper }) => {
   const [expanded, setExpanded] = useState(false);
   const dispatch = useAppDispatch();
   const userRatings = useAppSelector(selectUserRatings);
+  const abstracts = useAppSelector(selectAbstracts);
+  const abstract = abstracts[paper.id];
 
   useEffect(() => {
     dispatch(fetchUserRatings());
   }, [dispatch]);
 
   const handleExpandClick = () => {
+    // The daily list leaves abstracts out; load this one the first time it is opened
+    if (!expanded && abstract === undefined) {
+      dispatch(fetchAbstracts([paper.id]));
+    }
     setExpanded(!expanded);
   };
 
@@ -147,7 +158,7 @@ export const PaperCard: React.FC<PaperCardProps> = ({ paper }) => {
             color="text.secondary"
             sx={{ whiteSpace: 'pre-wrap' }}
           >
-            {cleanAbstract(paper.abstract)}
+            {abstract === undefined ? 'Loading abstract...' : cleanAbstract(abstract)}
           </Typography>
         </Collapse>
       </CardContent>
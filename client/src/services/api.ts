@@ -24,10 +24,28 @@ api.interceptors.request.use(
 // Add a response interceptor to handle errors
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config;
+    const refreshToken = localStorage.getItem('refreshToken');
+    // Renew an expired access token once with the refresh token instead of
+    // sending the user back to the login form
+    if (error.response?.status === 401 && refreshToken && original && !original._retried
+        && !original.url?.startsWith('/api/users/token')) {
+      original._retried = true;
+      try {
+        const response = await api.post('/api/users/token/refresh', { refresh_token: refreshToken });
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+        original.headers.Authorization = `Bearer ${response.data.access_token}`;
+        return api(original);
+      } catch (refreshError) {
+        // Fall through to the login redirect below
+      }
+    }
     if (error.response?.status === 401) {
       // Handle unauthorized access
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       window.location.href = '/login';
     }
     return Promise.reject(error);
@@ -34,6 +34,7 @@ export const login = createAsyncThunk(
     });
     const token = response.data.access_token;
     localStorage.setItem('token', token);
+    localStorage.setItem('refreshToken', response.data.refresh_token);
     return token;
   }
 );
@@ -62,6 +63,7 @@ const authSlice = createSlice({
       state.token = null;
       state.user = null;
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
     },
     clearError: (state) => {
       state.error = null;
@@ -2,11 +2,11 @@ import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import type { RootState } from './index';
 import { api } from '../services/api';
 
+// Daily lists come without abstracts; they are fetched on demand into `abstracts`
 interface Paper {
   id: number;
   arxiv_id: string;
   title: string;
-  abstract: string;
   authors: string;
   categories: string;
   published_date: string;
@@ -30,6 +30,7 @@ interface PapersState {
   papersByDate: Record<string, Paper[]>;
   loadedDates: Set<string>;
   userRatings: Record<number, number>;  // Map of paper_id to rating
+  abstracts: Record<number, string>;  // Map of paper_id to abstract
   isLoading: boolean;
   error: string | null;
 }
@@ -39,6 +40,7 @@ const initialState: PapersState = {
   papersByDate: {},
   loadedDates: new Set(),
   userRatings: {},
+  abstracts: {},
   isLoading: false,
   error: null,
 };
@@ -59,6 +61,14 @@ export const fetchPapersByDate = createAsyncThunk(
   }
 );
 
+export const fetchAbstracts = createAsyncThunk(
+  'papers/fetchAbstracts',
+  async (paperIds: number[]) => {
+    const response = await api.get('/api/papers/abstracts', { params: { ids: paperIds.join(',') } });
+    return response.data as { id: number; abstract: string }[];
+  }
+);
+
 export const fetchUserRatings = createAsyncThunk(
   'papers/fetchUserRatings',
   async () => {
@@ -112,6 +122,11 @@ const papersSlice = createSlice({
         state.isLoading = false;
         state.error = action.error.message || 'Failed to fetch papers';
       })
+      .addCase(fetchAbstracts.fulfilled, (state, action) => {
+        action.payload.forEach(({ id, abstract }) => {
+          state.abstracts[id] = abstract;
+        });
+      })
       .addCase(fetchUserRatings.fulfilled, (state, action) => {
         const ratings = action.payload as Rating[];
         state.userRatings = {};
@@ -133,5 +148,6 @@ export const selectLoadedDates = (state: RootState) => state.papers.loadedDates;
 export const selectPapersError = (state: RootState) => state.papers.error;
 export const selectIsLoading = (state: RootState) => state.papers.isLoading;
 export const selectUserRatings = (state: RootState) => state.papers.userRatings;
+export const selectAbstracts = (state: RootState) => state.papers.abstracts;
 
 export default papersSlice.reducer; 
\ No newline at end of file
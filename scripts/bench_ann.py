@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the backend directory to the Python path so we can import the services
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def synthetic_corpus(papers: list, size: int, seed: int = 0):
+    """
+    (paper_id, title, abstract) rows built by splicing the sentences of two
+    real abstracts, so neighbourhoods look like the real corpus's
+    """
+    rng = random.Random(seed)
+    sentences = [paper['abstract'].split('. ') for paper in papers]
+    for paper_id in range(1, size + 1):
+        first, second = rng.randrange(len(papers)), rng.randrange(len(papers))
+        picked = [s for s in sentences[first] + sentences[second] if rng.random() < 0.6]
+        yield paper_id, papers[first]['title'], '. '.join(picked)
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall vs latency of the IVF index against exact search')
+    parser.add_argument('--papers-file', type=str,
+                        default=os.path.join(os.path.dirname(__file__), '..', 'papers_jan4.json'),
+                        help='Seed papers to build the corpus from')
+    parser.add_argument('--size', type=int, default=200000, help='Number of papers in the corpus')
+    parser.add_argument('--days', type=int, default=10, help='Insert the corpus as this many segments')
+    parser.add_argument('--dim', type=int, default=256, help='Vector dimensions')
+    parser.add_argument('--lists', type=int, default=0, help='Inverted lists (default 4 * sqrt(size))')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--compact', action='store_true', help='Merge the segments before searching')
+    args = parser.parse_args()
+
+    from app.services.ann_index import IVFIndex, paper_vectors
+    from app.services.paper_index import top_k
+    from app.services.text_index import TextIndex
+
+    with open(args.papers_file) as f:
+        seed_papers = json.load(f)
+    start = time.perf_counter()
+    text_index = TextIndex.empty()
+    text_index.add(synthetic_corpus(seed_papers, args.size))
+    vectors = paper_vectors(text_index, dim=args.dim)
+    print(f"corpus: {args.size} papers from {len(seed_papers)} seeds, {args.dim}-d vectors in {time.perf_counter() - start:.1f}s")
+
+    n_lists = args.lists or int(4 * np.sqrt(args.size))
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        index = IVFIndex.train(vectors, n_lists, path=path)
+        trained = time.perf_counter() - start
+        start = time.perf_counter()
+        for day in np.array_split(np.arange(args.size), args.days):
+            index.add(text_index.paper_ids[day], vectors[day])
+        if args.compact:
+            index.compact()
+        print(f"index: {n_lists} lists trained in {trained:.1f}s, {len(index.segments)} segments added in {time.perf_counter() - start:.1f}s")
+
+        # Reopen so searches run against the memory-mapped files
+        index = IVFIndex.open(path)
+        rng = np.random.default_rng(1)
+        queries = rng.choice(args.size, args.queries, replace=False)
+
+        exact, timings = [], []
+        for q in queries:
+            start = time.perf_counter()
+            exact.append(set(text_index.paper_ids[top_k(vectors @ vectors[q], args.k)].tolist()))
+            timings.append(time.perf_counter() - start)
+        print(f"{'exact':>12}: recall@{args.k} 1.000  median {statistics.median(timings) * 1000:7.2f} ms")
+
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            if nprobe > n_lists:
+                break
+            recalls, timings = [], []
+            for q, truth in zip(queries, exact):
+                start = time.perf_counter()
+                ids, _ = index.search(vectors[q], args.k, nprobe=nprobe)
+                timings.append(time.perf_counter() - start)
+                recalls.append(len(truth.intersection(ids.tolist())) / len(truth))
+            print(f"{'nprobe=' + str(nprobe):>12}: recall@{args.k} {statistics.mean(recalls):.3f}  "
+                  f"median {statistics.median(timings) * 1000:7.2f} ms")
+
+if __name__ == '__main__':
+    main()
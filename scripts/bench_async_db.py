@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+
+# Add the server directory to the Python path so we can import the database modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from database import SessionLocal, get_async_db
+from models import Paper
+
+def build_app(target_date, sleep_seconds: float) -> FastAPI:
+    """Two copies of the daily-list query: the old blocking pattern and the async session."""
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking():
+        # async def + sync Session: what server/main.py used to do
+        db = SessionLocal()
+        try:
+            if sleep_seconds:
+                db.execute(text("SELECT pg_sleep(:s)"), {"s": sleep_seconds})
+            papers = db.execute(
+                select(Paper).where(Paper.published_date == target_date).order_by(Paper.score.desc())
+            ).scalars().all()
+            return {"count": len(papers)}
+        finally:
+            db.close()
+
+    @app.get("/async")
+    async def non_blocking(db=Depends(get_async_db)):
+        if sleep_seconds:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": sleep_seconds})
+        result = await db.execute(
+            select(Paper).where(Paper.published_date == target_date).order_by(Paper.score.desc())
+        )
+        return {"count": len(result.scalars().all())}
+
+    return app
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    """Fire requests at path with the given concurrency and return requests/sec."""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare concurrent throughput of blocking vs async DB sessions')
+    parser.add_argument('--date', type=str, required=True, help='Date to query (YYYY-MM-DD format)')
+    parser.add_argument('--requests', type=int, default=500, help='Total requests per variant')
+    parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+    parser.add_argument('--sleep', type=float, default=0.0,
+                        help='Extra pg_sleep per request to simulate a slow query (Postgres only)')
+    args = parser.parse_args()
+
+    target_date = datetime.strptime(args.date, '%Y-%m-%d').date()
+    app = build_app(target_date, args.sleep)
+
+    async def compare():
+        # One event loop for both variants: async engine connections are loop-bound
+        for path in ('/blocking', '/async'):
+            await run(app, path, args.concurrency, args.concurrency)  # warm up the pools
+            throughput = await run(app, path, args.requests, args.concurrency)
+            print(f"{path:>10}: {throughput:8.1f} req/s  ({args.requests} requests, concurrency {args.concurrency})")
+
+    asyncio.run(compare())
+
+if __name__ == '__main__':
+    main()
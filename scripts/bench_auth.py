@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+import sys
+
+from fastapi.testclient import TestClient
+
+# Add the server directory to the Python path so we can import the app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from main import app, create_access_token
+from principals import principal_cache
+
+def auth_timing(response) -> float:
+    """Extract the auth duration (ms) from the Server-Timing header."""
+    for metric in response.headers.get("Server-Timing", "").split(","):
+        name, _, duration = metric.strip().partition(";dur=")
+        if name == "auth":
+            return float(duration)
+    raise ValueError("response has no auth timing")
+
+def measure(client: TestClient, headers: dict, requests: int, cold: bool) -> list:
+    timings = []
+    for _ in range(requests):
+        if cold:
+            principal_cache.clear()
+        response = client.get("/api/users/me", headers=headers)
+        response.raise_for_status()
+        timings.append(auth_timing(response))
+    return timings
+
+def report(label: str, timings: list) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:>20}: mean {statistics.mean(timings):.3f} ms  p50 {statistics.median(timings):.3f} ms  p95 {p95:.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-request authentication overhead from token claims and from the users table')
+    parser.add_argument('--email', type=str, default='admin@example.com', help='Account to authenticate as')
+    parser.add_argument('--password', type=str, default='admin123', help='Password for the account')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per variant')
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        response = client.post("/api/users/token", data={"username": args.email, "password": args.password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        # Tokens without the uid claim, as issued before it, still resolve through the users table
+        legacy = {"Authorization": f"Bearer {create_access_token({'sub': args.email})}"}
+
+        report("token claims", measure(client, headers, args.requests, cold=True))
+        report("users table lookup", measure(client, legacy, args.requests, cold=True))
+        report("principal cache", measure(client, legacy, args.requests, cold=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+# Add the server directory to the Python path so we can import the app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from main import app
+from passwords import password_hasher
+
+async def login_storm(client: httpx.AsyncClient, email: str, password: str, logins: int) -> dict:
+    """Fire all logins at once and count outcomes."""
+    async def one():
+        response = await client.post("/api/users/token", data={"username": email, "password": password})
+        return response.status_code
+
+    start = time.perf_counter()
+    codes = await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    return {
+        "ok": codes.count(200),
+        "busy": codes.count(503),
+        "elapsed": elapsed,
+    }
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list) -> None:
+    """Keep hitting a cheap endpoint to see how long other requests wait during the storm."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/openapi.json")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+
+async def run(email: str, password: str, logins: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(client, stop, latencies))
+        result = await login_storm(client, email, password, logins)
+        stop.set()
+        await prober
+
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"logins: {result['ok']} ok, {result['busy']} rejected (503) in {result['elapsed']:.2f}s "
+          f"-> {result['ok'] / result['elapsed']:.1f} logins/s")
+    print(f"other requests during the storm: {len(latencies)} served, "
+          f"p50 {statistics.median(latencies):.1f} ms, p99 {p99:.1f} ms, max {latencies[-1]:.1f} ms")
+    print(f"hasher: {password_hasher.stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure login throughput and event-loop responsiveness under a burst of logins')
+    parser.add_argument('--email', type=str, default='admin@example.com', help='Account to log in as')
+    parser.add_argument('--password', type=str, default='admin123', help='Password for the account')
+    parser.add_argument('--logins', type=int, default=100, help='Number of simultaneous logins')
+    args = parser.parse_args()
+
+    asyncio.run(run(args.email, args.password, args.logins))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+
+# Runs in a fresh interpreter each time so every sample is a true cold start
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.append({server_dir!r})
+from main import app
+from fastapi.testclient import TestClient
+imported = time.perf_counter()
+with TestClient(app) as client:
+    started = time.perf_counter()
+    response = client.post("/api/users/token", data={{"username": {email!r}, "password": {password!r}}})
+    response.raise_for_status()
+    logged_in = time.perf_counter()
+    headers = {{"Authorization": "Bearer " + response.json()["access_token"]}}
+    client.get({path!r}, headers=headers).raise_for_status()
+    first_request = time.perf_counter()
+    client.get({path!r}, headers=headers).raise_for_status()
+    second_request = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "startup": started - imported,
+    "first login": logged_in - started,
+    "first request": first_request - logged_in,
+    "warm request": second_request - first_request,
+}}))
+"""
+
+def sample(email: str, password: str, path: str) -> dict:
+    code = CHILD.format(server_dir=SERVER_DIR, email=email, password=password, path=path)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API server cold start: import, startup hooks and first requests')
+    parser.add_argument('--email', type=str, default='admin@example.com', help='Account to log in as')
+    parser.add_argument('--password', type=str, default='admin123', help='Password for the account')
+    parser.add_argument('--path', type=str, default='/api/papers/dates', help='Authenticated endpoint for the first request')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to sample')
+    args = parser.parse_args()
+
+    samples = [sample(args.email, args.password, args.path) for _ in range(args.runs)]
+    for phase in samples[0]:
+        timings = [s[phase] * 1000 for s in samples]
+        print(f"{phase:>14}: median {statistics.median(timings):8.1f} ms  max {max(timings):8.1f} ms")
+    totals = [sum(s.values()) * 1000 for s in samples]
+    print(f"{'total':>14}: median {statistics.median(totals):8.1f} ms  ({args.runs} cold starts)")
+
+if __name__ == '__main__':
+    main()
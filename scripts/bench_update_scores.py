@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# Add the backend directory to the Python path so we can import the services
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def seed(db, models, papers: int, ratings: int) -> None:
+    """Fill an empty database with papers and (user, paper)-unique ratings."""
+    now = datetime.utcnow()
+    db.execute(models.Paper.__table__.insert(), [
+        {"arxiv_id": f"bench.{i}", "title": "t", "abstract": "a", "authors": "a",
+         "categories": "cs.AI", "published_date": now, "score": 0.0, "rating_sum": 0, "rating_count": 0}
+        for i in range(papers)
+    ])
+    rng = random.Random(0)
+    batch = []
+    for i in range(ratings):
+        # user i // papers rates paper i % papers: unique pairs, skewed counts
+        batch.append({"user_id": i // papers + 1, "paper_id": i % papers + 1,
+                      "rating": rng.randint(1, 5), "created_at": now})
+        if len(batch) == 100000:
+            db.execute(models.Rating.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.execute(models.Rating.__table__.insert(), batch)
+    db.commit()
+
+def update_paper_scores_per_row(db, models, calculate_paper_scores):
+    """What ranking_service.update_paper_scores used to do: one SELECT per scored paper."""
+    scores = calculate_paper_scores(db)
+    for paper_id, score in scores.items():
+        paper = db.query(models.Paper).filter(models.Paper.id == paper_id).first()
+        if paper:
+            paper.score = score
+    db.commit()
+
+def legacy_scores(db, models):
+    """The GROUP BY calculate_paper_scores used before rating aggregates existed."""
+    from sqlalchemy import func
+    rows = db.query(
+        models.Rating.paper_id,
+        func.avg(models.Rating.rating),
+        func.count(models.Rating.id)
+    ).group_by(models.Rating.paper_id).all()
+    return {paper_id: avg * (1 - 1/(count + 1)) for paper_id, avg, count in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-row and set-based update_paper_scores')
+    parser.add_argument('--database-url', type=str, default='sqlite:///./bench_scores.db',
+                        help='Database to create the benchmark tables in (dropped and recreated)')
+    parser.add_argument('--papers', type=int, default=50000, help='Number of papers')
+    parser.add_argument('--ratings', type=int, default=1000000, help='Number of ratings')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Paper ids per set-based chunk')
+    parser.add_argument('--skip-per-row', action='store_true', help='Only time the set-based path')
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from app.database import Base, SessionLocal, engine
+    from app import models
+    from app.services import ranking_service
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        seed(db, models, args.papers, args.ratings)
+        print(f"seeded {args.papers} papers / {args.ratings} ratings in {time.perf_counter() - start:.1f}s")
+
+        if not args.skip_per_row:
+            start = time.perf_counter()
+            update_paper_scores_per_row(db, models, lambda db: legacy_scores(db, models))
+            per_row = time.perf_counter() - start
+            print(f"{'per-row':>10}: {per_row:8.2f}s")
+
+        start = time.perf_counter()
+        updated = ranking_service.update_paper_scores(db, chunk_size=args.chunk_size)
+        set_based = time.perf_counter() - start
+        print(f"{'set-based':>10}: {set_based:8.2f}s  ({updated} papers)")
+        if not args.skip_per_row:
+            print(f"speedup: {per_row / set_based:.1f}x")
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Add the backend directory to the Python path so we can import the services
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or extend the IVF index behind the similar-papers endpoint')
+    parser.add_argument('--path', type=str, default=None, help='Index directory (default: ANN_INDEX_PATH)')
+    parser.add_argument('--rebuild', action='store_true', help='Train a new index over every paper instead of adding new ones')
+    parser.add_argument('--lists', type=int, default=0, help='Inverted lists for --rebuild (default 4 * sqrt(papers))')
+    parser.add_argument('--dim', type=int, default=256, help='Vector dimensions for --rebuild')
+    parser.add_argument('--compact', action='store_true', help='Merge the segments afterwards')
+    args = parser.parse_args()
+
+    from app.config import settings
+    from app.database import SessionLocal
+    from app.services.ann_index import MANIFEST, IVFIndex, TextVectorizer
+    from app.services.text_index import get_text_index
+
+    path = args.path or settings.ANN_INDEX_PATH
+    if not path:
+        print("No index path: pass --path or set ANN_INDEX_PATH", file=sys.stderr)
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        text_index = get_text_index(db)
+    finally:
+        db.close()
+    print(f"text index: {len(text_index)} papers in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    if args.rebuild or not os.path.exists(os.path.join(path, MANIFEST)):
+        if not len(text_index):
+            print("No papers to index", file=sys.stderr)
+            sys.exit(1)
+        vectorizer = TextVectorizer.fit(text_index, dim=args.dim)
+        vectors = vectorizer.transform(text_index)
+        n_lists = args.lists or int(4 * np.sqrt(len(vectors)))
+        # Built beside the live index and swapped in; requests in between
+        # fall back to exact search
+        index = IVFIndex.train(vectors, n_lists, path=path + ".new", vectorizer=vectorizer)
+        index.add(text_index.paper_ids, vectors)
+        if os.path.exists(path):
+            os.replace(path, path + ".old")
+        os.replace(path + ".new", path)
+        shutil.rmtree(path + ".old", ignore_errors=True)
+        index = IVFIndex.open(path)
+        print(f"trained {n_lists} lists over {len(index)} papers in {time.perf_counter() - start:.1f}s")
+    else:
+        index = IVFIndex.open(path)
+        if index.vectorizer is None:
+            print("Index has no vectorizer; run with --rebuild", file=sys.stderr)
+            sys.exit(1)
+        positions = np.flatnonzero(text_index.paper_ids > index.last_id)
+        index.add(text_index.paper_ids[positions], index.vectorizer.transform(text_index, positions))
+        print(f"added {len(positions)} papers as a new segment in {time.perf_counter() - start:.1f}s")
+
+    if args.compact:
+        start = time.perf_counter()
+        index.compact()
+        print(f"compacted to one segment in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-import arxiv
 import argparse
 from datetime import datetime, timedelta
 import sys
@@ -13,6 +12,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
 
 from database import SessionLocal
 from models import Paper
+from summaries import refresh_day_summaries
+from categories import sync_paper_categories
+from authors import sync_paper_authors
 
 def get_categories() -> List[str]:
     """Get all CS and Stats categories from arXiv."""
@@ -36,6 +38,9 @@ def format_authors(authors: List[Any]) -> str:
 
 def fetch_papers_for_date(target_date: datetime) -> List[Dict[str, Any]]:
     """Fetch papers from arXiv for a specific date."""
+    # Imported here so importing this module (e.g. for save_to_database) does not load the arxiv client
+    import arxiv
+
     categories = get_categories()
     
     # Create the date range for the search
@@ -62,7 +67,8 @@ def fetch_papers_for_date(target_date: datetime) -> List[Dict[str, Any]]:
                     'abstract': paper.summary,
                     'authors': format_authors(paper.authors),
                     'categories': ' '.join(paper.categories),
-                    'published_date': paper.published.strftime('%Y-%m-%d'),
+                    # A date, not a string: the Date columns and the day summaries bind it as one
+                    'published_date': paper.published.date(),
                     'score': 0.0
                 }
                 
@@ -93,12 +99,22 @@ def save_to_database(papers: List[Dict[str, Any]]) -> None:
     """Save the papers to the database."""
     db = SessionLocal()
     try:
+        added_dates = set()
+        added = []
         for paper_dict in papers:
             # Check if paper already exists
             existing_paper = db.query(Paper).filter(Paper.arxiv_id == paper_dict['arxiv_id']).first()
             if not existing_paper:
                 paper = Paper(**paper_dict)
                 db.add(paper)
+                added.append(paper)
+                added_dates.add(paper_dict['published_date'])
+        db.flush()
+        # Index the new papers' categories and authors for filtering, scoring and feeds
+        sync_paper_categories(db, added)
+        sync_paper_authors(db, added)
+        # Keep the per-day summary behind /api/papers/dates current
+        refresh_day_summaries(db, added_dates)
         db.commit()
     except Exception as e:
         print(f"Error saving to database: {str(e)}", file=sys.stderr)
@@ -163,7 +179,7 @@ def main():
     
     if args.output:
         with open(args.output, 'w') as f:
-            json.dump(papers, f, indent=2)
+            json.dump(papers, f, indent=2, default=str)
         print(f"Saved papers to {args.output}")
     
     if args.save_db:
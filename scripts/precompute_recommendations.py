@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+# Add the backend directory to the Python path so we can import the services
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute every user's top-N recommendations into user_recommendations")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes computing batches in parallel (0: none)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Users per batch and per transaction')
+    parser.add_argument('--top-n', type=int, default=50, help='Recommendations stored per user')
+    parser.add_argument('--checkpoint', type=str, default='precompute_recommendations.checkpoint',
+                        help='File recording progress, so an interrupted run can resume')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first user')
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+    from app.services.batch_recommendations import (
+        current_model_version, precompute_recommendations, read_checkpoint, write_checkpoint
+    )
+
+    model_version = current_model_version()
+    start_after_id = 0 if args.restart else read_checkpoint(args.checkpoint, model_version)
+    if start_after_id:
+        print(f"resuming {model_version} after user {start_after_id}")
+    else:
+        print(f"computing {model_version} for all users")
+
+    start = time.perf_counter()
+
+    def progress(users, rows, last_user_id):
+        write_checkpoint(args.checkpoint, model_version, last_user_id)
+        elapsed = time.perf_counter() - start
+        print(f"{users} users ({users / elapsed:.0f} users/s), {rows} rows, through user {last_user_id}")
+
+    db = SessionLocal()
+    try:
+        users, rows = precompute_recommendations(
+            db,
+            model_version,
+            top_n=args.top_n,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            start_after_id=start_after_id,
+            on_progress=progress,
+        )
+    except Exception as e:
+        print(f"Error precomputing recommendations: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"done: {users} users, {rows} rows in {elapsed:.1f}s ({users / elapsed if elapsed else 0:.0f} users/s)")
+    # A finished run starts from the beginning next time
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+
+# Add the server directory to the Python path so we can import the database modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from database import SessionLocal
+from ratings import reconcile_rating_aggregates
+
+def main():
+    parser = argparse.ArgumentParser(description="Check papers' rating aggregates and users' category stats against the ratings table and repair drift")
+    parser.add_argument('--dry-run', action='store_true', help='Report mismatches without repairing them')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatches = reconcile_rating_aggregates(db, repair=not args.dry_run)
+        for row in mismatches["papers"]:
+            print(f"paper {row['paper_id']}: sum {row['rating_sum']} -> {row['expected_sum']}, "
+                  f"count {row['rating_count']} -> {row['expected_count']}")
+        for row in mismatches["category_stats"]:
+            print(f"user {row['user_id']} category {row['category_id']}: sum {row['rating_sum']} -> {row['expected_sum']}, "
+                  f"count {row['rating_count']} -> {row['expected_count']}")
+        counts = f"{len(mismatches['papers'])} papers and {len(mismatches['category_stats'])} user category stats"
+        if args.dry_run:
+            db.rollback()
+            print(f"{counts} out of step (dry run, nothing changed)")
+        else:
+            db.commit()
+            print(f"{counts} repaired")
+    except Exception as e:
+        print(f"Error reconciling ratings: {str(e)}", file=sys.stderr)
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+# Add the backend directory to the Python path so we can import the services
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Train user/paper factors with implicit ALS and publish a new model version')
+    parser.add_argument('--model-dir', type=str, default=None, help='Where model versions are written (default: MODEL_DIR)')
+    parser.add_argument('--factors', type=int, default=64, help='Latent factors per user and paper')
+    parser.add_argument('--iterations', type=int, default=10, help='ALS iterations')
+    parser.add_argument('--regularization', type=float, default=0.1, help='L2 regularization')
+    parser.add_argument('--alpha', type=float, default=10.0, help='Confidence per rating point')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes solving blocks in parallel')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='Ratings read per database round trip')
+    parser.add_argument('--keep', type=int, default=3, help='Model versions to keep')
+    args = parser.parse_args()
+
+    from app.config import settings
+    from app.database import SessionLocal
+    from app.services.factor_model import ratings_matrix, read_ratings, save_model, train_als
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        user_ids, paper_ids, matrix = ratings_matrix(read_ratings(db, chunk_size=args.chunk_size))
+    finally:
+        db.close()
+    print(f"read {matrix.nnz} ratings ({len(user_ids)} users x {len(paper_ids)} papers) in {time.perf_counter() - start:.1f}s")
+    if matrix.nnz == 0:
+        print("No ratings to train on", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    params = {k: getattr(args, k) for k in ('factors', 'iterations', 'regularization', 'alpha')}
+    user_factors, paper_factors = train_als(
+        matrix,
+        factors=args.factors,
+        iterations=args.iterations,
+        regularization=args.regularization,
+        alpha=args.alpha,
+        workers=args.workers,
+        on_iteration=lambda i: print(f"iteration {i + 1}/{args.iterations} ({time.perf_counter() - start:.1f}s)"),
+    )
+    model_dir = args.model_dir or settings.MODEL_DIR
+    os.makedirs(model_dir, exist_ok=True)
+    version = save_model(model_dir, user_ids, user_factors, paper_ids, paper_factors, params, keep=args.keep)
+    print(f"published model {version} to {model_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from database import Base, SQLALCHEMY_DATABASE_URL
+import models  # noqa: F401  registers the tables on Base.metadata
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,34 @@
+"""add user_recommendations
+
+Revision ID: 0b7e4d2a9c51
+Revises: f6a1c9d3e284
+Create Date: 2026-10-17 19:12:40.582317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7e4d2a9c51'
+down_revision: Union[str, None] = 'f6a1c9d3e284'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_recommendations',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('paper_id', sa.Integer(), sa.ForeignKey('papers.id'), nullable=False),
+        sa.Column('model_version', sa.String(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'rank'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_recommendations')
@@ -0,0 +1,56 @@
+"""add categories and paper_categories
+
+Revision ID: 3c6f8e1b7a42
+Revises: 0b7e4d2a9c51
+Create Date: 2026-10-17 20:03:51.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c6f8e1b7a42'
+down_revision: Union[str, None] = '0b7e4d2a9c51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_table(
+        'paper_categories',
+        sa.Column('paper_id', sa.Integer(), sa.ForeignKey('papers.id'), nullable=False),
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('categories.id'), nullable=False),
+        sa.PrimaryKeyConstraint('paper_id', 'category_id'),
+    )
+    # Backfill from papers.categories; from here on ingestion keeps them current
+    op.execute(
+        "INSERT INTO categories (name) "
+        "SELECT DISTINCT c.name "
+        "FROM papers p CROSS JOIN LATERAL regexp_split_to_table(trim(p.categories), '\\s+') AS c(name) "
+        "WHERE c.name <> '' "
+        "ORDER BY c.name"
+    )
+    op.execute(
+        "INSERT INTO paper_categories (paper_id, category_id) "
+        "SELECT DISTINCT p.id, k.id "
+        "FROM papers p CROSS JOIN LATERAL regexp_split_to_table(trim(p.categories), '\\s+') AS c(name) "
+        "JOIN categories k ON k.name = c.name"
+    )
+    # Built after the backfill rather than maintained row by row during it
+    op.create_index('ix_paper_categories_category_id_paper_id', 'paper_categories', ['category_id', 'paper_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_paper_categories_category_id_paper_id', table_name='paper_categories')
+    op.drop_table('paper_categories')
+    op.drop_table('categories')
@@ -0,0 +1,52 @@
+"""key user_category_stats by category_id
+
+Revision ID: 4a8c1e6f3b95
+Revises: 9e4b2c7a1d38
+Create Date: 2026-10-17 21:48:03.671942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8c1e6f3b95'
+down_revision: Union[str, None] = '9e4b2c7a1d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user_category_stats',
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('categories.id'), nullable=True),
+    )
+    # Every profile category came from a paper, so the dictionary already
+    # has it; add any that slipped through rather than drop their stats
+    op.execute(
+        "INSERT INTO categories (name) "
+        "SELECT DISTINCT s.category FROM user_category_stats s "
+        "WHERE NOT EXISTS (SELECT 1 FROM categories c WHERE c.name = s.category)"
+    )
+    op.execute(
+        "UPDATE user_category_stats SET category_id = c.id "
+        "FROM categories c WHERE c.name = user_category_stats.category"
+    )
+    op.drop_constraint('user_category_stats_pkey', 'user_category_stats', type_='primary')
+    op.drop_column('user_category_stats', 'category')
+    op.alter_column('user_category_stats', 'category_id', existing_type=sa.Integer(), nullable=False)
+    op.create_primary_key('user_category_stats_pkey', 'user_category_stats', ['user_id', 'category_id'])
+
+
+def downgrade() -> None:
+    op.add_column('user_category_stats', sa.Column('category', sa.String(), nullable=True))
+    op.execute(
+        "UPDATE user_category_stats SET category = c.name "
+        "FROM categories c WHERE c.id = user_category_stats.category_id"
+    )
+    op.drop_constraint('user_category_stats_pkey', 'user_category_stats', type_='primary')
+    op.drop_column('user_category_stats', 'category_id')
+    op.alter_column('user_category_stats', 'category', existing_type=sa.String(), nullable=False)
+    op.create_primary_key('user_category_stats_pkey', 'user_category_stats', ['user_id', 'category'])
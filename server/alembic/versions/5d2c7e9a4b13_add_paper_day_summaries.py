@@ -0,0 +1,38 @@
+"""add paper_day_summaries
+
+Revision ID: 5d2c7e9a4b13
+Revises: 1a88bfe18490
+Create Date: 2026-10-17 09:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c7e9a4b13'
+down_revision: Union[str, None] = '1a88bfe18490'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('paper_day_summaries',
+    sa.Column('published_date', sa.Date(), nullable=False),
+    sa.Column('paper_count', sa.Integer(), nullable=False),
+    sa.Column('max_score', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('published_date')
+    )
+    # Backfill from the existing catalog; afterwards the write paths keep it current
+    op.execute(
+        'INSERT INTO paper_day_summaries (published_date, paper_count, max_score, updated_at) '
+        'SELECT published_date, COUNT(id), MAX(score), CURRENT_TIMESTAMP FROM papers '
+        'WHERE published_date IS NOT NULL GROUP BY published_date'
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('paper_day_summaries')
@@ -0,0 +1,123 @@
+"""add authors, paper_authors and author_follows
+
+Revision ID: 7d3a5f9c2e16
+Revises: 3c6f8e1b7a42
+Create Date: 2026-10-17 20:41:09.553102
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3a5f9c2e16'
+down_revision: Union[str, None] = '3c6f8e1b7a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+PUNCTUATION = re.compile(r"[^\w\s-]")
+
+
+# Copy of authors.normalize_author_name as of this revision; SQL has no
+# portable accent folding, so the backfill runs in Python
+def _normalize(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(PUNCTUATION.sub(" ", stripped.casefold()).split())
+
+
+def _split(authors):
+    names = {}
+    for name in (authors or "").split(","):
+        name = " ".join(name.split())
+        key = _normalize(name)
+        if key and key not in names:
+            names[key] = name
+    return list(names.items())
+
+
+def upgrade() -> None:
+    op.create_table(
+        'authors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('normalized_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('normalized_name'),
+    )
+    op.create_table(
+        'paper_authors',
+        sa.Column('paper_id', sa.Integer(), sa.ForeignKey('papers.id'), nullable=False),
+        sa.Column('author_id', sa.Integer(), sa.ForeignKey('authors.id'), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('published_date', sa.Date(), nullable=True),
+        sa.PrimaryKeyConstraint('paper_id', 'author_id'),
+    )
+    op.create_table(
+        'author_follows',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('author_id', sa.Integer(), sa.ForeignKey('authors.id'), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'author_id'),
+    )
+
+    # Backfill from papers.authors in id order; from here on ingestion keeps them current
+    bind = op.get_bind()
+    papers = sa.table('papers', sa.column('id'), sa.column('authors'), sa.column('published_date'))
+    authors = sa.table('authors', sa.column('id'), sa.column('name'), sa.column('normalized_name'))
+    paper_authors = sa.table(
+        'paper_authors', sa.column('paper_id'), sa.column('author_id'), sa.column('position'), sa.column('published_date')
+    )
+    author_ids = {}
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(papers.c.id, papers.c.authors, papers.c.published_date)
+            .where(papers.c.id > last_id)
+            .order_by(papers.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        split = [(paper_id, published_date, _split(names)) for paper_id, names, published_date in rows]
+        new = {}
+        for _, _, names in split:
+            for key, name in names:
+                if key not in author_ids:
+                    new.setdefault(key, name)
+        if new:
+            bind.execute(authors.insert(), [{"name": name, "normalized_name": key} for key, name in new.items()])
+            author_ids.update(bind.execute(
+                sa.select(authors.c.normalized_name, authors.c.id).where(authors.c.normalized_name.in_(list(new)))
+            ).all())
+        links = [
+            {"paper_id": paper_id, "author_id": author_ids[key], "position": position, "published_date": published_date}
+            for paper_id, published_date, names in split
+            for position, (key, _) in enumerate(names)
+        ]
+        if links:
+            bind.execute(paper_authors.insert(), links)
+        last_id = rows[-1][0]
+
+    # Built after the backfill rather than maintained row by row during it
+    op.create_index(
+        'ix_paper_authors_author_id_published_date_paper_id', 'paper_authors',
+        ['author_id', 'published_date', 'paper_id'],
+    )
+    op.create_index(
+        'ix_authors_normalized_name_pattern', 'authors', ['normalized_name'],
+        postgresql_ops={'normalized_name': 'text_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_authors_normalized_name_pattern', table_name='authors')
+    op.drop_index('ix_paper_authors_author_id_published_date_paper_id', table_name='paper_authors')
+    op.drop_table('author_follows')
+    op.drop_table('paper_authors')
+    op.drop_table('authors')
@@ -0,0 +1,25 @@
+"""add papers keyset index
+
+Revision ID: 8f41b0c6d2e7
+Revises: 5d2c7e9a4b13
+Create Date: 2026-10-17 10:02:11.540917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41b0c6d2e7'
+down_revision: Union[str, None] = '5d2c7e9a4b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_papers_published_date_score_id', 'papers', ['published_date', 'score', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_papers_published_date_score_id', table_name='papers')
@@ -0,0 +1,29 @@
+"""make papers.score not null
+
+Revision ID: 9e4b2c7a1d38
+Revises: 7d3a5f9c2e16
+Create Date: 2026-10-17 21:12:40.318275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2c7a1d38'
+down_revision: Union[str, None] = '7d3a5f9c2e16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A NULL score sorts apart from every other paper in the keyset order
+    # and cannot be carried in a cursor, so unscored papers count as 0
+    op.execute('UPDATE papers SET score = 0 WHERE score IS NULL')
+    op.alter_column('papers', 'score', existing_type=sa.Float(), nullable=False, server_default='0')
+
+
+def downgrade() -> None:
+    op.alter_column('papers', 'score', existing_type=sa.Float(), nullable=True, server_default=None)
@@ -0,0 +1,30 @@
+"""add version to paper_day_summaries
+
+Revision ID: a4d9e2b7c613
+Revises: c3e8a1f5b970
+Create Date: 2026-10-17 15:42:18.406215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9e2b7c613'
+down_revision: Union[str, None] = 'c3e8a1f5b970'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Change counter per day; it feeds the ETags of the daily paper lists
+    op.add_column(
+        'paper_day_summaries',
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('paper_day_summaries', 'version')
@@ -0,0 +1,31 @@
+"""add unique (user_id, paper_id) to ratings
+
+Revision ID: c3e8a1f5b970
+Revises: 8f41b0c6d2e7
+Create Date: 2026-10-17 11:20:37.802114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f5b970'
+down_revision: Union[str, None] = '8f41b0c6d2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Concurrent clicks may already have produced duplicates; keep the latest row
+    op.execute(
+        'DELETE FROM ratings older USING ratings newer '
+        'WHERE older.user_id = newer.user_id AND older.paper_id = newer.paper_id '
+        'AND older.id < newer.id'
+    )
+    op.create_unique_constraint('uq_ratings_user_paper', 'ratings', ['user_id', 'paper_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_ratings_user_paper', 'ratings', type_='unique')
@@ -0,0 +1,35 @@
+"""add rating_sum and rating_count to papers
+
+Revision ID: e2b5c8d14f07
+Revises: a4d9e2b7c613
+Create Date: 2026-10-17 16:31:52.118934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b5c8d14f07'
+down_revision: Union[str, None] = 'a4d9e2b7c613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('papers', sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('papers', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    # Backfill from existing ratings; from here on rating writes keep them current
+    op.execute(
+        'UPDATE papers SET rating_sum = agg.rating_sum, rating_count = agg.rating_count '
+        'FROM (SELECT paper_id, SUM(rating) AS rating_sum, COUNT(id) AS rating_count '
+        'FROM ratings GROUP BY paper_id) AS agg '
+        'WHERE papers.id = agg.paper_id'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('papers', 'rating_count')
+    op.drop_column('papers', 'rating_sum')
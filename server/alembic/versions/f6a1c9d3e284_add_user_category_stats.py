@@ -0,0 +1,42 @@
+"""add user_category_stats
+
+Revision ID: f6a1c9d3e284
+Revises: e2b5c8d14f07
+Create Date: 2026-10-17 18:05:27.406215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a1c9d3e284'
+down_revision: Union[str, None] = 'e2b5c8d14f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_category_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'category'),
+    )
+    # Backfill from existing ratings; from here on rating writes keep them current
+    op.execute(
+        "INSERT INTO user_category_stats (user_id, category, rating_sum, rating_count) "
+        "SELECT r.user_id, c.category, SUM(r.rating), COUNT(*) "
+        "FROM ratings r JOIN papers p ON p.id = r.paper_id "
+        "CROSS JOIN LATERAL regexp_split_to_table(trim(p.categories), '\\s+') AS c(category) "
+        "WHERE r.user_id IS NOT NULL AND c.category <> '' "
+        "GROUP BY r.user_id, c.category"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_category_stats')
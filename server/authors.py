@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import insert_for
+from models import Author, AuthorFollow, Paper, PaperAuthor
+
+PUNCTUATION = re.compile(r"[^\w\s-]")
+
+
+def normalize_author_name(name: str) -> str:
+    """Key under which spellings of one name are merged.
+
+    Accents, case, punctuation and spacing are ignored, so "José  García"
+    and "Jose Garcia" are one author; initials are not expanded, so
+    "J. Garcia" stays a different one.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(PUNCTUATION.sub(" ", stripped.casefold()).split())
+
+
+def split_authors(authors: Optional[str]) -> List[Tuple[str, str]]:
+    """(normalized name, name) for each distinct author of a Paper.authors string, in order"""
+    names: Dict[str, str] = {}
+    for name in (authors or "").split(","):
+        name = " ".join(name.split())
+        key = normalize_author_name(name)
+        if key and key not in names:
+            names[key] = name
+    return list(names.items())
+
+
+def ensure_authors(db: Session, names: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    """Ids by normalized name, adding authors not seen before under the spelling given"""
+    names = dict(names)
+    if not names:
+        return {}
+    insert = insert_for(db)
+    db.execute(
+        insert(Author).values([{"name": name, "normalized_name": key} for key, name in sorted(names.items())])
+        .on_conflict_do_nothing(index_elements=[Author.normalized_name])
+    )
+    return dict(db.execute(select(Author.normalized_name, Author.id).where(Author.normalized_name.in_(names))).all())
+
+
+def sync_paper_authors(db: Session, papers) -> None:
+    """Replace the paper_authors rows of papers (flushed Paper objects).
+
+    Called wherever papers are written, in the same transaction (the caller
+    commits), next to categories.sync_paper_categories.
+    """
+    papers = list(papers)
+    if not papers:
+        return
+    authors = {paper.id: split_authors(paper.authors) for paper in papers}
+    ids = ensure_authors(db, (name for names in authors.values() for name in names))
+    db.execute(delete(PaperAuthor).where(PaperAuthor.paper_id.in_(list(authors))))
+    rows = [
+        {"paper_id": paper.id, "author_id": ids[key], "position": position, "published_date": paper.published_date}
+        for paper in papers
+        for position, (key, _) in enumerate(authors[paper.id])
+    ]
+    if rows:
+        db.execute(PaperAuthor.__table__.insert(), rows)
+
+
+async def find_authors(db: AsyncSession, name: str, limit: int = 20) -> List[Author]:
+    """Authors whose normalized name starts with name's, shortest first"""
+    key = normalize_author_name(name)
+    if not key:
+        return []
+    pattern = key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    result = await db.execute(
+        select(Author)
+        .where(Author.normalized_name.like(pattern, escape="\\"))
+        .order_by(Author.normalized_name)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def followed_paper_ids(
+    db: AsyncSession, user_id: int, after: Optional[Tuple[date, int]] = None, limit: int = 50
+) -> List[Tuple[date, int]]:
+    """(published_date, paper_id) of the newest papers by authors user_id follows.
+
+    Reads only author_follows and the (author_id, published_date, paper_id)
+    index of paper_authors, so the cost follows the followed authors'
+    output rather than the size of the catalog. after is the last key of
+    the previous page.
+    """
+    followed = select(AuthorFollow.author_id).where(AuthorFollow.user_id == user_id)
+    stmt = (
+        select(PaperAuthor.published_date, PaperAuthor.paper_id)
+        .where(PaperAuthor.author_id.in_(followed), PaperAuthor.published_date.isnot(None))
+        # Co-authors who are both followed list a paper once
+        .distinct()
+        .order_by(PaperAuthor.published_date.desc(), PaperAuthor.paper_id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(PaperAuthor.published_date, PaperAuthor.paper_id) < tuple_(*after))
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+
+async def load_papers(db: AsyncSession, paper_ids: List[int], *options) -> List[Paper]:
+    """Papers by id, in the order given"""
+    result = await db.execute(select(Paper).options(*options).where(Paper.id.in_(paper_ids)))
+    papers = {paper.id: paper for paper in result.scalars()}
+    return [papers[paper_id] for paper_id in paper_ids if paper_id in papers]
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config import DAILY_CACHE_MAX_DATES, DAILY_CACHE_TTL_SECONDS
+from payloads import VersionedPayload
+
+
+class DailyListCache:
+    """In-process cache of serialized daily paper lists, keyed by date.
+
+    Entries hold the exact JSON bytes returned by GET /api/papers/{date},
+    with their ETag and compressed variants, so a hit skips the query, ORM
+    hydration, schema validation and compression entirely. Writers
+    in this process call invalidate() for the dates they touch; entries also
+    expire after ttl_seconds so that writes made by other processes (such as
+    scripts/fetch_papers.py) become visible without a restart.
+    """
+
+    def __init__(self, max_dates: int = DAILY_CACHE_MAX_DATES, ttl_seconds: float = DAILY_CACHE_TTL_SECONDS):
+        self.max_dates = max_dates
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[date, Tuple[VersionedPayload, float]]" = OrderedDict()
+        # Bumped on every invalidation so a load that raced with a write is
+        # never stored over the newer state.
+        self._generations: Dict[date, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, day: date) -> Optional[VersionedPayload]:
+        with self._lock:
+            entry = self._entries.get(day)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(day)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[day]
+            self.misses += 1
+            return None
+
+    def get_or_load(self, day: date, loader: Callable[[], VersionedPayload]) -> VersionedPayload:
+        """Return the cached payload for day, calling loader() on a miss"""
+        payload = self.get(day)
+        if payload is None:
+            generation = self._generation(day)
+            payload = loader()
+            self._store(day, payload, generation)
+        return payload
+
+    async def get_or_load_async(self, day: date, loader: Callable[[], Awaitable[VersionedPayload]]) -> VersionedPayload:
+        """Like get_or_load, for a loader that queries through an AsyncSession"""
+        payload = self.get(day)
+        if payload is None:
+            generation = self._generation(day)
+            payload = await loader()
+            self._store(day, payload, generation)
+        return payload
+
+    def _generation(self, day: date) -> Tuple[int, int]:
+        with self._lock:
+            return (self._epoch, self._generations.get(day, 0))
+
+    def _store(self, day: date, payload: VersionedPayload, generation: Tuple[int, int]) -> None:
+        with self._lock:
+            if (self._epoch, self._generations.get(day, 0)) != generation:
+                return
+            self._entries[day] = (payload, time.monotonic())
+            self._entries.move_to_end(day)
+            while len(self._entries) > self.max_dates:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, day: Optional[date] = None) -> None:
+        """Drop the entry for day, or every entry when day is None"""
+        with self._lock:
+            if day is None:
+                self._entries.clear()
+                self._epoch += 1
+            else:
+                self._entries.pop(day, None)
+                self._generations[day] = self._generations.get(day, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+daily_list_cache = DailyListCache()
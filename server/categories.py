@@ -0,0 +1,76 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import insert_for
+from models import Category, PaperCategory
+
+
+def split_categories(categories: Optional[str]) -> List[str]:
+    """Distinct category names of a Paper.categories string, in order"""
+    return list(dict.fromkeys((categories or "").split()))
+
+
+def ensure_categories(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Ids for names, adding any the dictionary doesn't have yet"""
+    names = sorted(set(names))
+    if not names:
+        return {}
+    insert = insert_for(db)
+    db.execute(
+        insert(Category).values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[Category.name])
+    )
+    return dict(db.execute(select(Category.name, Category.id).where(Category.name.in_(names))).all())
+
+
+def sync_paper_categories(db: Session, papers) -> None:
+    """Replace the paper_categories rows of papers (flushed Paper objects).
+
+    Called wherever papers are written, in the same transaction (the caller
+    commits), so the association always matches Paper.categories.
+    """
+    papers = list(papers)
+    if not papers:
+        return
+    ids = ensure_categories(db, (name for paper in papers for name in split_categories(paper.categories)))
+    db.execute(delete(PaperCategory).where(PaperCategory.paper_id.in_([paper.id for paper in papers])))
+    rows = [
+        {"paper_id": paper.id, "category_id": ids[name]}
+        for paper in papers
+        for name in split_categories(paper.categories)
+    ]
+    if rows:
+        db.execute(PaperCategory.__table__.insert(), rows)
+
+
+class CategoryDictionary:
+    """Process-wide mirror of the categories table, filled on demand.
+
+    Names never change id once assigned, so entries never expire; a name
+    that isn't in the table yet is looked up again next time.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def id_for(self, db: AsyncSession, name: str) -> Optional[int]:
+        with self._lock:
+            category_id = self._ids.get(name)
+        if category_id is None:
+            category_id = await db.scalar(select(Category.id).where(Category.name == name))
+            if category_id is not None:
+                with self._lock:
+                    self._ids[name] = category_id
+        return category_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+
+category_dictionary = CategoryDictionary()
@@ -1,4 +1,4 @@
-from database import SessionLocal, engine, Base
+from database import SessionLocal
 from models import User, Paper, Rating
 
 def check_db():
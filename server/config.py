@@ -6,4 +6,39 @@ load_dotenv()
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "development_secret_key")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30 
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = 30 
+
+# Daily paper list cache
+DAILY_CACHE_MAX_DATES = int(os.getenv("DAILY_CACHE_MAX_DATES", "32"))
+DAILY_CACHE_TTL_SECONDS = float(os.getenv("DAILY_CACHE_TTL_SECONDS", "60"))
+
+# GET /api/papers/{date}?personalized=1: re-ranking must fit in PERSONALIZED_BUDGET_MS
+# at p99 (over the last PERSONALIZED_WINDOW requests) or the global order is served
+PERSONALIZED_BUDGET_MS = float(os.getenv("PERSONALIZED_BUDGET_MS", "20"))
+PERSONALIZED_WINDOW = int(os.getenv("PERSONALIZED_WINDOW", "1000"))
+PERSONALIZED_PROFILE_CACHE_SIZE = int(os.getenv("PERSONALIZED_PROFILE_CACHE_SIZE", "10000"))
+PERSONALIZED_PROFILE_TTL_SECONDS = float(os.getenv("PERSONALIZED_PROFILE_TTL_SECONDS", "60"))
+
+# Authenticated principal cache
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+
+# Refresh tokens let clients renew access tokens without re-sending the password
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+# bcrypt worker pool used by login
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Optional write-behind buffer for POST /api/papers/{id}/rate
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND", "false").lower() == "true"
+RATING_FLUSH_INTERVAL_SECONDS = float(os.getenv("RATING_FLUSH_INTERVAL_SECONDS", "0.5"))
+RATING_FLUSH_MAX_BATCH = int(os.getenv("RATING_FLUSH_MAX_BATCH", "500"))
+RATING_SPILL_DIR = os.getenv("RATING_SPILL_DIR", "./rating_spill")
+# fsync acknowledged ratings, one fsync per group of concurrent ratings
+# (survives power loss, not just a process crash)
+RATING_SPILL_FSYNC = os.getenv("RATING_SPILL_FSYNC", "false").lower() == "true"
+
+# Logging: hot paths log at DEBUG and only LOG_DEBUG_SAMPLE_RATE of those records are kept
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
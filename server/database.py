@@ -1,8 +1,12 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
+import threading
 from dotenv import load_dotenv
+from metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
 
 load_dotenv()
 
@@ -12,10 +16,65 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "arxiv_recsys")
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# DATABASE_URL / ASYNC_DATABASE_URL override the Postgres URLs, e.g.
+# sqlite:///./test.db and sqlite+aiosqlite:///./test.db for local testing
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+# asyncpg for the request handlers
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines are created on first use rather than at import, so scripts and
+# worker processes that import models don't pay for dialect imports and pool
+# setup until they actually talk to the database. main.py creates them in its
+# startup hook, before the first request.
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool)
+                # Statement counts/timings for /metrics
+                instrument_engine(engine)
+                _engine = engine
+    return _engine
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=TimedAsyncQueuePool)
+                # Async statements run on the sync engine underneath
+                instrument_engine(async_engine.sync_engine)
+                _async_engine = async_engine
+    return _async_engine
+
+async def dispose_engines():
+    """Close pooled connections at shutdown"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+# expire_on_commit=False: handlers read attributes after commit, and lazy
+# loads are not possible on an AsyncSession
+_async_session_factory = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+def SessionLocal(**kwargs) -> Session:
+    return _session_factory(bind=get_engine(), **kwargs)
+
+def AsyncSessionLocal(**kwargs) -> AsyncSession:
+    return _async_session_factory(bind=get_async_engine(), **kwargs)
 
 Base = declarative_base()
 
@@ -27,8 +86,16 @@ def get_db():
     finally:
         db.close()
 
-# Import models here to ensure they are registered with the declarative base
-from models import User, Paper, Rating
+# Dependency to get an async DB session for handlers that must not block the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-# Create all tables
-Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+def insert_for(db):
+    """Return the dialect-specific insert() so callers can use ON CONFLICT; db is a Session or Connection"""
+    bind = db if isinstance(db, Connection) else db.get_bind()
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
@@ -1,13 +1,12 @@
 from datetime import datetime, timedelta
-from database import SessionLocal, engine, Base
+from database import SessionLocal
 from models import User, Paper, Rating
-from passlib.context import CryptContext
+from summaries import refresh_day_summaries
+from categories import sync_paper_categories
+from authors import sync_paper_authors
+from passwords import get_pwd_context
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# The schema is managed by Alembic: run `alembic upgrade head` first
 
 def init_db():
     db = SessionLocal()
@@ -16,7 +15,7 @@ def init_db():
         if not db.query(User).filter(User.email == "admin@example.com").first():
             test_user = User(
                 email="admin@example.com",
-                hashed_password=pwd_context.hash("admin123")
+                hashed_password=get_pwd_context().hash("admin123")
             )
             db.add(test_user)
             db.commit()
@@ -24,8 +23,11 @@ def init_db():
         # Add some test papers if none exist
         if db.query(Paper).count() == 0:
             # Create papers for the last 3 days
+            dates = []
+            papers = []
             for i in range(3):
                 date = datetime.now().date() - timedelta(days=i)
+                dates.append(date)
                 for j in range(3):  # 3 papers per day
                     paper = Paper(
                         arxiv_id=f"2401.{i:02d}{j:02d}v1",
@@ -37,6 +39,11 @@ def init_db():
                         score=0.0
                     )
                     db.add(paper)
+                    papers.append(paper)
+            db.flush()
+            sync_paper_categories(db, papers)
+            sync_paper_authors(db, papers)
+            refresh_day_summaries(db, dates)
             db.commit()
 
     except Exception as e:
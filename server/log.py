@@ -0,0 +1,31 @@
+import logging
+import random
+
+from config import LOG_DEBUG_SAMPLE_RATE, LOG_LEVEL
+
+
+class DebugSampler(logging.Filter):
+    """Let through only a fraction of DEBUG records; INFO and above always pass.
+
+    Hot request paths log at DEBUG, so turning debug logging on in production
+    costs a bounded share of requests instead of a write per request.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def get_logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+        handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
@@ -1,20 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, date, timezone
 from typing import Optional, List
+import hashlib
+import json
 import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-from sqlalchemy.types import Date
-from database import get_db
-from models import User, Paper, Rating
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, dispose_engines, get_async_engine, get_db, get_async_db, get_engine, insert_for
+from models import User, Paper, PaperDaySummary, Rating, Author, AuthorFollow, UserRecommendation
 import schemas
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from cache import daily_list_cache
+from categories import category_dictionary, sync_paper_categories
+from authors import find_authors, followed_paper_ids, load_papers, sync_paper_authors
+from payloads import VersionedPayload, payload_response
+from principals import principal_cache
+from pagination import decode_cursor, decode_feed_cursor, encode_feed_cursor, get_paper_page, iter_catalog
+from personalize import category_payload, latency_budget, personalize, profile_cache
+from ratings import apply_ratings
+from summaries import list_day_summaries, refresh_day_summaries
+from passwords import PasswordHasherBusy, get_pwd_context, password_hasher
+from write_behind import rating_buffer
+from metrics import (
+    REQUEST_LATENCY, REQUEST_SQL_SECONDS, REQUEST_SQL_STATEMENTS, Gauge, RequestSqlStats,
+    current_request_sql, registry,
+)
+from log import get_logger
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, RATING_WRITE_BEHIND
 from fastapi import APIRouter
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 load_dotenv()
 
@@ -23,8 +42,7 @@ SECRET_KEY = os.getenv("SECRET_KEY", "development_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = get_logger(__name__)
 
 # FastAPI app
 app = FastAPI()
@@ -41,24 +59,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """Report total and authentication time per request in a Server-Timing header"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    timings = [f"app;dur={(time.perf_counter() - start) * 1000:.2f}"]
+    auth_ms = getattr(request.state, "auth_ms", None)
+    if auth_ms is not None:
+        timings.append(f"auth;dur={auth_ms:.2f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+    return response
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Per-route latency and per-request SQL statement count/time for /metrics"""
+    sql = RequestSqlStats()
+    token = current_request_sql.set(sql)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        current_request_sql.reset(token)
+        # Label by route template, not raw path, so /papers/{date} stays one series
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        REQUEST_LATENCY.observe(elapsed, request.method, route_path, str(status_code))
+        REQUEST_SQL_STATEMENTS.observe(sql.statements, request.method, route_path)
+        REQUEST_SQL_SECONDS.observe(sql.seconds, request.method, route_path)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Serializer for cached daily paper lists
+paper_list_adapter = TypeAdapter(List[schemas.PaperCard])
+
+# Daily lists load only the card columns; abstracts are fetched on demand
+# through /api/papers/abstracts
+PAPER_CARD_COLUMNS = load_only(
+    Paper.id, Paper.arxiv_id, Paper.title, Paper.authors,
+    Paper.categories, Paper.published_date, Paper.score,
+)
+
+# Most abstracts a client may request at once
+MAX_ABSTRACT_IDS = 200
+
+# How many recommendations the backend's batch job stores per user
+# (batch_recommendations.TOP_N)
+RECOMMENDATIONS_TOP_N = 50
 
 def get_user(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user(db, email)
+async def get_user_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_async(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt runs on the hasher's worker pool, never on the event loop
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    # jose (and its crypto backends) load on first use, not at worker start
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -68,7 +141,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def issue_tokens(user):
+    """Access token plus a long-lived refresh token that renews it without bcrypt"""
+    claims = {"sub": user.email, "uid": user.id}
+    access_token = create_access_token(
+        data=claims, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = create_access_token(
+        data={**claims, "type": "refresh"}, expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+async def resolve_principal(db: AsyncSession, email: str, user_id: Optional[int] = None) -> Optional[schemas.User]:
+    """Look up the user for a token subject, from the principal cache when possible"""
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = await get_user_async(db, email)
+        if user is None:
+            return None
+        principal = schemas.User.model_validate(user)
+        principal_cache.put(email, principal)
+    # Tokens carry the user id; a cached principal for the same subject but a
+    # different id means the account was recreated since the token was issued.
+    if user_id is not None and user_id != principal.id:
+        return None
+    return principal
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> schemas.User:
+    """Resolve the bearer token to a principal from its sub and uid claims"""
+    from jose import JWTError, jwt
+
+    start = time.perf_counter()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -77,39 +184,74 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("type") == "refresh":
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user(db, email)
-    if user is None:
-        raise credentials_exception
-    return user
+    user_id = payload.get("uid")
+    if user_id is not None:
+        # The claims hold all a principal has, so signed tokens need no users
+        # row; a deleted account's token lasts until it expires, and refresh
+        # re-reads the row
+        principal = schemas.User(id=user_id, email=email)
+    else:
+        # Tokens issued before they carried the user id
+        principal = await resolve_principal(db, email)
+        if principal is None:
+            raise credentials_exception
+    request.state.auth_ms = (time.perf_counter() - start) * 1000
+    return principal
 
-@api_router.post("/users/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+@api_router.post("/users/token", response_model=schemas.Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    return issue_tokens(user)
+
+@api_router.post("/users/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(body: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Exchange a refresh token for a new access/refresh token pair"""
+    from jose import JWTError, jwt
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    try:
+        payload = jwt.decode(body.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    email = payload.get("sub")
+    if email is None or payload.get("type") != "refresh":
+        raise credentials_exception
+    principal = await resolve_principal(db, email, payload.get("uid"))
+    if principal is None:
+        raise credentials_exception
+    return issue_tokens(principal)
 
 @api_router.get("/users/me")
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return {"email": current_user.email}
 
 @api_router.get("/users/me/ratings")
-async def get_user_ratings(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_user_ratings(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
         # Get all ratings for the current user
-        ratings = db.query(Rating).filter(Rating.user_id == current_user.id).all()
+        result = await db.execute(select(Rating).where(Rating.user_id == current_user.id))
+        ratings = result.scalars().all()
         
         # Format the ratings
         formatted_ratings = []
@@ -121,103 +263,187 @@ async def get_user_ratings(current_user: User = Depends(get_current_user), db: S
                 "created_at": rating.created_at.isoformat() if rating.created_at else None
             }
             formatted_ratings.append(formatted_rating)
+
+        if RATING_WRITE_BEHIND:
+            # Show ratings that are acknowledged but not yet flushed
+            pending = rating_buffer.pending_for_user(current_user.id)
+            for formatted_rating in formatted_ratings:
+                formatted_rating["rating"] = pending.pop(formatted_rating["paper_id"], formatted_rating["rating"])
+            formatted_ratings.extend(
+                {"id": None, "paper_id": paper_id, "rating": rating, "created_at": None}
+                for paper_id, rating in pending.items()
+            )
         
         return formatted_ratings
     except Exception as e:
-        print(f"Error in get_user_ratings: {str(e)}")  # Debug log
+        logger.exception(f"Error in get_user_ratings: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Last serialized /papers/dates body, reused while its ETag is unchanged
+_dates_payload: Optional[VersionedPayload] = None
+
 @api_router.get("/papers/dates")
-async def get_paper_dates(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_paper_dates(request: Request, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get list of dates that have papers with their counts"""
+    global _dates_payload
     try:
-        print("Fetching paper dates...")  # Debug log
-        # Get distinct dates and their paper counts
-        date_counts = db.query(
-            Paper.published_date,
-            func.count(Paper.id).label('count')
-        ).group_by(Paper.published_date)\
-         .order_by(Paper.published_date.desc())\
-         .all()
-        
-        print(f"Found {len(date_counts)} distinct dates")  # Debug log
-        
-        # Convert dates to string format and create response objects
-        date_data = []
-        for date_tuple in date_counts:
-            if date_tuple[0] is not None:
-                try:
-                    date_obj = date_tuple[0]
-                    if isinstance(date_obj, str):
-                        # If it's a string, parse it first
-                        date_obj = datetime.strptime(date_obj, "%Y-%m-%d").date()
-                    elif not isinstance(date_obj, date):
-                        # If it's a datetime, convert to date
-                        date_obj = date_obj.date()
-                    
-                    date_str = date_obj.strftime("%Y-%m-%d")
-                    date_data.append({
-                        "date": date_str,
-                        "count": date_tuple[1]
-                    })
-                    print(f"Added date: {date_str} with {date_tuple[1]} papers")  # Debug log
-                except Exception as e:
-                    print(f"Error formatting date {date_tuple[0]}: {e}")  # Debug log
-                    continue
-        
-        print(f"Returning {len(date_data)} formatted dates")  # Debug log
-        return {"dates": date_data}  # Return as JSON object
+        # Read the maintained per-day summary instead of grouping all papers
+        summaries = await db.run_sync(list_day_summaries)
+        logger.debug(f"Found {len(summaries)} distinct dates")
+
+        # Any refresh of any day bumps its version and so changes the tag
+        digest = hashlib.blake2b(digest_size=12)
+        for summary in summaries:
+            digest.update(f"{summary.published_date}:{summary.version};".encode())
+        etag = f'W/"dates-{digest.hexdigest()}"'
+
+        payload = _dates_payload
+        if payload is None or payload.etag != etag:
+            date_data = [
+                {
+                    "date": summary.published_date.strftime("%Y-%m-%d"),
+                    "count": summary.paper_count,
+                    "max_score": summary.max_score,
+                }
+                for summary in summaries
+            ]
+            payload = _dates_payload = VersionedPayload(etag, json.dumps({"dates": date_data}).encode())
+        return payload_response(request, payload)
     except Exception as e:
-        print(f"Error in get_paper_dates: {str(e)}")  # Debug log
+        logger.exception(f"Error in get_paper_dates: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@api_router.get("/papers/{date}", response_model=List[schemas.Paper])
+@api_router.get("/papers/stream")
+async def stream_papers(cursor: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Stream the whole catalog as NDJSON, one paper per line, in catalog order"""
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def generate():
+        # The request-scoped session is closed before the body is sent,
+        # so the stream owns its own session.
+        db = SessionLocal()
+        try:
+            for paper in iter_catalog(db, cursor=cursor):
+                yield schemas.Paper.model_validate(paper).model_dump_json() + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss counters for the daily paper list and principal caches"""
+    return {**daily_list_cache.stats(), "principals": principal_cache.stats(), "personalization": latency_budget.stats()}
+
+async def serialize_papers_for_date(db: AsyncSession, target_date: date) -> VersionedPayload:
+    # Read the version first: if papers change in between, the body is newer
+    # than its tag and the next refresh moves clients on anyway
+    version = await db.scalar(
+        select(PaperDaySummary.version).where(PaperDaySummary.published_date == target_date)
+    )
+    result = await db.execute(
+        select(Paper)
+        .options(PAPER_CARD_COLUMNS)
+        .where(Paper.published_date == target_date)
+        .order_by(Paper.score.desc())
+    )
+    papers = result.scalars().all()
+    logger.debug(f"Found {len(papers)} papers for {target_date}")
+    body = paper_list_adapter.dump_json(
+        paper_list_adapter.validate_python(papers, from_attributes=True)
+    )
+    return VersionedPayload(f'W/"{target_date.isoformat()}-v{version or 0}"', body)
+
+@api_router.get("/papers/abstracts", response_model=List[schemas.PaperAbstract])
+async def get_paper_abstracts(
+    ids: str = Query(..., description="Comma-separated paper ids"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the abstracts for a batch of papers; unknown ids are left out"""
+    try:
+        paper_ids = {int(paper_id) for paper_id in ids.split(",") if paper_id.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not paper_ids:
+        raise HTTPException(status_code=400, detail="No paper ids given")
+    if len(paper_ids) > MAX_ABSTRACT_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ABSTRACT_IDS} ids per request")
+
+    result = await db.execute(
+        select(Paper.id, Paper.abstract).where(Paper.id.in_(paper_ids)).order_by(Paper.id)
+    )
+    return [{"id": paper_id, "abstract": abstract} for paper_id, abstract in result]
+
+@api_router.get("/papers/{date}", response_model=List[schemas.PaperCard])
 async def get_papers_by_date(
     date: str,
+    request: Request,
+    personalized: bool = False,
+    category: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get papers for a specific date"""
+    """Get papers for a specific date, without abstracts
+
+    category=<name> keeps the papers listing that category; personalized=1
+    re-ranks them for the user.
+    """
     try:
         target_date = datetime.strptime(date, "%Y-%m-%d").date()
-        print(f"Looking for papers on date: {target_date}")  # Debug log
-        
-        papers = db.query(Paper)\
-                  .filter(Paper.published_date.cast(Date) == target_date)\
-                  .order_by(Paper.score.desc())\
-                  .all()
-        print(f"Found {len(papers)} papers")  # Debug log
-        return papers if papers else []
+        payload = await daily_list_cache.get_or_load_async(
+            target_date, lambda: serialize_papers_for_date(db, target_date)
+        )
+        category_id = None
+        if category is not None:
+            category_id = await category_dictionary.id_for(db, category)
+            if category_id is None:
+                return []
+        headers = {}
+        if personalized:
+            ranked, outcome = await personalize(current_user.id, payload, target_date, category_id)
+            if ranked is not None:
+                return payload_response(request, ranked, compress=False, headers={"X-Ranking": "personalized"})
+            headers["X-Ranking"] = f"global; reason={outcome}"
+        if category_id is not None:
+            payload = await category_payload(db, payload, target_date, category_id)
+            return payload_response(request, payload, compress=False, headers=headers)
+        return payload_response(request, payload, headers=headers)
     except ValueError as e:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid date format. Use YYYY-MM-DD: {str(e)}"
         )
     except Exception as e:
-        print(f"Error in get_papers_by_date: {str(e)}")  # Add logging
+        logger.exception(f"Error in get_papers_by_date: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@api_router.get("/papers", response_model=List[schemas.Paper])
-async def get_papers(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Get all papers (to be deprecated)"""
+@api_router.get("/papers", response_model=schemas.PaperPage)
+def get_papers(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get one page of the catalog, newest first; pass next_cursor to continue"""
     try:
-        print("Fetching all papers...")  # Debug log
-        papers = db.query(Paper)\
-                  .order_by(Paper.published_date.desc(), Paper.score.desc())\
-                  .all()
-        print(f"Found {len(papers)} papers in total")  # Debug log
-        if not papers:
-            print("Warning: No papers found in database")  # Debug log
-        return papers
+        papers, next_cursor = get_paper_page(db, cursor=cursor, limit=limit)
+        return {"papers": papers, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error in get_papers: {str(e)}")  # Add logging
+        logger.exception(f"Error in get_papers: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @api_router.post("/papers/{paper_id}/rate")
 async def rate_paper(
     paper_id: int,
     rating_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     rating_value = rating_data.get("rating_value")
@@ -227,39 +453,166 @@ async def rate_paper(
     if not isinstance(rating_value, int) or rating_value < 1 or rating_value > 5:
         raise HTTPException(status_code=400, detail="Rating must be an integer between 1 and 5")
     
-    # Check if paper exists
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
-    if not paper:
+    if RATING_WRITE_BEHIND:
+        # Acknowledged once spilled locally, so check the paper now; the
+        # flush would otherwise drop the rating after acknowledging it
+        if await db.scalar(select(Paper.id).where(Paper.id == paper_id)) is None:
+            raise HTTPException(status_code=404, detail="Paper not found")
+        await rating_buffer.add(current_user.id, paper_id, rating_value)
+        return {"message": "Rating submitted successfully"}
+
+    # Insert or overwrite the rating and move the paper's aggregates and score
+    rated = await db.run_sync(apply_ratings, {(current_user.id, paper_id): rating_value})
+    if not rated:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Paper not found")
-    
-    # Check if user has already rated this paper
-    existing_rating = db.query(Rating).filter(
-        Rating.user_id == current_user.id,
-        Rating.paper_id == paper_id
-    ).first()
-    
-    if existing_rating:
-        # Update existing rating
-        existing_rating.rating = rating_value
-    else:
-        # Create new rating
-        new_rating = Rating(
-            user_id=current_user.id,
-            paper_id=paper_id,
-            rating=rating_value
-        )
-        db.add(new_rating)
-    
-    db.commit()
+    await db.commit()
+    invalidate_rated_days(rated)
+    profile_cache.evict(current_user.id)
     return {"message": "Rating submitted successfully"}
 
+@api_router.get("/ratings/buffer")
+async def get_rating_buffer_stats(current_user: User = Depends(get_current_user)):
+    """Queue depth and flush latency of the rating write-behind buffer"""
+    return {"enabled": RATING_WRITE_BEHIND, **rating_buffer.stats()}
+
+@api_router.post("/ratings/batch")
+async def rate_papers_batch(
+    batch: schemas.RatingBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Apply many ratings for the current user in one transaction"""
+    # A statement cannot upsert the same row twice, so the last rating per paper wins
+    ratings = {item.paper_id: item.rating_value for item in batch.ratings}
+    if RATING_WRITE_BEHIND:
+        # Through the buffer like single ratings: a direct write would be
+        # overwritten by an older buffered (or spilled) rating of the same paper
+        known = set(await db.scalars(select(Paper.id).where(Paper.id.in_(list(ratings)))))
+        await rating_buffer.add_many({
+            (current_user.id, paper_id): rating for paper_id, rating in ratings.items() if paper_id in known
+        })
+        return {"applied": len(known), "missing": sorted(set(ratings) - known)}
+    rated = await db.run_sync(
+        apply_ratings, {(current_user.id, paper_id): rating for paper_id, rating in ratings.items()}
+    )
+    await db.commit()
+    invalidate_rated_days(rated)
+    profile_cache.evict(current_user.id)
+    return {"applied": len(rated), "missing": sorted(set(ratings) - set(rated))}
+
+@api_router.get("/authors", response_model=List[schemas.Author])
+async def search_authors(
+    name: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Authors whose name starts with name, ignoring accents, case and punctuation"""
+    return await find_authors(db, name, limit=limit)
+
+@api_router.get("/users/me/authors", response_model=List[schemas.Author])
+async def get_followed_authors(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Authors the current user follows"""
+    result = await db.execute(
+        select(Author)
+        .join(AuthorFollow, AuthorFollow.author_id == Author.id)
+        .where(AuthorFollow.user_id == current_user.id)
+        .order_by(Author.normalized_name)
+    )
+    return result.scalars().all()
+
+@api_router.put("/users/me/authors/{author_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def follow_author(author_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Follow an author; following twice is a no-op"""
+    if await db.get(Author, author_id) is None:
+        raise HTTPException(status_code=404, detail="Author not found")
+    insert = await db.run_sync(insert_for)
+    await db.execute(
+        insert(AuthorFollow).values(user_id=current_user.id, author_id=author_id, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[AuthorFollow.user_id, AuthorFollow.author_id])
+    )
+    await db.commit()
+
+@api_router.delete("/users/me/authors/{author_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unfollow_author(author_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Stop following an author"""
+    follow = await db.get(AuthorFollow, (current_user.id, author_id))
+    if follow is not None:
+        await db.delete(follow)
+        await db.commit()
+
+@api_router.get("/users/me/feed", response_model=schemas.PaperCardPage)
+async def get_author_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Papers by the authors the current user follows, newest first; pass next_cursor to continue"""
+    try:
+        after = decode_feed_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        keys = await followed_paper_ids(db, current_user.id, after=after, limit=limit + 1)
+        next_cursor = encode_feed_cursor(*keys[limit - 1]) if len(keys) > limit else None
+        papers = await load_papers(db, [paper_id for _, paper_id in keys[:limit]], PAPER_CARD_COLUMNS)
+        return {"papers": papers, "next_cursor": next_cursor}
+    except Exception as e:
+        logger.exception(f"Error in get_author_feed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@api_router.get("/users/me/recommendations", response_model=List[schemas.PaperCard])
+async def get_user_recommendations(
+    response: Response,
+    limit: int = Query(10, ge=1, le=RECOMMENDATIONS_TOP_N),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The current user's precomputed recommendations, best first
+
+    Users the last batch run did not cover get the latest day's list ranked
+    live for them instead; X-Ranking says which was served.
+    """
+    try:
+        # One range read of the (user_id, rank) primary key joined to papers
+        result = await db.execute(
+            select(Paper)
+            .options(PAPER_CARD_COLUMNS)
+            .join(UserRecommendation, UserRecommendation.paper_id == Paper.id)
+            .where(UserRecommendation.user_id == current_user.id)
+            .order_by(UserRecommendation.rank)
+            .limit(limit)
+        )
+        papers = result.scalars().all()
+        if papers:
+            response.headers["X-Ranking"] = "precomputed"
+            return papers
+
+        latest = await db.scalar(select(func.max(PaperDaySummary.published_date)).where(PaperDaySummary.paper_count > 0))
+        if latest is None:
+            return []
+        payload = await daily_list_cache.get_or_load_async(latest, lambda: serialize_papers_for_date(db, latest))
+        ranked, outcome = await personalize(current_user.id, payload, latest)
+        response.headers["X-Ranking"] = "personalized" if ranked is not None else f"global; reason={outcome}"
+        return json.loads((ranked or payload).body)[:limit]
+    except Exception as e:
+        logger.exception(f"Error in get_user_recommendations: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def invalidate_rated_days(rated: dict) -> None:
+    """Drop cached daily lists whose scores a committed rating changed"""
+    for day in set(rated.values()):
+        daily_list_cache.invalidate(day)
+
 # Create initial admin user if it doesn't exist
 def create_initial_admin():
     db = next(get_db())
     if not get_user(db, "admin@example.com"):
         admin_user = User(
             email="admin@example.com",
-            hashed_password=pwd_context.hash("admin123")
+            hashed_password=get_pwd_context().hash("admin123")
         )
         db.add(admin_user)
         db.commit()
@@ -290,7 +643,53 @@ def create_initial_papers():
         ]
         for paper in papers:
             db.add(paper)
+        db.flush()
+        sync_paper_categories(db, papers)
+        sync_paper_authors(db, papers)
+        refresh_day_summaries(db, [paper.published_date for paper in papers])
         db.commit()
+        daily_list_cache.invalidate()
+
+# Cache and buffer state, read when /metrics is scraped
+for _name, _doc, _read, _kind in [
+    ("daily_list_cache_entries", "Dates held in the daily list cache", lambda: daily_list_cache.stats()["entries"], "gauge"),
+    ("daily_list_cache_hits_total", "Daily list cache hits", lambda: daily_list_cache.stats()["hits"], "counter"),
+    ("daily_list_cache_misses_total", "Daily list cache misses", lambda: daily_list_cache.stats()["misses"], "counter"),
+    ("principal_cache_entries", "Principals held in the auth cache", lambda: principal_cache.stats()["entries"], "gauge"),
+    ("principal_cache_hits_total", "Principal cache hits", lambda: principal_cache.stats()["hits"], "counter"),
+    ("principal_cache_misses_total", "Principal cache misses", lambda: principal_cache.stats()["misses"], "counter"),
+    ("rating_buffer_queue_depth", "Ratings acknowledged but not yet flushed", lambda: rating_buffer.stats()["queue_depth"], "gauge"),
+    ("rating_buffer_flush_errors_total", "Failed write-behind flushes", lambda: rating_buffer.stats()["flush_errors"], "counter"),
+    ("rating_buffer_dropped_ratings_total", "Acknowledged ratings whose paper was gone at flush", lambda: rating_buffer.stats()["dropped_ratings"], "counter"),
+    ("password_hasher_pending", "Password hashes queued or running", lambda: password_hasher.stats()["pending"], "gauge"),
+]:
+    registry.register(Gauge(_name, _doc, _read, _kind))
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of request, SQL, pool and cache metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+def create_engines():
+    # Engines are lazy; build them before serving so the first request doesn't.
+    # No connection is opened here, and the schema is left to Alembic.
+    get_engine()
+    get_async_engine()
+
+@app.on_event("startup")
+def start_rating_buffer():
+    if RATING_WRITE_BEHIND:
+        rating_buffer.start()
+
+@app.on_event("shutdown")
+def stop_rating_buffer():
+    if RATING_WRITE_BEHIND:
+        rating_buffer.stop()
+
+@app.on_event("shutdown")
+async def close_engines():
+    await dispose_engines()
 
 # Include API router
 app.include_router(api_router)
@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[LabelValues, Tuple[list, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            counts, total = self._values.get(labelvalues) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labelvalues] = (counts, total + value)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    bucket_labels = _format_labels(self.labelnames, labelvalues, 'le="%s"' % le)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labelvalues)} {cumulative}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """A value read from a callback at scrape time.
+
+    kind="counter" exposes a callback that only ever grows, such as a
+    cache's hit count, with the right Prometheus type.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def render(self) -> str:
+        return "\n".join([
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {float(self.callback())}",
+        ])
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status")))
+REQUEST_SQL_STATEMENTS = registry.register(Histogram(
+    "http_request_sql_statements", "SQL statements executed per request", ("method", "route"), COUNT_BUCKETS))
+REQUEST_SQL_SECONDS = registry.register(Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request", ("method", "route")))
+SQL_STATEMENTS = registry.register(Counter(
+    "sql_statements_total", "SQL statements executed"))
+SQL_SECONDS = registry.register(Histogram(
+    "sql_statement_duration_seconds", "Latency of individual SQL statements"))
+POOL_CHECKOUT_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("pool",)))
+PERSONALIZED_RANKINGS = registry.register(Counter(
+    "personalized_rankings_total", "Personalized daily list requests by outcome", ("outcome",)))
+PERSONALIZATION_SECONDS = registry.register(Histogram(
+    "personalization_duration_seconds", "Time spent re-ranking a daily list for a user"))
+RATING_FLUSH_SECONDS = registry.register(Histogram(
+    "rating_buffer_flush_duration_seconds", "Time to write one write-behind batch of ratings"))
+
+
+class RequestSqlStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set by the request middleware; engine events add to whichever request is
+# current (contextvars follow the request into threadpool and greenlet code).
+current_request_sql: ContextVar[Optional[RequestSqlStats]] = ContextVar("current_request_sql", default=None)
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement run through a (sync) engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        SQL_STATEMENTS.inc()
+        SQL_SECONDS.observe(elapsed)
+        stats = current_request_sql.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its
+        # start so later statements pair with their own
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+class _TimedCheckout:
+    """Mixin timing how long _do_get waits for a pooled connection"""
+
+    pool_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, self.pool_label)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pool_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pool_label = "async"
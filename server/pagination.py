@@ -0,0 +1,86 @@
+import base64
+import json
+from datetime import date
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import Paper
+
+# Catalog order shared by the paginated and streaming endpoints. It matches
+# ix_papers_published_date_score_id so every page is an index range scan.
+# Papers without a published_date follow the dated ones, by score and id.
+CATALOG_ORDER = (Paper.published_date.desc(), Paper.score.desc(), Paper.id.desc())
+
+
+def encode_cursor(paper: Paper) -> str:
+    """Encode the sort key of the last paper on a page as an opaque cursor"""
+    published_date = paper.published_date.isoformat() if paper.published_date is not None else None
+    key = [published_date, paper.score, paper.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[date], float, int]:
+    """Decode a cursor from encode_cursor, raising ValueError if malformed"""
+    try:
+        published_date, score, paper_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if published_date is not None:
+            published_date = date.fromisoformat(published_date)
+        return published_date, float(score), int(paper_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def encode_feed_cursor(published_date: date, paper_id: int) -> str:
+    """Encode the (published_date, id) key of the last paper on a feed page"""
+    return base64.urlsafe_b64encode(json.dumps([published_date.isoformat(), paper_id]).encode()).decode()
+
+
+def decode_feed_cursor(cursor: str) -> Tuple[date, int]:
+    """Decode a cursor from encode_feed_cursor, raising ValueError if malformed"""
+    try:
+        published_date, paper_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(published_date), int(paper_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def catalog_queries(cursor: Optional[str] = None) -> List[Select]:
+    """Select papers in catalog order, starting strictly after cursor.
+
+    Dated and undated papers are separate range scans of the keyset index,
+    run in that order: one query with a NULLS LAST order or an OR on the
+    key could not use it.
+    """
+    dated = select(Paper).where(Paper.published_date.isnot(None)).order_by(*CATALOG_ORDER)
+    undated = select(Paper).where(Paper.published_date.is_(None)).order_by(*CATALOG_ORDER[1:])
+    if not cursor:
+        return [dated, undated]
+    published_date, score, paper_id = decode_cursor(cursor)
+    if published_date is None:
+        return [undated.where(tuple_(Paper.score, Paper.id) < tuple_(score, paper_id))]
+    dated = dated.where(tuple_(Paper.published_date, Paper.score, Paper.id) < tuple_(published_date, score, paper_id))
+    return [dated, undated]
+
+
+def get_paper_page(db: Session, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[Paper], Optional[str]]:
+    """Return one page of papers and the cursor for the next page (None at the end)"""
+    papers: List[Paper] = []
+    for stmt in catalog_queries(cursor):
+        papers += db.execute(stmt.limit(limit + 1 - len(papers))).scalars().all()
+        if len(papers) > limit:
+            return papers[:limit], encode_cursor(papers[limit - 1])
+    return papers, None
+
+
+def iter_catalog(db: Session, cursor: Optional[str] = None, batch_size: int = 1000) -> Iterator[Paper]:
+    """Yield every paper in catalog order through a server-side cursor.
+
+    yield_per keeps at most batch_size rows buffered, so walking the whole
+    catalog uses constant memory.
+    """
+    for stmt in catalog_queries(cursor):
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        for paper in result.scalars():
+            yield paper
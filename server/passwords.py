@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WORKERS
+
+_pwd_context = None
+
+
+def get_pwd_context():
+    """The bcrypt CryptContext, built on first use; importing passlib is slow
+    and most processes (and most requests) never hash a password"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are already queued"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so a few threads verify passwords in parallel
+    while the event loop keeps serving other requests. At most max_pending
+    calls may be running or queued; beyond that callers get
+    PasswordHasherBusy immediately rather than piling up behind a login storm.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(get_pwd_context().verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_pwd_context().hash, password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,105 @@
+import gzip
+import threading
+from typing import Dict, Optional
+
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; clients then get gzip
+    brotli = None
+
+GZIP_LEVEL = 6
+# Variants are built once per version, so spend more effort than a
+# per-request compressor could afford
+BROTLI_QUALITY = 9
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick the best precompressible encoding the client accepts ("identity" if none)"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class VersionedPayload:
+    """A serialized response body for one version of a resource.
+
+    Compressed variants are produced the first time a client asks for them
+    and then reused until the version changes, so a popular list is
+    compressed once rather than on every request. The ETag is weak so one
+    tag covers all encodings of the same version.
+    """
+
+    __slots__ = ("etag", "body", "_variants", "_lock")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+        self._variants: Dict[str, bytes] = {"identity": body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        variant = self._variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(encoding)
+                if variant is None:
+                    variant = _compress(self.body, encoding)
+                    self._variants[encoding] = variant
+        return variant
+
+
+def payload_response(request, payload: VersionedPayload, media_type: str = "application/json", compress: bool = True, headers: Optional[Dict[str, str]] = None):
+    """304 if the client already holds this version, else the best encoding it accepts
+
+    Pass compress=False for one-off payloads, which would be compressed for
+    a single response.
+    """
+    # Authenticated data: cacheable by the browser only, and always revalidated
+    headers = {**(headers or {}), "ETag": payload.etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if compress else "identity"
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload.encoded(encoding), media_type=media_type, headers=headers)
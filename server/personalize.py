@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from config import (
+    DAILY_CACHE_MAX_DATES, PERSONALIZED_BUDGET_MS, PERSONALIZED_PROFILE_CACHE_SIZE,
+    PERSONALIZED_PROFILE_TTL_SECONDS, PERSONALIZED_WINDOW,
+)
+from database import AsyncSessionLocal
+from log import get_logger
+from metrics import PERSONALIZATION_SECONDS, PERSONALIZED_RANKINGS
+from models import Paper, PaperCategory, UserCategoryStat
+from payloads import VersionedPayload
+
+# numpy is imported where it is used, so importing this module on the
+# server's startup path does not load it
+if TYPE_CHECKING:
+    import numpy as np
+
+card_adapter = TypeAdapter(schemas.PaperCard)
+
+logger = get_logger(__name__)
+
+
+class DayRanking:
+    """One version of a day's list, laid out for filtering and re-ranking.
+
+    Cards are kept as their serialized JSON so a derived body is a join of
+    existing bytes, and categories as (paper row, category id) pairs from
+    paper_categories, so a category filter or a user's boosts apply to the
+    whole day in a few array operations.
+    """
+
+    __slots__ = ("cards", "scores", "paper_rows", "category_ids")
+
+    def __init__(self, cards: List[bytes], scores: "np.ndarray", paper_rows: "np.ndarray", category_ids: "np.ndarray"):
+        self.cards = cards
+        self.scores = scores
+        self.paper_rows = paper_rows
+        self.category_ids = category_ids
+
+    @classmethod
+    def build(cls, body: bytes, pairs: Iterable[Tuple[int, int]]) -> "DayRanking":
+        """Build from a serialized daily list (in global order) and its (paper_id, category_id) pairs"""
+        import numpy as np
+
+        papers = json.loads(body)
+        rows = {paper["id"]: row for row, paper in enumerate(papers)}
+        pairs = [(rows[paper_id], category_id) for paper_id, category_id in pairs if paper_id in rows]
+        return cls(
+            [card_adapter.dump_json(card_adapter.validate_python(paper)) for paper in papers],
+            np.array([paper["score"] for paper in papers], dtype=np.float64),
+            np.array([row for row, _ in pairs], dtype=np.int32),
+            np.array([category_id for _, category_id in pairs], dtype=np.int32),
+        )
+
+    def in_category(self, category_id: int) -> "np.ndarray":
+        """Rows of the papers listing category_id, in global order"""
+        import numpy as np
+
+        return np.unique(self.paper_rows[self.category_ids == category_id])
+
+    def rerank(self, boost_by_category: "np.ndarray", rows: "Optional[np.ndarray]" = None) -> "np.ndarray":
+        """Rows (all, or just rows) by score x the boost of every category a paper lists.
+
+        Same formula as the recommender's category fallback. Equal products
+        go to the paper with the larger boost, so unrated papers (score 0)
+        still follow the user's preferences, and then keep the global order.
+        """
+        import numpy as np
+
+        boosts = np.ones(len(self.cards), dtype=np.float64)
+        np.multiply.at(boosts, self.paper_rows, boost_by_category[self.category_ids])
+        if rows is None:
+            rows = np.arange(len(self.cards))
+        boosts = boosts[rows]
+        return rows[np.lexsort((-boosts, -(self.scores[rows] * boosts)))]
+
+    def body(self, rows: "np.ndarray") -> bytes:
+        return b"[" + b",".join([self.cards[row] for row in rows.tolist()]) + b"]"
+
+
+_rankings_lock = threading.Lock()
+_rankings: "OrderedDict[str, DayRanking]" = OrderedDict()
+
+
+async def day_ranking(db: AsyncSession, payload: VersionedPayload, day: date) -> DayRanking:
+    """The ranking layout for a cached daily list, built once per ETag"""
+    with _rankings_lock:
+        ranking = _rankings.get(payload.etag)
+        if ranking is not None:
+            _rankings.move_to_end(payload.etag)
+            return ranking
+    # The ETag carries the day's version, so an entry never goes stale; a
+    # paper's categories are fixed at ingest, so the pairs can be read now
+    result = await db.execute(
+        select(PaperCategory.paper_id, PaperCategory.category_id)
+        .join(Paper, Paper.id == PaperCategory.paper_id)
+        .where(Paper.published_date == day)
+    )
+    ranking = DayRanking.build(payload.body, result.all())
+    with _rankings_lock:
+        _rankings[payload.etag] = ranking
+        while len(_rankings) > DAILY_CACHE_MAX_DATES:
+            _rankings.popitem(last=False)
+    return ranking
+
+
+def clear_rankings() -> None:
+    with _rankings_lock:
+        _rankings.clear()
+
+
+async def category_payload(db: AsyncSession, payload: VersionedPayload, day: date, category_id: int) -> VersionedPayload:
+    """The day's papers in one category, in global order"""
+    ranking = await day_ranking(db, payload, day)
+    return VersionedPayload(f'{payload.etag[:-1]}-c{category_id}"', ranking.body(ranking.in_category(category_id)))
+
+
+class ProfileCache:
+    """Per-user category boosts (1 + average rating / 5), LRU with a TTL.
+
+    Ratings written through this process evict the rater; ratings written
+    elsewhere show up once the entry expires.
+    """
+
+    def __init__(self, max_users: int = PERSONALIZED_PROFILE_CACHE_SIZE, ttl_seconds: float = PERSONALIZED_PROFILE_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[Tuple[np.ndarray, np.ndarray], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, db: AsyncSession, user_id: int) -> "Tuple[np.ndarray, np.ndarray]":
+        """(category ids, boosts) for the categories the user has rated"""
+        import numpy as np
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        result = await db.execute(
+            select(UserCategoryStat.category_id, UserCategoryStat.rating_sum, UserCategoryStat.rating_count)
+            .where(UserCategoryStat.user_id == user_id, UserCategoryStat.rating_count > 0)
+        )
+        rows = result.all()
+        profile = (
+            np.array([category_id for category_id, _, _ in rows], dtype=np.int32),
+            np.array([1 + rating_sum / rating_count / 5 for _, rating_sum, rating_count in rows], dtype=np.float64),
+        )
+        with self._lock:
+            self._entries[user_id] = (profile, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return profile
+
+    def evict(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def boost_table(profile: "Tuple[np.ndarray, np.ndarray]", ranking: DayRanking) -> "np.ndarray":
+    """Boost per category id, 1 for categories the user hasn't rated"""
+    import numpy as np
+
+    category_ids, boosts = profile
+    size = max(int(category_ids.max(initial=-1)), int(ranking.category_ids.max(initial=-1))) + 1
+    table = np.ones(size, dtype=np.float64)
+    table[category_ids] = boosts
+    return table
+
+
+class LatencyBudget:
+    """Keeps personalization inside a p99 latency budget.
+
+    Every attempt is timed. While the p99 of the last `window` attempts is
+    over budget, only one request in `probe_every` attempts personalization
+    (so the estimate can recover) and the rest get the global order at once.
+    """
+
+    def __init__(self, budget_ms: float = PERSONALIZED_BUDGET_MS, window: int = PERSONALIZED_WINDOW, probe_every: int = 20):
+        self.budget = budget_ms / 1000
+        self.probe_every = probe_every
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._p99 = 0.0
+        self._skipped = 0
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def remaining(self, start: float) -> float:
+        return self.budget - (time.perf_counter() - start)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._p99 <= self.budget:
+                return True
+            self._skipped += 1
+            if self._skipped >= self.probe_every:
+                self._skipped = 0
+                return True
+            return False
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._recorded += 1
+            # Recomputed every few samples (the window changes slowly), and
+            # at once when a sample could raise it
+            if self._recorded % 16 == 0 or seconds > self._p99:
+                import numpy as np
+
+                self._p99 = float(np.percentile(self._samples, 99))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"budget_ms": self.budget * 1000, "p99_ms": self._p99 * 1000, "samples": len(self._samples)}
+
+
+profile_cache = ProfileCache()
+latency_budget = LatencyBudget()
+
+# Loads that outlived their request's budget, kept until they finish
+_background_loads: "set[asyncio.Task]" = set()
+
+
+def profile_etag(payload: VersionedPayload, profile: "Tuple[np.ndarray, np.ndarray]") -> str:
+    """Tag for one user's view of one list version"""
+    category_ids, boosts = profile
+    digest = hashlib.blake2b(category_ids.tobytes() + boosts.tobytes(), digest_size=8).hexdigest()
+    return f'{payload.etag[:-1]}-p{digest}"'
+
+
+async def _load_inputs(user_id: int, payload: VersionedPayload, day: date) -> "Tuple[Tuple[np.ndarray, np.ndarray], Optional[DayRanking]]":
+    """The user's profile and, if it has any categories, the day's ranking layout.
+
+    Reads go through a session of their own, so a request that stops
+    waiting leaves its own session usable for the global fallback.
+    """
+    async with AsyncSessionLocal() as db:
+        profile = await profile_cache.get(db, user_id)
+        if len(profile[0]) == 0:
+            return profile, None
+        return profile, await day_ranking(db, payload, day)
+
+
+def _finish_in_background(task: "asyncio.Task") -> None:
+    # Not cancelled: it completes and fills the caches for the next request
+    _background_loads.add(task)
+    task.add_done_callback(_background_load_done)
+
+
+def _background_load_done(task: "asyncio.Task") -> None:
+    _background_loads.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background personalization load failed: {task.exception()}")
+
+
+async def personalize(
+    user_id: int, payload: VersionedPayload, day: date, category_id: Optional[int] = None
+) -> Tuple[Optional[VersionedPayload], str]:
+    """The day's list (or its papers in category_id) re-ranked for user_id, and the outcome.
+
+    The payload is None when the global order should be served instead:
+    the user has no ratings yet ("no_profile"), recent attempts are over
+    budget ("shed"), or this one ran out of budget ("timeout"). The reads
+    are awaited for at most the remaining budget; the re-ranking itself is
+    in-memory and checked once it returns.
+    """
+    if not latency_budget.allow():
+        PERSONALIZED_RANKINGS.inc(1.0, "shed")
+        return None, "shed"
+    start = time.perf_counter()
+    outcome = "timeout"
+    try:
+        # A cache hit costs nothing; a miss is a primary-key range read for
+        # the profile and one read of the day's categories
+        load = asyncio.ensure_future(_load_inputs(user_id, payload, day))
+        try:
+            profile, ranking = await asyncio.wait_for(asyncio.shield(load), max(latency_budget.remaining(start), 0.0))
+        except asyncio.TimeoutError:
+            _finish_in_background(load)
+            return None, outcome
+        if ranking is None:
+            outcome = "no_profile"
+            return None, outcome
+        rows = ranking.in_category(category_id) if category_id is not None else None
+        order = ranking.rerank(boost_table(profile, ranking), rows)
+        if latency_budget.remaining(start) <= 0:
+            return None, outcome
+        outcome = "personalized"
+        etag = profile_etag(payload, profile)
+        if category_id is not None:
+            etag = f'{etag[:-1]}-c{category_id}"'
+        return VersionedPayload(etag, ranking.body(order)), outcome
+    finally:
+        elapsed = time.perf_counter() - start
+        latency_budget.record(elapsed)
+        PERSONALIZATION_SECONDS.observe(elapsed)
+        PERSONALIZED_RANKINGS.inc(1.0, outcome)
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+import schemas
+from config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS
+from models import User
+
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of authenticated users, keyed by token subject.
+
+    get_current_user consults it before touching the users table, so a warm
+    request authenticates with only the JWT signature check. Entries are
+    plain schemas.User values rather than ORM objects, so they are safe to
+    share between requests and sessions.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[schemas.User, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[schemas.User]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(subject)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[subject]
+            self.misses += 1
+            return None
+
+    def put(self, subject: str, principal: schemas.User) -> None:
+        with self._lock:
+            self._entries[subject] = (principal, time.monotonic())
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Any in-process change to a user (password, email, deletion) drops the
+    # cached principal; changes made by other processes age out with the TTL.
+    principal_cache.invalidate(target.email)
+    for previous_email in inspect(target).attrs.email.history.deleted:
+        principal_cache.invalidate(previous_email)
@@ -0,0 +1,333 @@
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import (
+    Integer, bindparam, case, column, exists, func, literal, literal_column, select, tuple_, update, values,
+)
+from sqlalchemy.orm import Session
+
+from database import insert_for
+from models import Paper, PaperCategory, Rating, UserCategoryStat
+from summaries import touch_day_summaries
+
+
+def score_expression(rating_sum, rating_count, fallback):
+    """Paper score from its running aggregates, avg * (1 - 1/(n + 1)); unrated papers keep fallback"""
+    return case(
+        (rating_count > 0, (rating_sum * 1.0 / rating_count) * (1 - 1.0 / (rating_count + 1))),
+        else_=fallback,
+    )
+
+
+def _on_conflict_update(stmt):
+    # uq_ratings_user_paper makes a repeat rating overwrite the previous one
+    return stmt.on_conflict_do_update(
+        index_elements=[Rating.user_id, Rating.paper_id],
+        set_={"rating": stmt.excluded.rating},
+    )
+
+
+def ratings_upsert_rows(db, ratings: Dict[Tuple[int, int], int]):
+    """Multi-row upsert of {(user_id, paper_id): rating} in a single statement"""
+    insert = insert_for(db)
+    now = datetime.utcnow()
+    stmt = insert(Rating).values([
+        {"user_id": user_id, "paper_id": paper_id, "rating": rating, "created_at": now}
+        for (user_id, paper_id), rating in ratings.items()
+    ])
+    return _on_conflict_update(stmt)
+
+
+def apply_ratings(db: Session, ratings: Dict[Tuple[int, int], int]) -> Dict[int, date]:
+    """Upsert {(user_id, paper_id): rating} and keep the aggregates in step.
+
+    In the caller's transaction (the caller commits), each rating is
+    upserted and its paper's rating_sum, rating_count and score, and the
+    rater's per-category profile, move by the difference from the rating it
+    replaces. The rated days' summaries get a new version and max_score.
+    Ratings for unknown papers are skipped. Returns {paper_id: published_date}
+    for the papers that were rated.
+
+    On Postgres all of it is one statement (see _apply_ratings_statement);
+    other databases (SQLite in tests) take a few.
+    """
+    if not ratings:
+        return {}
+    if db.get_bind().dialect.name == "postgresql":
+        rated = dict(db.execute(_apply_ratings_statement(ratings)).all())
+    else:
+        rated = _apply_ratings_stepwise(db, ratings)
+    touch_day_summaries(db, [day for day in rated.values() if day is not None])
+    return rated
+
+
+def _apply_ratings_statement(ratings: Dict[Tuple[int, int], int]):
+    """apply_ratings as a single statement of data-modifying CTEs.
+
+    The replaced ratings are read FOR UPDATE, which waits for a concurrent
+    re-rating of the same row and sees its result, and feed the upsert, so
+    each one is read before its row is overwritten. The upsert reports
+    whether it inserted (xmax = 0). Each paper's UPDATE adds its delta to
+    the row's latest version, so concurrent ratings of one paper don't lose
+    updates. Two first ratings of the same (user, paper) racing each other
+    are the one case counted from a stale previous value;
+    reconcile_rating_aggregates repairs it.
+    """
+    from sqlalchemy.dialects.postgresql import insert
+
+    rows = values(
+        column("user_id", Integer), column("paper_id", Integer), column("rating", Integer), name="rows",
+    ).data([(user_id, paper_id, rating) for (user_id, paper_id), rating in ratings.items()])
+    incoming = select(rows).where(exists().where(Paper.id == rows.c.paper_id)).cte("incoming")
+    previous = (
+        select(Rating.user_id, Rating.paper_id, Rating.rating)
+        .join(incoming, (Rating.user_id == incoming.c.user_id) & (Rating.paper_id == incoming.c.paper_id))
+        .with_for_update(of=Rating)
+        .cte("previous")
+    )
+    upsert = insert(Rating).from_select(
+        ["user_id", "paper_id", "rating", "created_at"],
+        select(incoming.c.user_id, incoming.c.paper_id, incoming.c.rating, literal(datetime.utcnow()))
+        .outerjoin(previous, (previous.c.user_id == incoming.c.user_id) & (previous.c.paper_id == incoming.c.paper_id)),
+    )
+    upserted = (
+        _on_conflict_update(upsert)
+        .returning(Rating.user_id, Rating.paper_id, Rating.rating, (literal_column("xmax") == 0).label("inserted"))
+        .cte("upserted")
+    )
+    deltas = (
+        select(
+            upserted.c.user_id,
+            upserted.c.paper_id,
+            (upserted.c.rating - case((upserted.c.inserted, 0), else_=func.coalesce(previous.c.rating, 0))).label("sum_delta"),
+            case((upserted.c.inserted, 1), else_=0).label("count_delta"),
+        )
+        .outerjoin(previous, (previous.c.user_id == upserted.c.user_id) & (previous.c.paper_id == upserted.c.paper_id))
+        .cte("deltas")
+    )
+    paper_deltas = (
+        select(
+            deltas.c.paper_id,
+            func.sum(deltas.c.sum_delta).label("sum_delta"),
+            func.sum(deltas.c.count_delta).label("count_delta"),
+        )
+        .group_by(deltas.c.paper_id)
+        .cte("paper_deltas")
+    )
+    new_sum = Paper.rating_sum + paper_deltas.c.sum_delta
+    new_count = Paper.rating_count + paper_deltas.c.count_delta
+    rated = (
+        update(Paper)
+        .where(Paper.id == paper_deltas.c.paper_id)
+        .values(rating_sum=new_sum, rating_count=new_count, score=score_expression(new_sum, new_count, Paper.score))
+        .returning(Paper.id, Paper.published_date)
+        .cte("rated")
+    )
+    profiles = (
+        insert(UserCategoryStat).from_select(
+            ["user_id", "category_id", "rating_sum", "rating_count"],
+            select(deltas.c.user_id, PaperCategory.category_id, func.sum(deltas.c.sum_delta), func.sum(deltas.c.count_delta))
+            .join(PaperCategory, PaperCategory.paper_id == deltas.c.paper_id)
+            .group_by(deltas.c.user_id, PaperCategory.category_id),
+        )
+    )
+    profiles = _on_conflict_add_stats(profiles).cte("profiles")
+    return select(rated.c.id, rated.c.published_date).add_cte(profiles)
+
+
+def _apply_ratings_stepwise(db: Session, ratings: Dict[Tuple[int, int], int]) -> Dict[int, date]:
+    """apply_ratings for databases without data-modifying CTEs.
+
+    Locks the rated papers first, which serializes concurrent ratings of the
+    same paper, then reads the ratings being replaced and applies the deltas.
+    """
+    paper_ids = sorted({paper_id for _, paper_id in ratings})
+    papers = dict(db.execute(
+        select(Paper.id, Paper.published_date)
+        .where(Paper.id.in_(paper_ids))
+        .order_by(Paper.id)
+        .with_for_update()
+    ).all())
+    rows = {key: rating for key, rating in ratings.items() if key[1] in papers}
+    if not rows:
+        return {}
+    categories: Dict[int, List[int]] = {}
+    for paper_id, category_id in db.execute(
+        select(PaperCategory.paper_id, PaperCategory.category_id).where(PaperCategory.paper_id.in_(list(papers)))
+    ):
+        categories.setdefault(paper_id, []).append(category_id)
+
+    previous = {
+        (user_id, paper_id): rating
+        for user_id, paper_id, rating in db.execute(
+            select(Rating.user_id, Rating.paper_id, Rating.rating)
+            .where(tuple_(Rating.user_id, Rating.paper_id).in_(list(rows)))
+        )
+    }
+    db.execute(ratings_upsert_rows(db, rows))
+
+    deltas: Dict[int, List[int]] = {}
+    profile_deltas: Dict[Tuple[int, int], List[int]] = {}
+    for key, rating in rows.items():
+        old = previous.get(key)
+        sum_delta, count_delta = rating - (old or 0), 0 if old is not None else 1
+        delta = deltas.setdefault(key[1], [0, 0])
+        delta[0] += sum_delta
+        delta[1] += count_delta
+        for category_id in categories.get(key[1], ()):
+            delta = profile_deltas.setdefault((key[0], category_id), [0, 0])
+            delta[0] += sum_delta
+            delta[1] += count_delta
+    db.execute(aggregate_update(), [
+        {"paper_id": paper_id, "sum_delta": sum_delta, "count_delta": count_delta}
+        for paper_id, (sum_delta, count_delta) in deltas.items()
+    ])
+    if profile_deltas:
+        db.execute(profile_upsert_rows(db, profile_deltas))
+    return {paper_id: papers[paper_id] for paper_id in deltas}
+
+
+def profile_upsert_rows(db, deltas: Dict[Tuple[int, int], List[int]]):
+    """Add {(user_id, category_id): [sum_delta, count_delta]} to user_category_stats; db is a Session or Connection"""
+    insert = insert_for(db)
+    stmt = insert(UserCategoryStat).values([
+        {"user_id": user_id, "category_id": category_id, "rating_sum": sum_delta, "rating_count": count_delta}
+        for (user_id, category_id), (sum_delta, count_delta) in deltas.items()
+    ])
+    return _on_conflict_add_stats(stmt)
+
+
+def _on_conflict_add_stats(stmt):
+    # An existing (user, category) row gets the deltas added to it
+    return stmt.on_conflict_do_update(
+        index_elements=[UserCategoryStat.user_id, UserCategoryStat.category_id],
+        set_={
+            "rating_sum": UserCategoryStat.rating_sum + stmt.excluded.rating_sum,
+            "rating_count": UserCategoryStat.rating_count + stmt.excluded.rating_count,
+        },
+    )
+
+
+def aggregate_update():
+    """UPDATE papers by (sum_delta, count_delta), for executemany"""
+    papers = Paper.__table__
+    new_sum = papers.c.rating_sum + bindparam("sum_delta")
+    new_count = papers.c.rating_count + bindparam("count_delta")
+    return (
+        update(papers)
+        .where(papers.c.id == bindparam("paper_id"))
+        .values(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            score=score_expression(new_sum, new_count, papers.c.score),
+        )
+    )
+
+
+def reconcile_rating_aggregates(db: Session, repair: bool = True) -> Dict[str, List[dict]]:
+    """Compare the running aggregates with the raw ratings.
+
+    Returns the papers and user_category_stats rows that are off or missing,
+    as {"papers": [...], "category_stats": [...]}. With repair=True both are
+    corrected, along with the repaired papers' day summaries; the caller
+    commits.
+    """
+    mismatches = rating_aggregate_mismatches(db)
+    if repair:
+        repair_rating_aggregates(db, mismatches)
+        paper_ids = [row["paper_id"] for row in mismatches["papers"]]
+        if paper_ids:
+            days = db.execute(select(Paper.published_date).where(Paper.id.in_(paper_ids)).distinct()).scalars().all()
+            touch_day_summaries(db, [day for day in days if day is not None])
+    return mismatches
+
+
+def rating_aggregate_mismatches(db: Session) -> Dict[str, List[dict]]:
+    """Papers and user_category_stats rows whose aggregates differ from the raw ratings"""
+    actual = (
+        select(
+            Rating.paper_id.label("paper_id"),
+            func.sum(Rating.rating).label("expected_sum"),
+            func.count(Rating.id).label("expected_count"),
+        )
+        .group_by(Rating.paper_id)
+        .subquery()
+    )
+    expected_sum = func.coalesce(actual.c.expected_sum, 0)
+    expected_count = func.coalesce(actual.c.expected_count, 0)
+    papers = [
+        dict(row._mapping)
+        for row in db.execute(
+            select(
+                Paper.id.label("paper_id"),
+                Paper.rating_sum,
+                Paper.rating_count,
+                expected_sum.label("expected_sum"),
+                expected_count.label("expected_count"),
+            )
+            .outerjoin(actual, actual.c.paper_id == Paper.id)
+            .where((Paper.rating_sum != expected_sum) | (Paper.rating_count != expected_count))
+        )
+    ]
+    return {"papers": papers, "category_stats": _category_stat_mismatches(db)}
+
+
+def repair_rating_aggregates(db: Session, mismatches: Dict[str, List[dict]]) -> None:
+    """Apply rating_aggregate_mismatches as deltas, so a rating written since is not lost"""
+    if mismatches["papers"]:
+        db.execute(aggregate_update(), [
+            {
+                "paper_id": row["paper_id"],
+                "sum_delta": row["expected_sum"] - row["rating_sum"],
+                "count_delta": row["expected_count"] - row["rating_count"],
+            }
+            for row in mismatches["papers"]
+        ])
+    if mismatches["category_stats"]:
+        db.execute(profile_upsert_rows(db, {
+            (row["user_id"], row["category_id"]): [
+                row["expected_sum"] - row["rating_sum"], row["expected_count"] - row["rating_count"],
+            ]
+            for row in mismatches["category_stats"]
+        }))
+
+
+def _category_stat_mismatches(db: Session) -> List[dict]:
+    """user_category_stats rows that differ from ratings joined to paper_categories"""
+    actual = (
+        select(
+            Rating.user_id.label("user_id"),
+            PaperCategory.category_id.label("category_id"),
+            func.sum(Rating.rating).label("expected_sum"),
+            func.count(Rating.id).label("expected_count"),
+        )
+        .join(PaperCategory, PaperCategory.paper_id == Rating.paper_id)
+        # Anonymous ratings (bulk imports) have no profile to compare
+        .where(Rating.user_id.isnot(None))
+        .group_by(Rating.user_id, PaperCategory.category_id)
+        .subquery()
+    )
+    stats = UserCategoryStat.__table__
+    rating_sum = func.coalesce(stats.c.rating_sum, 0)
+    rating_count = func.coalesce(stats.c.rating_count, 0)
+    expected_sum = func.coalesce(actual.c.expected_sum, 0)
+    expected_count = func.coalesce(actual.c.expected_count, 0)
+    return [
+        dict(row._mapping)
+        for row in db.execute(
+            select(
+                func.coalesce(stats.c.user_id, actual.c.user_id).label("user_id"),
+                func.coalesce(stats.c.category_id, actual.c.category_id).label("category_id"),
+                rating_sum.label("rating_sum"),
+                rating_count.label("rating_count"),
+                expected_sum.label("expected_sum"),
+                expected_count.label("expected_count"),
+            )
+            .select_from(stats.outerjoin(
+                actual,
+                (actual.c.user_id == stats.c.user_id) & (actual.c.category_id == stats.c.category_id),
+                full=True,
+            ))
+            .where((rating_sum != expected_sum) | (rating_count != expected_count))
+        )
+    ]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
 from typing import Optional, List
 
@@ -25,10 +25,47 @@ class PaperBase(BaseModel):
 
 class Paper(PaperBase):
     id: int
+    # Catalog pages and the stream also return papers ingested without a date
+    published_date: Optional[date]
 
     class Config:
         from_attributes = True
 
+class PaperCard(BaseModel):
+    """List view of a paper: everything the collapsed card shows, no abstract"""
+    id: int
+    arxiv_id: str
+    title: str
+    authors: str
+    categories: str
+    published_date: date
+    score: float
+
+    class Config:
+        from_attributes = True
+
+class PaperCardPage(BaseModel):
+    papers: List[PaperCard]
+    next_cursor: Optional[str] = None
+
+class Author(BaseModel):
+    id: int
+    name: str
+
+    class Config:
+        from_attributes = True
+
+class PaperAbstract(BaseModel):
+    id: int
+    abstract: str
+
+    class Config:
+        from_attributes = True
+
+class PaperPage(BaseModel):
+    papers: List[Paper]
+    next_cursor: Optional[str] = None
+
 class RatingBase(BaseModel):
     rating: int
 
@@ -38,4 +75,19 @@ class Rating(RatingBase):
     paper_id: int
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class RatingItem(BaseModel):
+    paper_id: int
+    rating_value: int = Field(ge=1, le=5)
+
+class RatingBatch(BaseModel):
+    ratings: List[RatingItem] = Field(min_length=1, max_length=1000)
+
+class Token(BaseModel):
+    access_token: str
+    refresh_token: Optional[str] = None
+    token_type: str
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
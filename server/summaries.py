@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+from typing import Iterable, List, Union
+
+from sqlalchemy import Date, bindparam, func, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import insert_for
+from models import Paper, PaperDaySummary
+
+
+def refresh_day_summary(db: Session, day: date) -> None:
+    """Recompute the summary row for one day from its papers.
+
+    Runs as a single INSERT ... SELECT ... ON CONFLICT statement that only
+    touches the given day's rows through ix_papers_published_date, so it is
+    cheap enough to call from every write path. The day is matched as a
+    half-open range, which also covers the backend's timestamp mapping of
+    published_date. The aggregate has no GROUP BY, so a day whose papers
+    are all gone still yields a row and is zeroed out. Every refresh bumps
+    the day's version, which invalidates its ETag.
+    Sessions here do not autoflush, so pending paper changes must be
+    flushed first; the caller commits.
+    """
+    db.execute(_summary_upsert(db, select(
+        literal(day, Date),
+        func.count(Paper.id),
+        func.max(Paper.score),
+        func.current_timestamp(),
+        literal(1),
+    ).where(Paper.published_date >= day, Paper.published_date < day + timedelta(days=1))))
+
+
+def _summary_upsert(db: Session, summaries):
+    """INSERT ... SELECT ... ON CONFLICT for the summary rows selected by summaries"""
+    insert = insert_for(db)
+    stmt = insert(PaperDaySummary).from_select(
+        ["published_date", "paper_count", "max_score", "updated_at", "version"], summaries,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[PaperDaySummary.published_date],
+        set_={
+            "paper_count": stmt.excluded.paper_count,
+            "max_score": stmt.excluded.max_score,
+            "updated_at": stmt.excluded.updated_at,
+            "version": PaperDaySummary.version + 1,
+        },
+    )
+
+
+def touch_day_summaries(db: Union[Session, Connection], days: Iterable[date]) -> None:
+    """Bump the version and max_score of days whose papers' scores changed.
+
+    A score change leaves paper_count alone, so unlike refresh_day_summary
+    this does not count the day's papers; max_score is read from the top of
+    ix_papers_published_date_score_id, over the same half-open range. Runs
+    on a session or, from a flush listener, its connection.
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    # Core tables: an ORM UPDATE run with executemany would be a bulk update by primary key
+    papers = Paper.__table__
+    summaries = PaperDaySummary.__table__
+    day_max = (
+        select(func.max(papers.c.score))
+        .where(
+            papers.c.published_date >= bindparam("day_start", type_=Date),
+            papers.c.published_date < bindparam("day_end", type_=Date),
+        )
+        .scalar_subquery()
+    )
+    db.execute(
+        update(summaries)
+        .where(summaries.c.published_date == bindparam("day", type_=Date))
+        .values(
+            max_score=day_max,
+            updated_at=func.current_timestamp(),
+            version=summaries.c.version + 1,
+        ),
+        [{"day": day, "day_start": day, "day_end": day + timedelta(days=1)} for day in days],
+    )
+
+
+def refresh_day_summaries(db: Session, days: Iterable[date]) -> None:
+    for day in set(days):
+        refresh_day_summary(db, day)
+
+
+def rebuild_day_summaries(db: Session) -> None:
+    """Recompute every summary row with one full GROUP BY (repair/backfill only).
+
+    Rows are upserted rather than deleted and reinserted so versions keep
+    increasing and no client ends up holding a reused ETag; days that no
+    longer have papers are zeroed out.
+    """
+    db.execute(_summary_upsert(db, select(
+        Paper.published_date,
+        func.count(Paper.id),
+        func.max(Paper.score),
+        func.current_timestamp(),
+        literal(1),
+    ).where(Paper.published_date.isnot(None)).group_by(Paper.published_date)))
+    db.query(PaperDaySummary)\
+      .filter(~PaperDaySummary.published_date.in_(select(Paper.published_date).where(Paper.published_date.isnot(None))))\
+      .update({
+          PaperDaySummary.paper_count: 0,
+          PaperDaySummary.max_score: None,
+          PaperDaySummary.updated_at: func.current_timestamp(),
+          PaperDaySummary.version: PaperDaySummary.version + 1,
+      }, synchronize_session=False)
+
+
+def list_day_summaries(db: Session) -> List[PaperDaySummary]:
+    return db.query(PaperDaySummary)\
+             .filter(PaperDaySummary.paper_count > 0)\
+             .order_by(PaperDaySummary.published_date.desc())\
+             .all()
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+from datetime import date
+from typing import Dict, Generator, List
+
+# The server's modules import each other by bare name, and its engines read
+# their URLs when database.py is first imported, so both are set up here
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+TEST_DB = os.path.join(tempfile.mkdtemp(prefix="server-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DB}"
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import personalize
+from authors import sync_paper_authors
+from cache import daily_list_cache
+from categories import category_dictionary, sync_paper_categories
+from database import Base, SessionLocal, get_engine
+from models import Paper
+from principals import principal_cache
+from summaries import refresh_day_summaries
+
+DAY = date(2024, 1, 15)
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs a Postgres database at TEST_POSTGRES_URL")
+
+@pytest.fixture(scope="function")
+def db() -> Generator:
+    Base.metadata.create_all(bind=get_engine())
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=get_engine())
+        # Process-wide caches would otherwise carry rows of the dropped schema
+        daily_list_cache.invalidate()
+        principal_cache.clear()
+        category_dictionary.clear()
+        personalize.profile_cache.clear()
+        personalize.clear_rankings()
+
+@pytest.fixture(scope="function")
+def client(db) -> Generator:
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="function")
+def auth_headers(client: TestClient) -> Dict:
+    main.create_initial_admin()
+    response = client.post(
+        "/api/users/token",
+        data={"username": "admin@example.com", "password": "admin123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def add_papers(db, rows: List[Dict]) -> List[Paper]:
+    """Insert papers the way ingestion does: with their category and author rows and day summaries"""
+    papers = [Paper(**{"published_date": DAY, "authors": "Test Author", "categories": "cs.AI", **row}) for row in rows]
+    db.add_all(papers)
+    db.flush()
+    sync_paper_categories(db, papers)
+    sync_paper_authors(db, papers)
+    refresh_day_summaries(db, [paper.published_date for paper in papers])
+    db.commit()
+    return papers
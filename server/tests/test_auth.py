@@ -0,0 +1,54 @@
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from database import get_async_engine
+from models import User
+from principals import principal_cache
+
+@pytest.fixture
+def users_queries() -> List[str]:
+    """Statements reading the users table, as the request handlers run them"""
+    statements: List[str] = []
+    engine = get_async_engine().sync_engine
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+def test_token_claims_authenticate_without_a_users_query(client: TestClient, auth_headers, users_queries):
+    principal_cache.clear()
+    response = client.get("/api/users/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"email": "admin@example.com"}
+    assert users_queries == []
+    assert principal_cache.stats()["entries"] == 0
+
+def test_tokens_without_uid_resolve_through_the_users_table(client: TestClient, auth_headers, db, users_queries):
+    token = main.create_access_token({"sub": "admin@example.com"})
+    response = client.get("/api/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert len(users_queries) == 1
+
+    # The row is gone, so the token no longer resolves once the cache is cold
+    db.query(User).delete()
+    db.commit()
+    principal_cache.clear()
+    response = client.get("/api/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_refresh_rereads_the_user(client: TestClient, db):
+    main.create_initial_admin()
+    tokens = client.post("/api/users/token", data={"username": "admin@example.com", "password": "admin123"}).json()
+    db.query(User).delete()
+    db.commit()
+    principal_cache.clear()
+    response = client.post("/api/users/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
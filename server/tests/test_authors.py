@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from models import Author
+from conftest import DAY, add_papers
+
+@pytest.fixture
+def feed_papers(db):
+    # Ada and Grace are followed; they co-wrote "Shared", which must be listed once
+    papers = add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "Ada Old", "authors": "Ada Lovelace", "published_date": DAY - timedelta(days=1)},
+        {"arxiv_id": "2401.00002", "title": "Shared", "authors": "Ada Lovelace, Grace Hopper"},
+        {"arxiv_id": "2401.00003", "title": "Grace New", "authors": "Grace Hopper"},
+        {"arxiv_id": "2401.00004", "title": "Unfollowed", "authors": "Alan Turing"},
+    ])
+    return {paper.title: paper.id for paper in papers}
+
+def _author_id(db, normalized_name: str) -> int:
+    return db.query(Author).filter(Author.normalized_name == normalized_name).one().id
+
+def _follow(client: TestClient, headers, *author_ids: int):
+    for author_id in author_ids:
+        assert client.put(f"/api/users/me/authors/{author_id}", headers=headers).status_code == 204
+
+def test_follow_twice_then_unfollow(client: TestClient, auth_headers, feed_papers, db):
+    ada = _author_id(db, "ada lovelace")
+    _follow(client, auth_headers, ada, ada)
+    response = client.get("/api/users/me/authors", headers=auth_headers)
+    assert [author["id"] for author in response.json()] == [ada]
+
+    assert client.delete(f"/api/users/me/authors/{ada}", headers=auth_headers).status_code == 204
+    assert client.get("/api/users/me/authors", headers=auth_headers).json() == []
+    # Unfollowing an author that is not followed is a no-op too
+    assert client.delete(f"/api/users/me/authors/{ada}", headers=auth_headers).status_code == 204
+
+def test_follow_unknown_author_is_404(client: TestClient, auth_headers, feed_papers):
+    assert client.put("/api/users/me/authors/999999", headers=auth_headers).status_code == 404
+
+def test_feed_lists_shared_papers_once_newest_first(client: TestClient, auth_headers, feed_papers, db):
+    _follow(client, auth_headers, _author_id(db, "ada lovelace"), _author_id(db, "grace hopper"))
+
+    response = client.get("/api/users/me/feed", headers=auth_headers)
+    assert response.status_code == 200
+    page = response.json()
+    # Newest day first, then by id descending within the day
+    assert [paper["title"] for paper in page["papers"]] == ["Grace New", "Shared", "Ada Old"]
+    assert page["next_cursor"] is None
+
+def test_feed_pages_across_a_date_boundary(client: TestClient, auth_headers, feed_papers, db):
+    _follow(client, auth_headers, _author_id(db, "ada lovelace"), _author_id(db, "grace hopper"))
+
+    titles = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/users/me/feed", params=params, headers=auth_headers).json()
+        titles.append([paper["title"] for paper in page["papers"]])
+        cursor = page["next_cursor"]
+        pages += 1
+        if cursor is None or pages > 5:
+            break
+    # The first page ends on DAY; the second starts on the day before
+    assert titles == [["Grace New", "Shared"], ["Ada Old"]]
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "WzEsIDJd", "WyIyMDI0LTEzLTAxIiwgMV0="])
+def test_feed_rejects_malformed_cursor(client: TestClient, auth_headers, cursor):
+    response = client.get("/api/users/me/feed", params={"cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_author_search_treats_wildcards_literally(client: TestClient, auth_headers, db):
+    add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "One", "authors": "li_wei"},
+        {"arxiv_id": "2401.00002", "title": "Two", "authors": "Lix Wei"},
+        {"arxiv_id": "2401.00003", "title": "Three", "authors": "José García"},
+    ])
+
+    def search(name):
+        response = client.get("/api/authors", params={"name": name}, headers=auth_headers)
+        assert response.status_code == 200
+        return [author["name"] for author in response.json()]
+
+    # "_" is part of a name, not a single-character wildcard
+    assert search("li_") == ["li_wei"]
+    # "%" is punctuation and dropped, so it neither matches everything nor errors
+    assert search("%") == []
+    assert search("li%") == ["li_wei", "Lix Wei"]
+    # Accents and case are ignored
+    assert search("JOSE gar") == ["José García"]
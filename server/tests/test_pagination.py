@@ -0,0 +1,47 @@
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from models import Paper
+from conftest import DAY, add_papers
+
+@pytest.fixture
+def catalog(db):
+    dated = add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "Older", "abstract": "", "published_date": date(2024, 1, 14), "score": 5.0},
+        {"arxiv_id": "2401.00002", "title": "Low", "abstract": "", "score": 1.0},
+        {"arxiv_id": "2401.00003", "title": "High", "abstract": "", "score": 4.0},
+    ])
+    # Ingested before arXiv reported a date; day summaries only cover dated papers
+    undated = [
+        Paper(arxiv_id=f"2401.0001{i}", title=f"Undated {i}", abstract="", authors="Test Author",
+              categories="cs.AI", published_date=None, score=score)
+        for i, score in enumerate([2.0, 3.0, 2.0])
+    ]
+    db.add_all(undated)
+    db.commit()
+    return dated, undated
+
+def test_catalog_pages_include_undated_papers_last(client: TestClient, auth_headers, catalog):
+    titles, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/papers", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        page = response.json()
+        titles += [paper["title"] for paper in page["papers"]]
+        cursor, pages = page["next_cursor"], pages + 1
+        if cursor is None or pages > 5:
+            break
+    assert titles == ["High", "Low", "Older", "Undated 1", "Undated 2", "Undated 0"]
+    assert pages == 3
+
+def test_catalog_stream_includes_undated_papers_last(client: TestClient, auth_headers, catalog):
+    response = client.get("/api/papers/stream", headers=auth_headers)
+    assert response.status_code == 200
+    papers = [json.loads(line) for line in response.text.splitlines()]
+    assert [paper["title"] for paper in papers] == ["High", "Low", "Older", "Undated 1", "Undated 2", "Undated 0"]
+    assert [paper["published_date"] for paper in papers[3:]] == [None, None, None]
+    assert papers[0]["published_date"] == DAY.isoformat()
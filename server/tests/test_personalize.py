@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import personalize
+from conftest import DAY, add_papers
+from models import User, UserRecommendation
+
+@pytest.fixture
+def day_papers(db):
+    # Globally the cs.AI papers lead; the user only likes cs.CL
+    papers = add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "AI One", "categories": "cs.AI", "score": 3.0},
+        {"arxiv_id": "2401.00002", "title": "AI Two", "categories": "cs.AI cs.CL", "score": 2.0},
+        {"arxiv_id": "2401.00003", "title": "CL One", "categories": "cs.CL", "score": 1.0},
+        {"arxiv_id": "2312.00001", "title": "CL Old", "categories": "cs.CL", "score": 0.0,
+         "published_date": DAY.replace(day=1)},
+    ])
+    return {paper.arxiv_id: paper.id for paper in papers}
+
+def _rate(client: TestClient, headers, paper_id: int, rating: int):
+    response = client.post(f"/api/papers/{paper_id}/rate", json={"rating_value": rating}, headers=headers)
+    assert response.status_code == 200
+
+def test_personalized_list_follows_profile(client: TestClient, auth_headers, day_papers, monkeypatch):
+    monkeypatch.setattr(personalize, "latency_budget", personalize.LatencyBudget(budget_ms=60_000))
+    _rate(client, auth_headers, day_papers["2312.00001"], 5)
+
+    response = client.get(f"/api/papers/{DAY}?personalized=1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["x-ranking"] == "personalized"
+    # AI Two lists cs.CL too, so its boosted score overtakes AI One
+    assert [paper["title"] for paper in response.json()] == ["AI Two", "AI One", "CL One"]
+
+def test_personalized_list_without_ratings_is_global(client: TestClient, auth_headers, day_papers, monkeypatch):
+    monkeypatch.setattr(personalize, "latency_budget", personalize.LatencyBudget(budget_ms=60_000))
+
+    response = client.get(f"/api/papers/{DAY}?personalized=1", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["x-ranking"] == "global; reason=no_profile"
+    assert [paper["title"] for paper in response.json()] == ["AI One", "AI Two", "CL One"]
+
+@pytest.mark.parametrize("budget_ms", [0.0, 0.05, 0.5])
+def test_personalization_timeout_serves_global_order(client: TestClient, auth_headers, day_papers, monkeypatch, budget_ms):
+    _rate(client, auth_headers, day_papers["2312.00001"], 5)
+    global_list = client.get(f"/api/papers/{DAY}?category=cs.CL", headers=auth_headers).json()
+    personalize.profile_cache.clear()
+    personalize.clear_rankings()
+    monkeypatch.setattr(personalize, "latency_budget", personalize.LatencyBudget(budget_ms=budget_ms))
+
+    # Running out of budget mid-way must leave the session usable for the
+    # unpersonalized category list
+    response = client.get(f"/api/papers/{DAY}?personalized=1&category=cs.CL", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["x-ranking"] == "global; reason=timeout"
+    assert response.json() == global_list
+    assert [paper["title"] for paper in global_list] == ["AI Two", "CL One"]
+
+def test_slow_personalization_reads_fall_back_on_time(client: TestClient, auth_headers, day_papers, monkeypatch):
+    _rate(client, auth_headers, day_papers["2312.00001"], 5)
+    personalize.profile_cache.clear()
+    monkeypatch.setattr(personalize, "latency_budget", personalize.LatencyBudget(budget_ms=50))
+    real_get = personalize.profile_cache.get
+
+    async def slow_get(db, user_id):
+        await asyncio.sleep(2)
+        return await real_get(db, user_id)
+
+    monkeypatch.setattr(personalize.profile_cache, "get", slow_get)
+    start = time.perf_counter()
+    response = client.get(f"/api/papers/{DAY}?personalized=1", headers=auth_headers)
+    # Served when the budget ran out, not when the read finished
+    assert time.perf_counter() - start < 1
+    assert response.status_code == 200
+    assert response.headers["x-ranking"] == "global; reason=timeout"
+    assert [paper["title"] for paper in response.json()] == ["AI One", "AI Two", "CL One"]
+
+def test_personalization_sheds_while_over_budget(client: TestClient, auth_headers, day_papers, monkeypatch):
+    # Over budget by recent samples, but roomy enough that the probe finishes
+    budget = personalize.LatencyBudget(budget_ms=1000.0, probe_every=3)
+    budget.record(5.0)
+    monkeypatch.setattr(personalize, "latency_budget", budget)
+
+    reasons = [
+        client.get(f"/api/papers/{DAY}?personalized=1", headers=auth_headers).headers["x-ranking"]
+        for _ in range(3)
+    ]
+    # Every probe_every-th request still tries, so the p99 can recover
+    assert reasons == ["global; reason=shed", "global; reason=shed", "global; reason=no_profile"]
+
+def test_recommendations_serve_the_precomputed_list(client: TestClient, auth_headers, day_papers, db):
+    user_id = db.query(User).filter(User.email == "admin@example.com").one().id
+    db.add_all([
+        UserRecommendation(user_id=user_id, rank=rank, paper_id=day_papers[arxiv_id], model_version="categories")
+        for rank, arxiv_id in enumerate(["2312.00001", "2401.00003"])
+    ])
+    db.commit()
+
+    response = client.get("/api/users/me/recommendations?limit=5", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["x-ranking"] == "precomputed"
+    assert [paper["title"] for paper in response.json()] == ["CL Old", "CL One"]
+
+def test_recommendations_without_a_batch_run_rank_the_latest_day(client: TestClient, auth_headers, day_papers, monkeypatch):
+    monkeypatch.setattr(personalize, "latency_budget", personalize.LatencyBudget(budget_ms=60_000))
+    _rate(client, auth_headers, day_papers["2312.00001"], 5)
+
+    response = client.get("/api/users/me/recommendations?limit=2", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["x-ranking"] == "personalized"
+    assert [paper["title"] for paper in response.json()] == ["AI Two", "AI One"]
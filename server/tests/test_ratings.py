@@ -0,0 +1,156 @@
+import os
+import re
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Category, Paper, PaperDaySummary, User, UserCategoryStat
+from conftest import DAY, add_papers
+from ratings import _apply_ratings_statement, apply_ratings, reconcile_rating_aggregates
+
+# The single-statement path only runs on Postgres, e.g.
+# TEST_POSTGRES_URL=postgresql://postgres@localhost/arxiv_recsys_test
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+def test_apply_ratings_moves_aggregates_by_delta(db):
+    papers = add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "AI", "categories": "cs.AI", "score": 0.0},
+        {"arxiv_id": "2401.00002", "title": "AI CL", "categories": "cs.AI cs.CL", "score": 0.0},
+    ])
+    users = [User(email="one@example.com", hashed_password="x"), User(email="two@example.com", hashed_password="x")]
+    db.add_all(users)
+    db.commit()
+    one, two = (user.id for user in users)
+    version = db.get(PaperDaySummary, DAY).version
+
+    assert apply_ratings(db, {(one, papers[0].id): 4, (one, papers[1].id): 2, (two, papers[1].id): 5, (one, 999999): 3}) == {
+        papers[0].id: DAY, papers[1].id: DAY,
+    }
+    # A re-rating replaces the previous rating instead of adding to it
+    assert apply_ratings(db, {(one, papers[1].id): 5}) == {papers[1].id: DAY}
+    db.commit()
+    db.expire_all()
+
+    paper = db.get(Paper, papers[1].id)
+    assert (paper.rating_sum, paper.rating_count) == (10, 2)
+    assert paper.score == 5.0 * (1 - 1 / 3)
+    stats = {
+        (user_id, name): (rating_sum, rating_count)
+        for user_id, name, rating_sum, rating_count in db.query(
+            UserCategoryStat.user_id, Category.name, UserCategoryStat.rating_sum, UserCategoryStat.rating_count
+        ).join(Category, Category.id == UserCategoryStat.category_id)
+    }
+    assert stats == {(one, "cs.AI"): (9, 2), (one, "cs.CL"): (5, 1), (two, "cs.AI"): (5, 1), (two, "cs.CL"): (5, 1)}
+    # Each write changes the day's order, so its ETag version moves; the count doesn't
+    summary = db.get(PaperDaySummary, DAY)
+    assert (summary.paper_count, summary.max_score, summary.version) == (2, paper.score, version + 2)
+
+def test_reconcile_repairs_paper_aggregates_and_category_stats(db):
+    papers = add_papers(db, [{"arxiv_id": "2401.00001", "title": "AI CL", "categories": "cs.AI cs.CL", "score": 0.0}])
+    user = User(email="one@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    apply_ratings(db, {(user.id, papers[0].id): 4})
+    db.commit()
+    ai, cl = (db.query(Category.id).filter(Category.name == name).scalar() for name in ("cs.AI", "cs.CL"))
+
+    # Simulate drift from writes that bypassed apply_ratings
+    db.execute(Paper.__table__.update().values(rating_sum=10, rating_count=3))
+    db.execute(UserCategoryStat.__table__.update().where(UserCategoryStat.category_id == ai).values(rating_sum=1))
+    db.execute(UserCategoryStat.__table__.delete().where(UserCategoryStat.category_id == cl))
+    db.commit()
+
+    mismatches = reconcile_rating_aggregates(db)
+    db.commit()
+    assert [row["paper_id"] for row in mismatches["papers"]] == [papers[0].id]
+    assert sorted((row["category_id"], row["rating_sum"], row["expected_sum"]) for row in mismatches["category_stats"]) == [
+        (ai, 1, 4), (cl, 0, 4),
+    ]
+    assert reconcile_rating_aggregates(db, repair=False) == {"papers": [], "category_stats": []}
+    db.expire_all()
+    assert db.get(Paper, papers[0].id).score == 2.0
+
+@pytest.mark.parametrize("ratings", [
+    {(1, 10): 4},
+    {(1, 10): 4, (1, 11): 2, (2, 10): 5},
+], ids=["single", "batch"])
+def test_apply_ratings_statement_compiles_for_postgres(ratings):
+    compiled = _apply_ratings_statement(ratings).compile(dialect=postgresql.dialect())
+    sql = " ".join(str(compiled).split())
+
+    # Every step is a CTE of the one statement
+    for cte in ("incoming", "previous", "upserted", "deltas", "paper_deltas", "rated", "profiles"):
+        assert f"{cte} AS (" in sql
+    assert "FOR UPDATE OF ratings" in sql
+    assert "ON CONFLICT (user_id, paper_id) DO UPDATE SET rating = excluded.rating" in sql
+    assert "xmax = %(xmax_1)s AS inserted" in sql and compiled.params["xmax_1"] == 0
+    assert "UPDATE papers SET" in sql and "RETURNING papers.id, papers.published_date" in sql
+    assert "ON CONFLICT (user_id, category_id) DO UPDATE SET" in sql
+    # One VALUES row per rating
+    rows = re.findall(r"\(%\((\w+)\)s, %\((\w+)\)s, %\((\w+)\)s\)", sql.split(" AS rows ")[0])
+    assert sorted(tuple(compiled.params[name] for name in row) for row in rows) == sorted(
+        (user_id, paper_id, rating) for (user_id, paper_id), rating in ratings.items()
+    )
+
+@pytest.fixture
+def pg_db():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(TEST_POSTGRES_URL)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+@pytest.mark.postgres
+def test_apply_ratings_statement_on_postgres(pg_db):
+    db = pg_db
+    papers = add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "AI", "categories": "cs.AI", "score": 0.0},
+        {"arxiv_id": "2401.00002", "title": "AI CL", "categories": "cs.AI cs.CL", "score": 0.0},
+    ])
+    users = [User(email="one@example.com", hashed_password="x"), User(email="two@example.com", hashed_password="x")]
+    db.add_all(users)
+    db.commit()
+    one, two = (user.id for user in users)
+    ai, cl = (papers[0].id, papers[1].id)
+    version = db.get(PaperDaySummary, DAY).version
+
+    def aggregates():
+        db.expire_all()
+        return {paper.id: (paper.rating_sum, paper.rating_count, paper.score) for paper in db.query(Paper)}
+
+    def stats():
+        return {
+            (user_id, name): (rating_sum, rating_count)
+            for user_id, name, rating_sum, rating_count in db.query(
+                UserCategoryStat.user_id, Category.name, UserCategoryStat.rating_sum, UserCategoryStat.rating_count
+            ).join(Category, Category.id == UserCategoryStat.category_id)
+        }
+
+    # A first rating inserts and counts
+    assert apply_ratings(db, {(one, cl): 2}) == {cl: DAY}
+    db.commit()
+    assert aggregates()[cl] == (2, 1, pytest.approx(2.0 * (1 - 1 / 2)))
+    assert stats() == {(one, "cs.AI"): (2, 1), (one, "cs.CL"): (2, 1)}
+
+    # A re-rating moves the sums by the difference and keeps the counts
+    assert apply_ratings(db, {(one, cl): 5}) == {cl: DAY}
+    db.commit()
+    assert aggregates()[cl] == (5, 1, pytest.approx(5.0 * (1 - 1 / 2)))
+    assert stats() == {(one, "cs.AI"): (5, 1), (one, "cs.CL"): (5, 1)}
+
+    # A batch mixes inserts, a re-rating and an unknown paper
+    assert apply_ratings(db, {(one, ai): 4, (one, cl): 3, (two, cl): 5, (two, 999999): 1}) == {ai: DAY, cl: DAY}
+    db.commit()
+    assert aggregates() == {ai: (4, 1, pytest.approx(4.0 * (1 - 1 / 2))), cl: (8, 2, pytest.approx(4.0 * (1 - 1 / 3)))}
+    assert stats() == {(one, "cs.AI"): (7, 2), (one, "cs.CL"): (3, 1), (two, "cs.AI"): (5, 1), (two, "cs.CL"): (5, 1)}
+    assert db.get(PaperDaySummary, DAY).version == version + 3
+    assert reconcile_rating_aggregates(db, repair=False) == {"papers": [], "category_stats": []}
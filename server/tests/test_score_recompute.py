@@ -0,0 +1,47 @@
+import os
+import sys
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import main
+from cache import daily_list_cache
+from models import Rating
+from conftest import DAY, SERVER_DIR, add_papers
+
+# The backend's batch jobs rewrite scores in the same database the server serves from
+BACKEND_DIR = os.path.join(os.path.dirname(SERVER_DIR), "backend")
+
+def test_backend_score_recompute_changes_the_etag(client: TestClient, auth_headers, db, monkeypatch):
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        from app.services import ranking_service
+    finally:
+        sys.path.remove(BACKEND_DIR)
+    papers = add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "First", "score": 0.0},
+        {"arxiv_id": "2401.00002", "title": "Second", "score": 0.0},
+    ])
+    # Entries expire at once, as they do in another process once their TTL runs out
+    monkeypatch.setattr(daily_list_cache, "ttl_seconds", 0.0)
+
+    first = client.get(f"/api/papers/{DAY}", headers=auth_headers)
+    etag = first.headers["etag"]
+    assert client.get(f"/api/papers/{DAY}", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    # A rating written around apply_ratings, e.g. by a bulk import, is
+    # only scored by the backend's recompute
+    user_id = main.get_user(db, "admin@example.com").id
+    db.execute(Rating.__table__.insert().values(user_id=user_id, paper_id=papers[1].id, rating=5, created_at=datetime.utcnow()))
+    db.commit()
+    backend_db = Session(bind=db.get_bind())
+    try:
+        assert ranking_service.update_paper_scores(backend_db) == 1
+    finally:
+        backend_db.close()
+
+    response = client.get(f"/api/papers/{DAY}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [paper["title"] for paper in response.json()] == ["Second", "First"]
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+import main
+import write_behind
+from database import SessionLocal
+from models import Paper, Rating
+from write_behind import RatingWriteBuffer
+from conftest import add_papers
+
+@pytest.fixture
+def papers(db):
+    return add_papers(db, [
+        {"arxiv_id": "2401.00001", "title": "First", "score": 0.0},
+        {"arxiv_id": "2401.00002", "title": "Second", "score": 0.0},
+    ])
+
+@pytest.fixture
+def user_id(client):
+    main.create_initial_admin()
+    db = SessionLocal()
+    try:
+        return main.get_user(db, "admin@example.com").id
+    finally:
+        db.close()
+
+def _make_buffer(spill_dir, fsync=False) -> RatingWriteBuffer:
+    # Flushed by hand: the background thread only wakes when stopped
+    return RatingWriteBuffer(spill_dir=str(spill_dir), flush_interval=3600, max_batch=1000, fsync=fsync)
+
+def _ratings(db):
+    db.expire_all()
+    return {(rating.user_id, rating.paper_id): rating.rating for rating in db.query(Rating)}
+
+@pytest.mark.parametrize("fsync", [False, True])
+def test_flush_writes_coalesced_ratings(db, papers, user_id, tmp_path, fsync):
+    buffer = _make_buffer(tmp_path, fsync=fsync)
+    buffer.start()
+    try:
+        async def rate():
+            await buffer.add(user_id, papers[0].id, 2)
+            await buffer.add(user_id, papers[0].id, 4)
+            await buffer.add(user_id, papers[1].id, 5)
+        asyncio.run(rate())
+
+        assert buffer.pending_for_user(user_id) == {papers[0].id: 4, papers[1].id: 5}
+        assert _ratings(db) == {}
+        assert buffer.flush() == 2
+        assert _ratings(db) == {(user_id, papers[0].id): 4, (user_id, papers[1].id): 5}
+        paper = db.get(Paper, papers[0].id)
+        assert (paper.rating_sum, paper.rating_count) == (4, 1)
+        assert buffer.stats()["queue_depth"] == 0
+    finally:
+        buffer.stop()
+    # Everything was committed, so no spill file is left to replay
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".spill")] == []
+
+def test_add_does_not_block_event_loop(db, papers, user_id, tmp_path):
+    buffer = _make_buffer(tmp_path, fsync=True)
+    buffer.start()
+    release = threading.Event()
+    real_sync = buffer._sync_spill
+
+    def slow_sync(spilled):
+        release.wait(5)
+        real_sync(spilled)
+
+    buffer._sync_spill = slow_sync
+    try:
+        async def rate():
+            add = asyncio.ensure_future(buffer.add(user_id, papers[0].id, 3))
+            # The loop keeps running while the spill waits on its fsync
+            await asyncio.sleep(0.05)
+            assert not add.done()
+            release.set()
+            await add
+        asyncio.run(rate())
+        assert buffer.pending_for_user(user_id) == {papers[0].id: 3}
+    finally:
+        release.set()
+        buffer.stop()
+
+def test_start_replays_orphaned_spill_files(db, papers, user_id, tmp_path):
+    # Left behind by a process that acknowledged ratings and then crashed,
+    # including a torn final line
+    with open(tmp_path / "ratings-1-crashed.spill", "w") as spill:
+        spill.write(json.dumps([user_id, papers[0].id, 1]) + "\n")
+        spill.write(json.dumps([user_id, papers[0].id, 5]) + "\n")
+        spill.write(json.dumps([user_id, papers[1].id, 3]) + "\n")
+        spill.write("[%d, %d" % (user_id, papers[1].id))
+
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    try:
+        assert buffer.pending_for_user(user_id) == {papers[0].id: 5, papers[1].id: 3}
+        assert buffer.flush() == 2
+    finally:
+        buffer.stop()
+    assert _ratings(db) == {(user_id, papers[0].id): 5, (user_id, papers[1].id): 3}
+    assert not (tmp_path / "ratings-1-crashed.spill").exists()
+
+def test_recovery_skips_spill_files_claimed_during_listing(db, papers, user_id, tmp_path, monkeypatch):
+    with open(tmp_path / "ratings-1-crashed.spill", "w") as spill:
+        spill.write(json.dumps([user_id, papers[0].id, 4]) + "\n")
+    with open(tmp_path / "ratings-2-crashed.spill", "w") as spill:
+        spill.write(json.dumps([user_id, papers[1].id, 2]) + "\n")
+    real_getmtime = os.path.getmtime
+
+    def getmtime(path):
+        # Another worker replays and removes this file between the listing and the stat
+        if path.endswith("ratings-2-crashed.spill"):
+            os.unlink(path)
+        return real_getmtime(path)
+
+    monkeypatch.setattr(write_behind.os.path, "getmtime", getmtime)
+    buffer = _make_buffer(tmp_path)
+    buffer._recover_orphaned_spills()
+    assert buffer.pending_for_user(user_id) == {papers[0].id: 4}
+    for spill in buffer._unflushed_files:
+        spill.close()
+
+def test_failed_flush_keeps_ratings_for_retry(db, papers, user_id, tmp_path):
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    try:
+        asyncio.run(buffer.add(user_id, papers[0].id, 4))
+
+        def broken_session():
+            raise RuntimeError("database unavailable")
+
+        buffer.session_factory = broken_session
+        assert buffer.flush() == 0
+        assert buffer.stats()["flush_errors"] == 1
+        assert buffer.pending_for_user(user_id) == {papers[0].id: 4}
+
+        buffer.session_factory = SessionLocal
+        assert buffer.flush() == 1
+    finally:
+        buffer.stop()
+    assert _ratings(db) == {(user_id, papers[0].id): 4}
+
+def test_flush_evicts_raters_profiles(db, papers, user_id, tmp_path, monkeypatch):
+    evicted = []
+    monkeypatch.setattr(write_behind.profile_cache, "evict", evicted.append)
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    try:
+        asyncio.run(buffer.add(user_id, papers[0].id, 4))
+        # A rating of an unknown paper is dropped and changes no profile
+        asyncio.run(buffer.add(user_id + 1, 999999, 4))
+        buffer.flush()
+    finally:
+        buffer.stop()
+    assert evicted == [user_id]
+
+def test_failed_spill_swap_keeps_ratings_pending(db, papers, user_id, tmp_path, monkeypatch):
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    try:
+        asyncio.run(buffer.add(user_id, papers[0].id, 4))
+
+        def full_disk(path, flags):
+            raise OSError(28, "No space left on device")
+
+        monkeypatch.setattr(write_behind, "_open_locked", full_disk)
+        assert buffer.flush() == 0
+        assert buffer.stats()["flush_errors"] == 1
+        assert buffer.pending_for_user(user_id) == {papers[0].id: 4}
+        # The current spill file still backs the rating and takes new ones
+        asyncio.run(buffer.add(user_id, papers[1].id, 2))
+
+        monkeypatch.undo()
+        assert buffer.flush() == 2
+    finally:
+        buffer.stop()
+    assert _ratings(db) == {(user_id, papers[0].id): 4, (user_id, papers[1].id): 2}
+
+def test_new_spill_files_are_never_seen_unlocked(tmp_path):
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    try:
+        names = os.listdir(tmp_path)
+        assert len(names) == 1 and names[0].endswith(".spill")
+        # Another worker starting now must leave the live file alone
+        other = _make_buffer(tmp_path)
+        other._recover_orphaned_spills()
+        assert other._unflushed_files == []
+    finally:
+        buffer.stop()
+
+def test_write_behind_rejects_unknown_papers(client, auth_headers, papers, tmp_path, monkeypatch):
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    monkeypatch.setattr(main, "RATING_WRITE_BEHIND", True)
+    monkeypatch.setattr(main, "rating_buffer", buffer)
+    try:
+        response = client.post("/api/papers/999999/rate", json={"rating_value": 4}, headers=auth_headers)
+        assert response.status_code == 404
+        assert buffer.stats()["queue_depth"] == 0
+
+        response = client.post(f"/api/papers/{papers[0].id}/rate", json={"rating_value": 4}, headers=auth_headers)
+        assert response.status_code == 200
+        assert buffer.stats()["queue_depth"] == 1
+        buffer.flush()
+    finally:
+        buffer.stop()
+
+    metrics = client.get("/metrics").text
+    assert "rating_buffer_flush_duration_seconds_count" in metrics
+    assert "rating_buffer_dropped_ratings_total 0.0" in metrics
+
+def test_batch_ratings_go_through_the_buffer(client, auth_headers, db, papers, user_id, tmp_path, monkeypatch):
+    buffer = _make_buffer(tmp_path)
+    buffer.start()
+    monkeypatch.setattr(main, "RATING_WRITE_BEHIND", True)
+    monkeypatch.setattr(main, "rating_buffer", buffer)
+    try:
+        response = client.post(f"/api/papers/{papers[0].id}/rate", json={"rating_value": 2}, headers=auth_headers)
+        assert response.status_code == 200
+        # The newer batch rating of the same paper must not be overwritten
+        # by the older one still buffered
+        response = client.post("/api/ratings/batch", json={"ratings": [
+            {"paper_id": papers[0].id, "rating_value": 5},
+            {"paper_id": 999999, "rating_value": 3},
+        ]}, headers=auth_headers)
+        assert response.json() == {"applied": 1, "missing": [999999]}
+        assert buffer.flush() == 1
+    finally:
+        buffer.stop()
+    assert _ratings(db) == {(user_id, papers[0].id): 5}
@@ -0,0 +1,294 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from cache import daily_list_cache
+from config import (
+    RATING_FLUSH_INTERVAL_SECONDS,
+    RATING_FLUSH_MAX_BATCH,
+    RATING_SPILL_DIR,
+    RATING_SPILL_FSYNC,
+)
+from database import SessionLocal
+from log import get_logger
+from metrics import RATING_FLUSH_SECONDS
+from personalize import profile_cache
+from ratings import apply_ratings
+
+RatingKey = Tuple[int, int]  # (user_id, paper_id)
+
+logger = get_logger(__name__)
+
+
+class RatingWriteBuffer:
+    """Acknowledge ratings from memory and write them to the database in batches.
+
+    Every rating is appended to a local spill file before it is acknowledged,
+    then coalesced per (user, paper) in memory. The append (and the fsync,
+    when enabled) runs on a worker thread, never on the event loop, and
+    ratings spilled while an fsync is in progress share the next one. A background thread flushes
+    the pending ratings as one multi-row upsert and one commit, either every
+    flush_interval seconds or as soon as max_batch ratings are pending.
+
+    Each process holds an exclusive flock on its own spill files. On start,
+    any spill file that is not locked was left behind by a crashed process and
+    is replayed, so acknowledged ratings are never lost.
+    """
+
+    def __init__(
+        self,
+        spill_dir: str = RATING_SPILL_DIR,
+        flush_interval: float = RATING_FLUSH_INTERVAL_SECONDS,
+        max_batch: int = RATING_FLUSH_MAX_BATCH,
+        fsync: bool = RATING_SPILL_FSYNC,
+        session_factory=SessionLocal,
+    ):
+        self.spill_dir = spill_dir
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.session_factory = session_factory
+        self._pending: Dict[RatingKey, int] = {}
+        self._lock = threading.Lock()
+        # Held for an fsync of the spill file and for swapping it; taken before _lock
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spill = None
+        # Lines appended to spill files so far, and how many of them are fsynced
+        self._spilled = 0
+        self._synced = 0
+        # Spill files whose ratings are not yet committed to the database
+        self._unflushed_files: List = []
+        self.flushes = 0
+        self.flushed_ratings = 0
+        self.dropped_ratings = 0
+        self.flush_errors = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self) -> None:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with self._lock:
+            self._recover_orphaned_spills()
+            self._spill = self._open_spill_file()
+        self._thread = threading.Thread(target=self._run, name="rating-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write out everything still pending"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            if self._pending:
+                return  # flush failed: leave the spill files for the next start
+            leftover, self._unflushed_files = self._unflushed_files + [self._spill], []
+            self._spill = None
+        # Counts restart with the fresh spill file the next start opens
+        self._spilled = 0
+        self._synced = 0
+        for spill in leftover:
+            self._discard_spill_file(spill)
+
+    async def add(self, user_id: int, paper_id: int, rating: int) -> None:
+        """Durably record a rating; it reaches the database on the next flush"""
+        await self.add_many({(user_id, paper_id): rating})
+
+    async def add_many(self, ratings: Dict[RatingKey, int]) -> None:
+        """Durably record {(user_id, paper_id): rating} with one append and one fsync"""
+        if ratings:
+            await asyncio.get_running_loop().run_in_executor(None, self._spill_ratings, ratings)
+
+    def _spill_ratings(self, ratings: Dict[RatingKey, int]) -> None:
+        lines = "".join(json.dumps([user_id, paper_id, rating]) + "\n" for (user_id, paper_id), rating in ratings.items())
+        with self._lock:
+            self._spill.write(lines)
+            self._spill.flush()
+            self._spilled += len(ratings)
+            spilled = self._spilled
+            self._pending.update(ratings)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+        if self.fsync:
+            self._sync_spill(spilled)
+
+    def _sync_spill(self, spilled: int) -> None:
+        """Return once the first spilled lines are on disk (group commit).
+
+        One fsync covers every line appended before it, so a thread that
+        waited for another's fsync usually finds its line already synced.
+        A line in a file that has since been swapped out was synced by the
+        swap (see flush).
+        """
+        with self._sync_lock:
+            if self._synced >= spilled:
+                return
+            with self._lock:
+                spill, target = self._spill, self._spilled
+            os.fsync(spill.fileno())
+            self._synced = target
+
+    def pending_for_user(self, user_id: int) -> Dict[int, int]:
+        """Ratings by user_id that are acknowledged but not yet flushed, by paper_id"""
+        with self._lock:
+            return {paper_id: rating for (uid, paper_id), rating in self._pending.items() if uid == user_id}
+
+    def flush(self) -> int:
+        """Write all pending ratings in one transaction and return how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+            # Opened before the swap: if it fails, the batch stays pending and
+            # keeps being spilled to the current file.
+            try:
+                new_spill = self._open_spill_file()
+            except OSError as e:
+                logger.error(f"Error opening a rating spill file: {e}")
+                with self._lock:
+                    self.flush_errors += 1
+                return 0
+            with self._sync_lock:
+                with self._lock:
+                    batch, self._pending = self._pending, {}
+                    # New ratings go to the fresh file; the old one is kept
+                    # until the batch it backs is committed.
+                    old_spill, target = self._spill, self._spilled
+                    self._unflushed_files.append(old_spill)
+                    self._spill = new_spill
+                if self.fsync and self._synced < target:
+                    # Ratings still waiting on an fsync were written to the old file
+                    os.fsync(old_spill.fileno())
+                    self._synced = target
+            start = time.perf_counter()
+            try:
+                written = self._write(batch)
+            except Exception as e:
+                logger.error(f"Error flushing ratings: {e}")
+                with self._lock:
+                    self.flush_errors += 1
+                    # Keep anything rated again since the swap; retry the rest next time
+                    for key, rating in batch.items():
+                        self._pending.setdefault(key, rating)
+                return 0
+            elapsed = time.perf_counter() - start
+            RATING_FLUSH_SECONDS.observe(elapsed)
+            with self._lock:
+                done, self._unflushed_files = self._unflushed_files, []
+                self.flushes += 1
+                self.flushed_ratings += written
+                self.dropped_ratings += len(batch) - written
+                self.last_flush_seconds = elapsed
+                self.total_flush_seconds += elapsed
+            for spill in done:
+                self._discard_spill_file(spill)
+            return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._pending),
+                "flushes": self.flushes,
+                "flushed_ratings": self.flushed_ratings,
+                "dropped_ratings": self.dropped_ratings,
+                "flush_errors": self.flush_errors,
+                "last_flush_ms": self.last_flush_seconds * 1000,
+                "avg_flush_ms": self.total_flush_seconds * 1000 / self.flushes if self.flushes else 0.0,
+            }
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _write(self, batch: Dict[RatingKey, int]) -> int:
+        db = self.session_factory()
+        try:
+            # Papers are checked when a rating is acknowledged, but one can be
+            # deleted before the flush; apply_ratings skips ids that don't
+            # exist rather than failing the whole batch.
+            rated = apply_ratings(db, batch)
+            db.commit()
+            for day in set(rated.values()):
+                daily_list_cache.invalidate(day)
+            # Same as the synchronous rating path: raters' personalized
+            # lists use their new profile on the next request
+            for user_id in {user_id for user_id, paper_id in batch if paper_id in rated}:
+                profile_cache.evict(user_id)
+            return sum(1 for _, paper_id in batch if paper_id in rated)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _open_spill_file(self):
+        path = os.path.join(self.spill_dir, f"ratings-{os.getpid()}-{uuid.uuid4().hex}.spill")
+        return open(path, "a", opener=_open_locked)
+
+    def _discard_spill_file(self, spill) -> None:
+        os.unlink(spill.name)
+        spill.close()
+
+    def _recover_orphaned_spills(self) -> None:
+        """Queue ratings from spill files no live process holds"""
+        spills = []
+        for name in os.listdir(self.spill_dir):
+            if not name.endswith(".spill"):
+                continue
+            path = os.path.join(self.spill_dir, name)
+            try:
+                spills.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue  # flushed and removed by its owner since the listing
+        for _, path in sorted(spills):
+            try:
+                spill = open(path, "r+")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(spill.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                spill.close()
+                continue
+            for line in spill:
+                try:
+                    user_id, paper_id, rating = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from the crash
+                self._pending[(user_id, paper_id)] = rating
+            self._unflushed_files.append(spill)
+
+
+def _open_locked(path: str, flags: int) -> int:
+    """Create path already flocked by this process.
+
+    The file is created and locked under a name _recover_orphaned_spills
+    skips, then renamed into place, so no other process ever sees it
+    unlocked and replays it as an orphan.
+    """
+    staging = path + ".new"
+    fd = os.open(staging, flags, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(staging, path)
+    except BaseException:
+        os.close(fd)
+        os.unlink(staging)
+        raise
+    return fd
+
+
+rating_buffer = RatingWriteBuffer()